@@ -0,0 +1,138 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+import psutil
+
+# Load-aware admission control for renders. Every accepted render holds a
+# reservation from submit until it finishes; at most max_renders of them run
+# at once and at most max_queued wait for a slot. A render only starts while
+# the host has CPU and memory headroom, and new renders are rejected with a
+# Retry-After estimate once the waiting room is full or memory runs out.
+
+
+class AdmissionController:
+    """Caps concurrent renders based on CPU load, free memory and renders in flight"""
+
+    def __init__(self, max_renders=2, max_queued=8, cpu_limit=90.0, min_available_mb=512,
+                 sample_interval=1.0, default_render_seconds=60.0):
+        if max_renders < 1:
+            raise ValueError('max_renders must be at least 1')
+        self.max_renders = max_renders
+        self.max_queued = max_queued
+        self.cpu_limit = cpu_limit
+        self.min_available_mb = min_available_mb
+        self.sample_interval = sample_interval
+        self.running = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        # Moving average of render durations, used for Retry-After
+        self.render_seconds = default_render_seconds
+        self._sample = None
+        self._sampled_at = 0.0
+        self._condition = threading.Condition()
+        # Prime psutil so the first cpu_percent() call has a baseline
+        psutil.cpu_percent(interval=None)
+
+    def sample(self):
+        """CPU percent and available memory (MB), re-read at most every sample_interval"""
+        now = time.monotonic()
+        if self._sample is None or now - self._sampled_at >= self.sample_interval:
+            memory = psutil.virtual_memory()
+            self._sample = {
+                'cpu_percent': psutil.cpu_percent(interval=None),
+                'memory_available_mb': memory.available / (1024 * 1024),
+                'memory_percent': memory.percent,
+            }
+            self._sampled_at = now
+        return self._sample
+
+    def _memory_low(self, sample):
+        return sample['memory_available_mb'] < self.min_available_mb
+
+    def _host_ok(self, sample):
+        return sample['cpu_percent'] < self.cpu_limit and not self._memory_low(sample)
+
+    def _has_headroom(self, sample):
+        """True if another render may start right now"""
+        if self.running >= self.max_renders:
+            return False
+        # An idle host always runs one render, otherwise nothing would ever start
+        return self.running == 0 or self._host_ok(sample)
+
+    def host_has_headroom(self):
+        """True if CPU and memory allow another render, ignoring the slot count"""
+        with self._condition:
+            return self._host_ok(self.sample())
+
+    def retry_after(self):
+        """Seconds until a slot is likely to free up"""
+        backlog = self.waiting + 1
+        estimate = math.ceil(self.render_seconds * backlog / self.max_renders)
+        return max(5, min(estimate, 600))
+
+    def try_admit(self):
+        """Reserve a place for a new render, or return (False, reason, retry_after)"""
+        with self._condition:
+            sample = self.sample()
+            reason = None
+            if self.waiting >= self.max_queued:
+                reason = 'The render queue is full'
+            elif self.running and self._memory_low(sample):
+                reason = 'The server is low on memory'
+            if reason:
+                self.rejected += 1
+                return False, reason, self.retry_after()
+            self.waiting += 1
+            self.admitted += 1
+            return True, None, 0
+
+    def cancel(self):
+        """Give back a reservation that will never be run"""
+        with self._condition:
+            self.waiting -= 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, poll_interval=1.0):
+        """Block until the host has headroom, then hold a render slot.
+
+        Takes over a reservation made by try_admit.
+        """
+        with self._condition:
+            while not self._has_headroom(self.sample()):
+                # Woken early when a render finishes, otherwise re-sample the load
+                self._condition.wait(poll_interval)
+            self.waiting -= 1
+            self.running += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            with self._condition:
+                self.running -= 1
+                self.render_seconds = 0.8 * self.render_seconds + 0.2 * elapsed
+                self._condition.notify_all()
+
+    def state(self):
+        """Current load and limits, for the admin dashboard"""
+        with self._condition:
+            sample = self.sample()
+            return {
+                'cpu_percent': sample['cpu_percent'],
+                'memory_available_mb': round(sample['memory_available_mb']),
+                'memory_percent': sample['memory_percent'],
+                'running': self.running,
+                'waiting': self.waiting,
+                'max_renders': self.max_renders,
+                'max_queued': self.max_queued,
+                'cpu_limit': self.cpu_limit,
+                'min_available_mb': self.min_available_mb,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'saturated': self.waiting >= self.max_queued or not self._has_headroom(sample),
+                'retry_after': self.retry_after(),
+            }
@@ -1,40 +1,81 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, send_from_directory
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, send_file, abort
 from database import (
     init_db,
     add_user,
     get_user_by_email,
-    get_all_users,
-    get_all_videos,
-    increment_login_attempts,
+    get_users_page,
+    get_videos_page,
+    get_admin_stats,
+    get_user_for_login,
+    record_login_lockout,
+    update_password_hash,
     reset_login_attempts,
-    get_login_attempts,
     add_video,
     get_videos_by_user,
     update_payment_status,
     get_user_by_id,
     delete_user,
     get_video_by_id,
-    delete_video
+    delete_video,
+    get_pool_stats,
+    get_cache_stats,
+    invalidate_user_videos,
+    get_referenced_files,
+    acquire_storage_object,
+    release_storage_object,
+    create_upload_session,
+    get_upload_session,
+    complete_upload_session,
+    claim_upload_sessions,
+    expire_upload_sessions
 )
-from werkzeug.security import generate_password_hash, check_password_hash
 import os
+import re
+import mimetypes
+import uuid
 from functools import wraps
-import psutil
+from contextlib import ExitStack
+from urllib.parse import quote
+from werkzeug.exceptions import HTTPException, BadRequest, Conflict, RequestEntityTooLarge, UnsupportedMediaType
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.security import safe_join
 import datetime
-import uuid
 import random
-from PIL import Image, ImageFilter, ImageEnhance, ImageOps
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps
 
 # Monkey patch Image.ANTIALIAS for compatibility with older moviepy versions
 if not hasattr(Image, 'ANTIALIAS'):
     Image.ANTIALIAS = Image.Resampling.LANCZOS
 
-import moviepy.editor as mp
-from moviepy.video.fx.all import fadein, fadeout
-import numpy as np
+# EXIF tag holding the camera orientation
+EXIF_ORIENTATION = 0x0112
+
+# The rendering stack (numpy, effects, render, encoder, moviepy) is imported
+# where it is used, so web processes that never render don't load it.
+from jobs import RenderJobQueue, DatabaseJobQueue
+from admission import AdmissionController
+from ratelimit import SlidingWindowLimiter
+from cache import TTLCache
+from passwords import PasswordHasher, HasherBusy, needs_rehash
+from storage import ContentStore, make_storage
+from storage_gc import StorageSweeper
+from upload_limits import UploadRequest, FORMATS, SNIFF_LIMIT, identify, check_pixels
+from upload_sessions import ChunkedUploads, IncompleteChunk, chunk_count, chunk_length
 
 app = Flask(__name__)
 
+# Behind a reverse proxy (e.g. the nginx that UPLOADS_SENDFILE hands files
+# to), request.remote_addr is the proxy's address: every client would share
+# one failed-login budget. TRUSTED_PROXY_HOPS=n takes the client address and
+# scheme from the X-Forwarded-For/-Proto headers set by the n proxies in
+# front of the app. Leave it at 0 when clients connect directly, or anyone
+# could pick their own address.
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 0))
+if TRUSTED_PROXY_HOPS > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS, x_proto=TRUSTED_PROXY_HOPS)
+
 # Use environment SECRET_KEY in production. Fallback to placeholder for local dev.
 app.secret_key = os.environ.get('SECRET_KEY', 'your-secret-key-here-change-in-production')
 app.config['PERMANENT_SESSION_LIFETIME'] = datetime.timedelta(days=7)
@@ -43,27 +84,102 @@ app.config['PERMANENT_SESSION_LIFETIME'] = datetime.timedelta(days=7)
 def make_session_permanent():
     session.permanent = True
 
-# Initialize DB
-init_db()
+# Database setup runs from startup(), not at import: once per process,
+# before the first request or explicitly from __main__
+_startup_lock = threading.Lock()
+_started = False
+
+def startup():
+    """Connect to the database, apply pending migrations and start the
+    storage sweeper and upload session expiry (once)"""
+    global _started
+    with _startup_lock:
+        if not _started:
+            init_db()
+            if STORAGE_GC_INTERVAL > 0:
+                storage_sweeper.start(STORAGE_GC_INTERVAL)
+            if UPLOAD_SESSION_GC_INTERVAL > 0:
+                chunked_uploads.start(UPLOAD_SESSION_GC_INTERVAL, UPLOAD_SESSION_TTL)
+            _started = True
+
+@app.before_request
+def ensure_started():
+    if not _started:
+        startup()
 
 # Configure upload folder
 app.config['UPLOAD_FOLDER'] = 'uploads'
-# No file size limit.
-app.config['MAX_CONTENT_LENGTH'] = None
+# Upload limits, checked while the body streams in (see upload_limits)
+app.config['MAX_PHOTOS'] = 10
+app.config['MAX_PHOTO_BYTES'] = int(os.environ.get('MAX_PHOTO_MB', 25)) * 1024 * 1024
+app.config['MAX_MUSIC_BYTES'] = int(os.environ.get('MAX_MUSIC_MB', 30)) * 1024 * 1024
+app.config['MAX_PHOTO_PIXELS'] = int(os.environ.get('MAX_PHOTO_MEGAPIXELS', 50)) * 1000 * 1000
+# Whole request: a full set of photos, the music and 1 MB for the form fields
+app.config['MAX_CONTENT_LENGTH'] = (
+    app.config['MAX_PHOTOS'] * app.config['MAX_PHOTO_BYTES'] + app.config['MAX_MUSIC_BYTES'] + 1024 * 1024
+)
+app.request_class = UploadRequest
 
 # Ensure upload folder exists
 if not os.path.exists(app.config['UPLOAD_FOLDER']):
     os.makedirs(app.config['UPLOAD_FOLDER'])
 
-from moviepy.video.fx.all import fadein, fadeout
-from moviepy.video.compositing.transitions import (
-    crossfadein,
-    slide_in,
-    slide_out,
-    fadein as comp_fadein,
-    fadeout as comp_fadeout
+# Who streams /uploads files: this process by default, or the front server
+# with UPLOADS_SENDFILE=x-accel-redirect (nginx) or x-sendfile (Apache,
+# lighttpd). The front server then also answers Range requests.
+UPLOADS_SENDFILE = os.environ.get('UPLOADS_SENDFILE', '').lower()
+SENDFILE_HEADERS = {'x-accel-redirect': 'X-Accel-Redirect', 'x-sendfile': 'X-Sendfile'}
+if UPLOADS_SENDFILE and not TRUSTED_PROXY_HOPS:
+    print("⚠️ UPLOADS_SENDFILE is set but TRUSTED_PROXY_HOPS is 0: failed logins are counted per proxy, not per client")
+# nginx `internal` location that aliases the upload folder
+UPLOADS_ACCEL_PREFIX = os.environ.get('UPLOADS_ACCEL_PREFIX', '/protected-uploads/')
+# Renders, their HLS pieces and thumbnails are uuid-named, uploads are named
+# by their SHA-256; none of them is ever rewritten
+IMMUTABLE_UPLOAD = re.compile(r'^(thumb_|music_)?[0-9a-f]{32,64}(_\w+)?\.\w+$', re.IGNORECASE)
+UPLOAD_MAX_AGE = 365 * 24 * 3600
+
+# Renditions written for every reel: the faststart MP4 always, plus
+# fragmented-MP4 HLS segments and playlist with VIDEO_FORMATS=mp4,hls
+VIDEO_FORMATS = [name.strip() for name in os.environ.get('VIDEO_FORMATS', 'mp4').lower().split(',')]
+HLS_SEGMENT_SECONDS = int(os.environ.get('HLS_SEGMENT_SECONDS', 4))
+
+# Uploads and renders live in a sharded layout under UPLOAD_FOLDER, or in an
+# S3-compatible bucket with STORAGE_BACKEND=s3 (see storage.make_storage)
+content_store = ContentStore(
+    make_storage(os.path.join(app.root_path, app.config['UPLOAD_FOLDER'])),
+    acquire=acquire_storage_object,
+    release=release_storage_object
 )
-from moviepy.video.compositing.CompositeVideoClip import CompositeVideoClip
+
+# Deletes upload files no video or render job refers to: one batch of
+# STORAGE_GC_BATCH files every STORAGE_GC_INTERVAL seconds (0, the default,
+# leaves it to `python storage_gc.py`). Files younger than
+# STORAGE_GC_GRACE seconds are always kept.
+STORAGE_GC_INTERVAL = float(os.environ.get('STORAGE_GC_INTERVAL', 0))
+storage_sweeper = StorageSweeper(
+    os.path.join(app.root_path, app.config['UPLOAD_FOLDER']),
+    get_referenced_files,
+    grace_seconds=float(os.environ.get('STORAGE_GC_GRACE', 3600)),
+    batch_size=int(os.environ.get('STORAGE_GC_BATCH', 500))
+)
+
+# Resumable uploads (see upload_sessions): chunks of UPLOAD_CHUNK_KB are kept
+# in UPLOAD_SESSION_DIR, which web processes must share, and sessions are
+# deleted UPLOAD_SESSION_TTL seconds after they start, checked every
+# UPLOAD_SESSION_GC_INTERVAL seconds
+UPLOAD_CHUNK_BYTES = int(os.environ.get('UPLOAD_CHUNK_KB', 1024)) * 1024
+UPLOAD_SESSION_TTL = float(os.environ.get('UPLOAD_SESSION_TTL', 24 * 3600))
+UPLOAD_SESSION_GC_INTERVAL = float(os.environ.get('UPLOAD_SESSION_GC_INTERVAL', 900))
+chunked_uploads = ChunkedUploads(
+    os.environ.get('UPLOAD_SESSION_DIR', os.path.join(app.root_path, 'upload_sessions')),
+    expire_sessions=expire_upload_sessions
+)
+# What each kind of upload session may hold
+UPLOAD_KINDS = {'photo': 'image', 'music': 'audio'}
+
+def hls_playlist(video_filename):
+    """Filename of the HLS playlist written next to a rendered MP4"""
+    return os.path.splitext(video_filename)[0] + '.m3u8'
 
 # Video Processor Class
 class VideoProcessor:
@@ -77,6 +193,11 @@ class VideoProcessor:
             'crossfade',
             'wipe'
         ]
+        # Processes used to render segments of a reel in parallel
+        self.render_workers = int(os.environ.get('RENDER_WORKERS', os.cpu_count() or 1))
+        # Threads decoding photos concurrently; each holds at most one
+        # draft-decoded photo, which bounds peak memory
+        self.decode_workers = int(os.environ.get('DECODE_WORKERS', min(4, os.cpu_count() or 1)))
         
     def organize_images(self, image_paths):
         """Organize images by filename"""
@@ -89,71 +210,73 @@ class VideoProcessor:
     def resize_image(self, image, max_size=(1920, 1080)):
         """Resize image to fit within max_size while maintaining aspect ratio"""
         try:
-            image.thumbnail(max_size, Image.Resampling.LANCZOS)
+            # reducing_gap lets PIL box-reduce large images before the LANCZOS pass
+            image.thumbnail(max_size, Image.Resampling.LANCZOS, reducing_gap=2.0)
             return image
         except Exception as e:
             print(f"Error resizing image: {e}")
             return image
     
+    def load_image(self, img_path, max_size):
+        """Decode a photo close to max_size, upright, in RGB"""
+        img = Image.open(img_path)
+        orientation = img.getexif().get(EXIF_ORIENTATION, 1)
+        # Orientations 5-8 are stored rotated by 90 degrees
+        stored_size = (max_size[1], max_size[0]) if orientation in (5, 6, 7, 8) else max_size
+        # JPEG: let libjpeg decode at 1/2, 1/4 or 1/8 scale when that is still
+        # at least stored_size, so 12-48 MP photos are never fully decoded
+        img.draft('RGB', stored_size)
+        img = ImageOps.exif_transpose(img)
+        img = self.resize_image(img, max_size)
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        return img
+
+    def prepare_image(self, img_path, max_size, effect_names):
+        """Load one photo and apply its effects, None if it cannot be used"""
+        try:
+            return self.apply_effects(self.load_image(img_path, max_size), effect_names)
+        except Exception as e:
+            print(f"Error processing image {img_path}: {e}")
+            return None
+
+    def prepare_images(self, image_paths, max_size, effect_stack=None):
+        """Decode and process photos concurrently, keeping their order"""
+        effect_names = [effect_stack or [random.choice(self.effects)] for _ in image_paths]
+        workers = max(1, min(self.decode_workers, len(image_paths)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(self.prepare_image, image_paths, [max_size] * len(image_paths), effect_names))
+
     def apply_effect(self, image, effect_name):
         """Apply visual effect to image"""
+        return self.apply_effects(image, [effect_name])
+
+    def apply_effects(self, image, effect_names):
+        """Apply a stack of visual effects to image in a single compiled pass"""
         try:
-            img = image.copy()
-            
-            if effect_name == 'blur':
-                return img.filter(ImageFilter.GaussianBlur(1))
-            elif effect_name == 'contrast':
-                enhancer = ImageEnhance.Contrast(img)
-                return enhancer.enhance(1.2)
-            elif effect_name == 'black_white':
-                return img.convert('L').convert('RGB')
-            elif effect_name == 'sepia':
-                # Convert to sepia
-                width, height = img.size
-                pixels = img.load()
-                
-                for py in range(height):
-                    for px in range(width):
-                        r, g, b = img.getpixel((px, py))
-                        
-                        tr = int(0.393 * r + 0.769 * g + 0.189 * b)
-                        tg = int(0.349 * r + 0.686 * g + 0.168 * b)
-                        tb = int(0.272 * r + 0.534 * g + 0.131 * b)
-                        
-                        pixels[px, py] = (min(tr, 255), min(tg, 255), min(tb, 255))
-                
-                return img
-            elif effect_name == 'vignette':
-                # Simple vignette effect
-                width, height = img.size
-                pixels = img.load()
-                
-                for y in range(height):
-                    for x in range(width):
-                        dx = (x - width/2) / (width/2)
-                        dy = (y - height/2) / (height/2)
-                        d = (dx**2 + dy**2) ** 0.5
-                        
-                        r, g, b = pixels[x, y]
-                        factor = 1 - d * 0.3
-                        pixels[x, y] = (
-                            int(r * factor),
-                            int(g * factor),
-                            int(b * factor)
-                        )
-                
-                return img
-            elif effect_name == 'colorize':
-                # Apply a color tint
-                return ImageOps.colorize(img.convert('L'), black='blue', white='white')
-            
-            return img
+            effect_names = [name for name in effect_names if name in self.effects]
+            if not effect_names:
+                return image.copy()
+            import numpy as np
+            from effects import apply_effects_array
+            frame = np.asarray(image.convert('RGB'))
+            return Image.fromarray(apply_effects_array(frame, effect_names))
         except Exception as e:
-            print(f"Error applying effect {effect_name}: {e}")
+            print(f"Error applying effects {effect_names}: {e}")
             return image
     
-    def create_video(self, image_paths, music_path, output_path):
-        """Create video from images and music."""
+    def create_video(self, image_paths, music_path, output_path, effect_stack=None, encoder_settings=None,
+                     workers=None):
+        """Create video from images and music.
+
+        effect_stack is an optional list of effect names applied to every
+        image; by default each image gets one randomly chosen effect.
+        encoder_settings overrides DEFAULT_ENCODER_SETTINGS (preset, crf,
+        threads, ...) for this job. workers is the number of processes the
+        timeline is rendered with (defaults to self.render_workers).
+        """
+        from render import KenBurns, Timeline, SIDES
+        from encoder import encode_timeline, probe_duration
         try:
             organized_images = self.organize_images(image_paths)
             if not organized_images:
@@ -161,40 +284,27 @@ class VideoProcessor:
 
             print(f"Processing {len(organized_images)} images...")
 
-            audio_clip = None
+            audio_path = None
+            audio_duration = None
             if music_path and os.path.exists(music_path):
-                try:
-                    print(f"🎵 Loading music from: {music_path}")
-                    audio_clip = mp.AudioFileClip(music_path)
+                print(f"🎵 Loading music from: {music_path}")
+                audio_duration = probe_duration(music_path)
+                if audio_duration is not None:
+                    # ffmpeg reads the music file directly while encoding
+                    audio_path = music_path
                     print("✅ Music loaded successfully")
-                except Exception as e:
-                    print(f"❌ Error loading music: {e}")
+                else:
+                    print(f"❌ Error loading music: ffmpeg could not read {music_path}")
 
             clips = []
             standard_size = (1280, 720)
             duration_per_image = 3  # seconds
 
-            for img_path in organized_images:
-                try:
-                    img = Image.open(img_path)
-                    img = self.resize_image(img, standard_size)
-                    
-                    if img.mode != 'RGB':
-                        img = img.convert('RGB')
-                    
-                    effect = random.choice(self.effects)
-                    processed_img = self.apply_effect(img, effect)
-                    
-                    img_array = np.array(processed_img)
-
-                    clip = mp.ImageClip(img_array).set_duration(duration_per_image)
-                    clip = clip.set_fps(24)
-
-                    clip = clip.fx(mp.vfx.resize, lambda t: 1 + 0.1 * t).set_pos(('center', 'center'))
-                    clips.append(clip)
-                except Exception as e:
-                    print(f"Error processing image {img_path}: {e}")
-                    continue
+            processed_images = self.prepare_images(organized_images, standard_size, effect_stack)
+            for processed_img in processed_images:
+                if processed_img is not None:
+                    # Zoom is rendered natively into full 1280x720 frames
+                    clips.append(KenBurns(processed_img, duration_per_image, fps=24, size=standard_size))
             
             if not clips:
                 return False, "No video clips could be created from the images.", None
@@ -202,68 +312,34 @@ class VideoProcessor:
             print(f"Created {len(clips)} clips. Applying transitions...")
 
             transition_duration = 0.5
-            video_clips = [clips[0]]
+            transitions = [
+                (random.choice(self.transitions), random.choice(SIDES))
+                for _ in range(len(clips) - 1)
+            ]
+            # At most two photos are on screen at any time; the timeline blends
+            # them into one reused frame buffer.
+            timeline = Timeline(clips, transitions, transition_duration, fps=24, size=standard_size)
+            total_duration = timeline.duration
 
-            for i in range(len(clips) - 1):
-                clip2 = clips[i+1]
-                
-                transition_name = random.choice(self.transitions)
-                
-                if transition_name == 'fade':
-                    transition = comp_fadein(clip2, transition_duration)
-                elif transition_name == 'slide_in':
-                    transition = slide_in(clip2, transition_duration, side=random.choice(['left', 'right', 'top', 'bottom']))
-                elif transition_name == 'slide_out':
-                    transition = slide_out(clip2, transition_duration, side=random.choice(['left', 'right', 'top', 'bottom']))
-                elif transition_name == 'crossfade':
-                    transition = crossfadein(clip2, transition_duration)
-                elif transition_name == 'wipe':
-                    # A simple wipe transition
-                    transition = CompositeVideoClip([
-                        clip2.set_pos(lambda t: (-(clip2.w * (transition_duration - t) / transition_duration), 0)),
-                        clips[i].set_pos((0, 0))
-                    ]).set_duration(transition_duration)
-                else: # Default to fade
-                    transition = comp_fadein(clip2, transition_duration)
-
-                # Position the next clip to start before the previous one ends
-                start_time = (i + 1) * duration_per_image - transition_duration
-                video_clips.append(transition.set_start(start_time))
-
-            final_video = CompositeVideoClip(video_clips, size=standard_size)
-            total_duration = duration_per_image * len(clips) - transition_duration * (len(clips) - 1)
-            final_video = final_video.set_duration(total_duration)
-
-            if audio_clip:
-                try:
-                    print(f"🔊 Attaching audio. Video duration: {total_duration:.2f}s, Audio duration: {audio_clip.duration:.2f}s")
-                    # Ensure the audio is not altered.
-                    final_video = final_video.set_audio(audio_clip)
-                    # If the audio is longer than the video, it will be trimmed to the video's duration.
-                    if audio_clip.duration > total_duration:
-                        final_video.audio = final_video.audio.subclip(0, total_duration)
-                    print("✅ Audio attached successfully")
-                except Exception as e:
-                    print(f"❌ Error setting audio: {e}")
-            
-            print("Writing video file...")
-            final_video.write_videofile(
+            if audio_path:
+                print(f"🔊 Attaching audio. Video duration: {total_duration:.2f}s, Audio duration: {audio_duration:.2f}s")
+
+            workers = workers or self.render_workers
+            print(f"Writing video file with {workers} worker(s)...")
+            # Frames are streamed straight into ffmpeg; if the audio is longer
+            # than the video it is trimmed to the video's duration.
+            encode_timeline(
+                timeline,
                 output_path,
-                fps=24,
-                codec='libx264',
-                audio_codec='aac' if audio_clip else None,
-                threads=4
+                audio_path=audio_path,
+                settings=encoder_settings,
+                workers=workers
             )
 
-            # Clean up
-            final_video.close()
-            if audio_clip:
-                audio_clip.close()
-
             print("✅ Video created successfully!")
             
-            duration = final_video.duration
-            resolution = f"{final_video.size[0]}x{final_video.size[1]}"
+            duration = total_duration
+            resolution = f"{standard_size[0]}x{standard_size[1]}"
             size = os.path.getsize(output_path) / (1024 * 1024)
             
             return True, "Video created successfully", {
@@ -279,6 +355,58 @@ class VideoProcessor:
 # Initialize video processor
 video_processor = VideoProcessor(app.config['UPLOAD_FOLDER'])
 
+# Renders run on a bounded pool of background workers, not in request threads.
+# RENDER_QUEUE=database hands them to worker.py processes through the
+# render_jobs table instead.
+RENDER_QUEUE = os.environ.get('RENDER_QUEUE', 'local')
+
+# Each render already fans out over render_workers processes, so by default
+# only as many renders run at once as there are cores to go round.
+admission = AdmissionController(
+    max_renders=max(1, int(os.environ.get(
+        'MAX_CONCURRENT_RENDERS',
+        (os.cpu_count() or 1) // video_processor.render_workers
+    ))),
+    max_queued=int(os.environ.get('MAX_QUEUED_RENDERS', 8)),
+    cpu_limit=float(os.environ.get('RENDER_CPU_LIMIT', 90)),
+    min_available_mb=int(os.environ.get('RENDER_MIN_MEMORY_MB', 512))
+)
+
+if RENDER_QUEUE == 'database':
+    render_queue = DatabaseJobQueue()
+    # Finished jobs this process has already dropped the video cache for
+    finished_jobs_seen = TTLCache(maxsize=4096, ttl=None, name='finished_jobs')
+else:
+    render_queue = RenderJobQueue(workers=int(os.environ.get('RENDER_JOB_WORKERS', 2)), admission=admission)
+
+# Password hashing runs on its own bounded pool so a burst of logins can't
+# take every core away from page rendering.
+password_hasher = PasswordHasher(
+    workers=int(os.environ.get('PASSWORD_HASH_WORKERS', 0)) or None,
+    max_pending=int(os.environ.get('PASSWORD_HASH_QUEUE', 32))
+)
+
+# Failed logins are counted in memory per email and per client address; the
+# users table is only written when an account actually gets locked.
+LOGIN_ATTEMPT_LIMIT = int(os.environ.get('LOGIN_ATTEMPT_LIMIT', 3))
+LOGIN_IP_ATTEMPT_LIMIT = int(os.environ.get('LOGIN_IP_ATTEMPT_LIMIT', 20))
+LOGIN_LOCKOUT_SECONDS = int(os.environ.get('LOGIN_LOCKOUT_SECONDS', 60))
+failed_logins_by_email = SlidingWindowLimiter(LOGIN_ATTEMPT_LIMIT, LOGIN_LOCKOUT_SECONDS)
+failed_logins_by_ip = SlidingWindowLimiter(LOGIN_IP_ATTEMPT_LIMIT, LOGIN_LOCKOUT_SECONDS)
+
+def login_locked(user):
+    """True while a lockout recorded in the database (by any process) is active"""
+    if (user.get('login_attempts') or 0) < LOGIN_ATTEMPT_LIMIT or not user.get('last_attempt'):
+        return False
+    return user['last_attempt'] > datetime.datetime.now() - datetime.timedelta(seconds=LOGIN_LOCKOUT_SECONDS)
+
+def record_failed_login(email, ip, user):
+    """Count a failed login; persist it only when it locks the account"""
+    failed_logins_by_ip.hit(ip)
+    attempts = failed_logins_by_email.hit(email)
+    if user and attempts >= LOGIN_ATTEMPT_LIMIT:
+        record_login_lockout(email, attempts)
+
 # ------------------------------
 # Decorators
 # ------------------------------
@@ -326,13 +454,18 @@ def auth():
 
         print(f"🔐 AUTH ATTEMPT - Action: {action}, Email: {email}, User Type: {user_type}")
 
-        attempts = get_login_attempts(email) if email else 0
-        if attempts >= 3 and action == 'login':
-            flash('Account temporarily locked due to too many failed attempts. Try again in 1 minute.')
-            return render_template('auth.html')
-
         if action == 'login':
-            user = get_user_by_email(email)
+            ip = request.remote_addr or 'unknown'
+            # Throttled clients are turned away before any DB or hashing work
+            if failed_logins_by_email.blocked(email) or failed_logins_by_ip.blocked(ip):
+                flash('Account temporarily locked due to too many failed attempts. Try again in 1 minute.')
+                return render_template('auth.html')
+
+            # User and persisted lockout state in one round trip
+            user = get_user_for_login(email) if email else None
+            if user and login_locked(user):
+                flash('Account temporarily locked due to too many failed attempts. Try again in 1 minute.')
+                return render_template('auth.html')
             
             # DEBUG INFORMATION
             print(f"🔍 LOGIN DEBUG - User found: {user is not None}")
@@ -344,9 +477,19 @@ def auth():
                 print(f"🔍 Password hash: {user['password_hash'][:50]}...")
                 print(f"🔍 Password provided: {password}")
             
-            # DIRECT PASSWORD CHECK (no safe_check function)
-            if user and check_password_hash(user['password_hash'], password):
+            # Password check runs on the bounded hashing pool
+            try:
+                password_ok = bool(user) and password_hasher.verify(user['password_hash'], password)
+            except HasherBusy:
+                flash('The server is busy. Please try again in a moment.')
+                return render_template('auth.html'), 503, {'Retry-After': '5'}
+
+            if password_ok:
                 print("✅ PASSWORD CHECK SUCCESSFUL!")
+                if needs_rehash(user['password_hash']):
+                    # Upgrade old hash parameters without delaying this login
+                    user_id = user['id']
+                    password_hasher.rehash_later(password, lambda new_hash: update_password_hash(user_id, new_hash))
                 
                 # Check if user type matches
                 if (user_type == 'admin' and not user['is_admin']) or (user_type == 'user' and user['is_admin']):
@@ -364,7 +507,9 @@ def auth():
                 session['is_admin'] = user['is_admin']
                 session['is_paid'] = user['is_paid']
 
-                reset_login_attempts(email)
+                failed_logins_by_email.reset(email)
+                if user['login_attempts']:
+                    reset_login_attempts(email)
                 flash('Login successful!')
 
                 if session['is_admin']:
@@ -374,7 +519,7 @@ def auth():
                 else:
                     return redirect(url_for('payment'))
             else:
-                increment_login_attempts(email)
+                record_failed_login(email, ip, user)
                 print("❌ PASSWORD CHECK FAILED!")
                 flash('Invalid email or password.')
                 return render_template('auth.html')
@@ -397,7 +542,11 @@ def auth():
                 flash('Email already registered. Please login.')
                 return render_template('auth.html')
 
-            hashed = generate_password_hash(password)
+            try:
+                hashed = password_hasher.hash(password)
+            except HasherBusy:
+                flash('The server is busy. Please try again in a moment.')
+                return render_template('auth.html'), 503, {'Retry-After': '5'}
             print(f"🔑 Creating new user with hash: {hashed[:50]}...")
             
             success = add_user(name, email, hashed, False, False)
@@ -437,6 +586,9 @@ def payment():
 def dashboard():
     # Get user's videos from database
     user_videos = get_videos_by_user(session['user_id'])
+    for video in user_videos:
+        has_hls = 'hls' in (video.get('formats') or '').split(',')
+        video['hls_playlist'] = hls_playlist(video['video_url']) if has_hls else None
     return render_template('dashboard.html', user=session.get('user'), videos=user_videos)
 
 @app.route('/logout')
@@ -455,8 +607,28 @@ def create():
 @login_required
 @payment_required
 def generate_video():
+    # Local renders must get a reservation before their uploads are saved;
+    # with RENDER_QUEUE=database each worker.py gates itself instead.
+    reserved = False
+    if RENDER_QUEUE != 'database':
+        reserved, reason, retry_after = admission.try_admit()
+        if not reserved:
+            print(f"⏳ Render rejected: {reason}")
+            return jsonify({
+                'success': False,
+                'message': f'{reason}. Please try again in {retry_after} seconds.',
+                'retry_after': retry_after
+            }), 503, {'Retry-After': str(retry_after)}
+    # Content store references taken for this render; unless a job is
+    # queued to own them they are dropped again on the way out
+    saved_files = []
+    music_filename = None
+    queued = False
     try:
-        photos = request.files.getlist('photos')
+        # Files already sent through /upload_sessions, or (older clients)
+        # the files themselves
+        upload_ids = request.form.getlist('upload_ids')
+        photos = upload_ids or request.files.getlist('photos')
         custom_music = request.files.get('custom_music')
         
         print(f"Received {len(photos)} photos")
@@ -468,92 +640,165 @@ def generate_video():
                 'message': 'Please select between 5 and 10 photos.'
             })
 
-        # Create upload directory if it doesn't exist
-        upload_dir = os.path.join(app.root_path, app.config['UPLOAD_FOLDER'])
-        if not os.path.exists(upload_dir):
-            os.makedirs(upload_dir, exist_ok=True)
-
-        # Save uploaded photos
-        saved_files = []
-        for photo in photos:
-            if photo and photo.filename:
-                # Generate a unique filename
-                file_ext = os.path.splitext(photo.filename)[1].lower()
-                if file_ext not in ['.jpg', '.jpeg', '.png']:
-                    continue
-                    
-                unique_filename = f"{uuid.uuid4().hex}{file_ext}"
-                save_path = os.path.join(upload_dir, unique_filename)
-                photo.save(save_path)
-                saved_files.append(save_path)
-
-        # Save custom music if provided
-        music_filename = None
-        if custom_music and custom_music.filename:
-            file_ext = os.path.splitext(custom_music.filename)[1].lower()
-            if file_ext in ['.mp3', '.wav']:
-                music_filename = f"music_{uuid.uuid4().hex}{file_ext}"
-                save_path = os.path.join(upload_dir, music_filename)
-                custom_music.save(save_path)
+        if upload_ids:
+            saved_files, music_filename = claim_uploads(upload_ids, request.form.get('music_upload_id'))
+        else:
+            # Save uploaded photos, once per distinct content. Their type was
+            # sniffed while they were uploaded, and names the stored file.
+            for photo in photos:
+                if photo and photo.filename:
+                    if photo.stream.kind != 'image':
+                        continue
+                    saved_files.append(content_store.put(photo.stream, photo.stream.extension))
+
+            # Save custom music if provided
+            if custom_music and custom_music.filename:
+                if custom_music.stream.kind == 'audio':
+                    music_filename = content_store.put(custom_music.stream, custom_music.stream.extension)
 
         # Check if we have enough valid images
         if len(saved_files) < 5:
-            # Clean up uploaded files
-            for file_path in saved_files:
-                try:
-                    os.remove(file_path)
-                except:
-                    pass
-            if music_filename:
-                try:
-                    os.remove(os.path.join(upload_dir, music_filename))
-                except:
-                    pass
             return jsonify({
                 'success': False,
                 'message': 'Please select at least 5 valid images (JPG, PNG).'
             })
 
-        # Generate a unique video filename
-        video_filename = f"{uuid.uuid4().hex}.mp4"
-        video_path = os.path.join(upload_dir, video_filename)
+        print(f"Queueing video creation with {len(saved_files)} images...")
+        if RENDER_QUEUE == 'database':
+            # Picked up by a worker.py process, possibly on another node
+            job_id = render_queue.submit({
+                'photos': saved_files,
+                'music_filename': music_filename
+            }, owner=session['user_id'])
+        else:
+            job_id = render_queue.submit(
+                render_reel,
+                session['user_id'],
+                saved_files,
+                music_filename,
+                owner=session['user_id']
+            )
+            reserved = False  # the queued job now owns the reservation
+        queued = True  # and the content store references
+
+        return jsonify({
+            'success': True,
+            'message': 'Your video is being generated.',
+            'job_id': job_id,
+            'status_url': url_for('job_status', job_id=job_id)
+        }), 202
+
+    except HTTPException as e:
+        # An upload limit or type check stopped the body mid-stream, or the
+        # upload sessions named could not be used
+        print(f"⛔ Upload rejected: {e.description}")
+        return jsonify({
+            'success': False,
+            'message': e.description
+        }), e.code
         
+    except Exception as e:
+        print(f"Error in generate_video: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'An error occurred: {str(e)}'
+        })
+
+    finally:
+        if not queued:
+            # Drop our references; the storage sweeper deletes unused files
+            for key in saved_files:
+                content_store.release(key)
+            content_store.release(music_filename)
+        if reserved:
+            admission.cancel()
+
+def claim_uploads(upload_ids, music_upload_id=None):
+    """Content store keys of the user's completed upload sessions: the
+    photos in upload_ids order, and the music. The references the sessions
+    held now belong to the caller."""
+    ids = list(upload_ids) + ([music_upload_id] if music_upload_id else [])
+    if len(set(ids)) != len(ids):
+        raise BadRequest('Each upload can only be used once.')
+    uploads = claim_upload_sessions(ids, session['user_id'])
+    if uploads is None:
+        raise Conflict('Some uploads are missing or unfinished. Please upload them again.')
+    photo_keys = []
+    music_key = None
+    for upload_id in ids:
+        kind, key = uploads[upload_id]
+        if upload_id != music_upload_id and kind == 'image':
+            photo_keys.append(key)
+        elif upload_id == music_upload_id and kind == 'audio':
+            music_key = key
+        else:
+            content_store.release(key)
+    return photo_keys, music_key
+
+def render_reel(user_id, photo_keys, music_filename, owned=None):
+    """Render job: create the video, its thumbnail and its database row.
+
+    photo_keys and music_filename are content_store keys; the photo
+    references are dropped when the job ends, the music one stays with the
+    video (or is dropped too if rendering fails). owned() is False once the
+    job has been handed to another worker: this render then neither adds a
+    video nor drops references, which now belong to that worker.
+    """
+    result = {'success': False}
+    try:
+        with ExitStack() as inputs:
+            # Local copies of the inputs (the stored files themselves on local storage)
+            saved_files = [inputs.enter_context(content_store.fetch(key)) for key in photo_keys]
+            music_path = inputs.enter_context(content_store.fetch(music_filename)) if music_filename else None
+            result = _render_outputs(user_id, saved_files, music_path, music_filename, owned)
+    finally:
+        # Also when a fetch, the render or storing its outputs raised. A
+        # written videos row means the job was still ours.
+        if result['success'] or owned is None or owned():
+            if not result['success']:
+                content_store.release(music_filename)
+            # The photos are no longer needed by this job
+            for key in photo_keys:
+                content_store.release(key)
+    return result
+
+def _render_outputs(user_id, saved_files, music_path, music_filename, owned=None):
+    """Render into scratch files, store them and add the videos row"""
+    video_filename = content_store.new_key('.mp4')
+    thumbnail_filename = content_store.new_key('.jpg', prefix='thumb_')
+    scratch_keys = (video_filename, thumbnail_filename)
+    try:
+        video_path = content_store.scratch_path(video_filename)
+    
         print(f"Starting video creation with {len(saved_files)} images...")
-        
+        hls = 'hls' in VIDEO_FORMATS
+    
         # Create video using our processor
         success, message, video_data = video_processor.create_video(
             saved_files,
-            os.path.join(upload_dir, music_filename) if music_filename else None,
-            video_path
+            music_path,
+            video_path,
+            # A keyframe every segment (reels are 24 fps), so HLS can stream-copy
+            encoder_settings={'keyint': 24 * HLS_SEGMENT_SECONDS} if hls else None
         )
-        
+    
         if not success:
-            # Clean up uploaded files
-            for file_path in saved_files:
-                try:
-                    os.remove(file_path)
-                except:
-                    pass
-            if music_filename:
-                try:
-                    os.remove(os.path.join(upload_dir, music_filename))
-                except:
-                    pass
-            return jsonify({
+            return {
                 'success': False,
                 'message': message
-            })
-        
+            }
+    
         # Generate thumbnail
-        thumbnail_filename = f"thumb_{uuid.uuid4().hex}.jpg"
-        thumbnail_path = os.path.join(upload_dir, thumbnail_filename)
+        thumbnail_path = content_store.scratch_path(thumbnail_filename)
         try:
             print(f"🖼️ Generating thumbnail for video: {video_filename}")
             # Use a fresh clip object for thumbnail generation to avoid closed clip issues
-            with mp.VideoFileClip(video_path) as clip:
+            from moviepy.video.io.VideoFileClip import VideoFileClip
+            with VideoFileClip(video_path) as clip:
                 clip.save_frame(thumbnail_path, t=1.00) # Save frame at 1 second
-            
+        
             if os.path.exists(thumbnail_path):
+                content_store.save(thumbnail_filename, thumbnail_path)
                 print(f"✅ Thumbnail generated successfully: {thumbnail_filename}")
             else:
                 print("❌ Thumbnail generation failed: File not found after saving.")
@@ -561,43 +806,278 @@ def generate_video():
         except Exception as e:
             print(f"❌ Error generating thumbnail: {e}")
             thumbnail_filename = None # Set to None if thumbnail fails
-        
+
+        formats = ['mp4']
+        if hls:
+            try:
+                from encoder import package_hls
+                playlist_key = hls_playlist(video_filename)
+                pieces = package_hls(video_path, content_store.scratch_path(playlist_key), HLS_SEGMENT_SECONDS)
+                # Segments are written next to the playlist and keep its directory
+                directory = os.path.dirname(playlist_key)
+                for piece in pieces:
+                    content_store.save(f"{directory}/{os.path.basename(piece)}", piece)
+                formats.append('hls')
+            except OSError as e:
+                # The MP4 still plays everywhere
+                print(f"❌ Error packaging HLS: {e}")
+
+        # Stored last: a videos row only ever names a complete render
+        content_store.save(video_filename, video_path)
+
+        if owned is not None and not owned():
+            # Another worker renders this job now and adds its row
+            return {
+                'success': False,
+                'message': 'Render job was handed to another worker.'
+            }
+    
         # Add video to database with all metadata
-        add_video(
-            user_id=session['user_id'],
+        if not add_video(
+            user_id=user_id,
             video_url=video_filename,
             thumbnail_url=thumbnail_filename,
             title=f"Video_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}",
             music_file=music_filename,
             duration=video_data.get('duration'),
             resolution=video_data.get('resolution'),
-            size=video_data.get('size')
-        )
-
-        # Clean up uploaded photos
-        for file_path in saved_files:
-            try:
-                os.remove(file_path)
-            except:
-                pass
+            size=video_data.get('size'),
+            formats=','.join(formats)
+        ):
+            # The storage sweeper removes the stored files from the upload
+            # folder; it does not walk S3 buckets
+            return {
+                'success': False,
+                'message': 'Could not save the video. Please try again.'
+            }
 
-        return jsonify({
+        return {
             'success': True,
             'message': message,
             'video_url': video_filename
-        })
-        
-    except Exception as e:
-        print(f"Error in generate_video: {e}")
-        return jsonify({
-            'success': False,
-            'message': f'An error occurred: {str(e)}'
-        })
+        }
+    finally:
+        # On success every scratch file has been stored (and removed) already
+        _discard_scratch(*scratch_keys)
+
+def _discard_scratch(video_filename, thumbnail_filename):
+    """Delete what a render left in the scratch folder of remote storage:
+    the MP4, its thumbnail and HLS pieces that were not stored.
 
-@app.route('/uploads/<filename>')
+    On local storage the scratch files are the stored files, which the
+    storage sweeper removes once no videos row names them.
+    """
+    if content_store.path(video_filename) is not None:
+        return
+    video_path = content_store.scratch_path(video_filename)
+    directory = os.path.dirname(video_path)
+    # The MP4, the HLS playlist and its pieces all start with the video's uuid
+    stem = os.path.splitext(os.path.basename(video_path))[0]
+    paths = [content_store.scratch_path(thumbnail_filename)]
+    paths += [os.path.join(directory, name) for name in os.listdir(directory) if name.startswith(stem)]
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+@app.route('/jobs/<job_id>')
+@login_required
+def job_status(job_id):
+    job = render_queue.get(job_id)
+    if not job or (job['owner'] != session['user_id'] and not session.get('is_admin', False)):
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+    if job['status'] == 'done' and RENDER_QUEUE == 'database' and not finished_jobs_seen.get(job_id):
+        # add_video ran in a worker process, so this process' cache is stale;
+        # once per job, not on every poll of a finished one
+        invalidate_user_videos(job['owner'])
+        finished_jobs_seen.set(job_id, True)
+    for key in ('created_at', 'started_at', 'finished_at'):
+        if job.get(key):
+            job[key] = str(job[key])
+    return jsonify({'success': True, 'job': job})
+
+# Resumable uploads: POST /upload_sessions, PUT each chunk, POST .../complete
+def upload_session_json(upload):
+    return {
+        'success': True,
+        'upload_id': upload['id'],
+        'chunk_size': upload['chunk_size'],
+        'chunk_count': chunk_count(upload['size'], upload['chunk_size']),
+        'received': chunked_uploads.received(upload['id']),
+        'complete': upload['object_key'] is not None
+    }
+
+def upload_error(e):
+    """JSON response for an HTTPException raised by an upload check"""
+    return jsonify({'success': False, 'message': e.description}), e.code
+
+def owned_upload_session(session_id):
+    upload = get_upload_session(session_id)
+    if not upload or upload['user_id'] != session['user_id']:
+        return None
+    return upload
+
+def check_upload_header(upload, header, final=True):
+    """Extension of a session's file from its first bytes; None while more
+    are needed. Raises like upload_limits' streaming checks."""
+    identified = identify(upload['filename'], header, final)
+    if identified is None:
+        return None
+    file_format, width, height = identified
+    kind, extension = FORMATS[file_format]
+    if kind != upload['kind']:
+        raise UnsupportedMediaType(f"{upload['filename']} is not {'a photo' if upload['kind'] == 'image' else 'music'}.")
+    if kind == 'image':
+        check_pixels(upload['filename'], width, height, app.config['MAX_PHOTO_PIXELS'])
+    return extension
+
+@app.route('/upload_sessions', methods=['POST'])
+@login_required
+@payment_required
+def start_upload():
+    data = request.get_json(silent=True) or {}
+    kind = UPLOAD_KINDS.get(data.get('kind'))
+    filename = str(data.get('filename') or 'upload')
+    size = data.get('size')
+    sha256 = str(data.get('sha256') or '').lower() or None
+    if kind is None or not isinstance(size, int) or size <= 0:
+        return jsonify({'success': False, 'message': 'An upload needs a kind (photo or music) and a size.'}), 400
+    if sha256 and not re.fullmatch(r'[0-9a-f]{64}', sha256):
+        return jsonify({'success': False, 'message': 'sha256 must be 64 hex digits.'}), 400
+    limit = app.config['MAX_PHOTO_BYTES'] if kind == 'image' else app.config['MAX_MUSIC_BYTES']
+    if size > limit:
+        return upload_error(RequestEntityTooLarge(f'{filename} is larger than {limit // (1024 * 1024)} MB.'))
+    session_id = uuid.uuid4().hex
+    if not create_upload_session(session_id, session['user_id'], kind, filename, size, UPLOAD_CHUNK_BYTES, sha256):
+        return jsonify({'success': False, 'message': 'Could not start the upload. Please try again.'}), 500
+    chunked_uploads.create(session_id)
+    return jsonify(upload_session_json(get_upload_session(session_id))), 201
+
+@app.route('/upload_sessions/<session_id>')
+@login_required
+def upload_status(session_id):
+    upload = owned_upload_session(session_id)
+    if not upload:
+        return jsonify({'success': False, 'message': 'Upload not found'}), 404
+    return jsonify(upload_session_json(upload))
+
+@app.route('/upload_sessions/<session_id>/chunks/<int:index>', methods=['PUT'])
+@login_required
+def upload_chunk(session_id, index):
+    upload = owned_upload_session(session_id)
+    if not upload:
+        return jsonify({'success': False, 'message': 'Upload not found'}), 404
+    if upload['object_key']:
+        return jsonify({'success': False, 'message': 'Upload is already complete'}), 409
+    count = chunk_count(upload['size'], upload['chunk_size'])
+    if index >= count:
+        return jsonify({'success': False, 'message': f'Chunk {index} is out of range'}), 404
+    length = chunk_length(upload['size'], upload['chunk_size'], index)
+    if request.content_length != length:
+        return jsonify({'success': False, 'message': f'Chunk {index} must be {length} bytes'}), 400
+    try:
+        chunked_uploads.write_chunk(session_id, index, request.stream, length)
+        if index == 0:
+            # Turn away files of the wrong type before the rest is sent
+            with chunked_uploads.open(session_id, 1) as reader:
+                check_upload_header(upload, reader.read(SNIFF_LIMIT), final=count == 1 or length >= SNIFF_LIMIT)
+    except IncompleteChunk as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except HTTPException as e:
+        return upload_error(e)
+    return jsonify({'success': True, 'index': index})
+
+@app.route('/upload_sessions/<session_id>/complete', methods=['POST'])
+@login_required
+def complete_upload(session_id):
+    upload = owned_upload_session(session_id)
+    if not upload:
+        return jsonify({'success': False, 'message': 'Upload not found'}), 404
+    if upload['object_key']:
+        return jsonify(upload_session_json(upload))
+    count = chunk_count(upload['size'], upload['chunk_size'])
+    received = chunked_uploads.received(session_id)
+    if len(received) != count:
+        response = upload_session_json(upload)
+        response.update(success=False, message=f'{count - len(received)} chunks are missing')
+        return jsonify(response), 409
+    try:
+        with chunked_uploads.open(session_id, count) as reader:
+            extension = check_upload_header(upload, reader.read(SNIFF_LIMIT))
+        with chunked_uploads.open(session_id, count) as reader:
+            key = content_store.put(reader, extension)
+    except HTTPException as e:
+        return upload_error(e)
+    except RuntimeError as e:
+        print(f"❌ Error storing upload {session_id}: {e}")
+        return jsonify({'success': False, 'message': 'Could not finish the upload. Please try again.'}), 500
+    # Content keys are the file's SHA-256
+    if upload['sha256'] and os.path.splitext(os.path.basename(key))[0] != upload['sha256']:
+        content_store.release(key)
+        # Which chunk was damaged is unknown: the client sends them all again
+        chunked_uploads.remove(session_id)
+        chunked_uploads.create(session_id)
+        response = upload_session_json(upload)
+        response.update(success=False, message='Checksum mismatch. Please upload the file again.')
+        return jsonify(response), 422
+    if not complete_upload_session(session_id, key):
+        # Completed by a concurrent request, expired, or the database failed
+        content_store.release(key)
+    upload = get_upload_session(session_id)
+    if not upload:
+        return jsonify({'success': False, 'message': 'Upload not found'}), 404
+    if not upload['object_key']:
+        return jsonify({'success': False, 'message': 'Could not finish the upload. Please try again.'}), 500
+    chunked_uploads.remove(session_id)
+    return jsonify(upload_session_json(upload))
+
+# <path:...> serves sharded keys (ab/cd/name) and the flat names of older uploads
+@app.route('/uploads/<path:filename>')
 @login_required
 def download_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    # Files in the upload folder first: everything on local storage, and
+    # uploads from before a switch to S3
+    path = safe_join(os.path.join(app.root_path, app.config['UPLOAD_FOLDER']), filename)
+    if path is None or not os.path.isfile(path):
+        # Object storage: the client downloads straight from the bucket
+        url = content_store.url(filename) if path is not None else None
+        if url is None or not content_store.exists(filename):
+            abort(404)
+        if filename.endswith('.m3u8'):
+            # Served from here, the playlist's relative segment URIs resolve
+            # to /uploads too, and each segment gets its own presigned URL
+            with content_store.fetch(filename) as playlist, open(playlist, 'rb') as f:
+                response = app.response_class(f.read(), mimetype='application/vnd.apple.mpegurl')
+            response.headers['Cache-Control'] = f'private, max-age={UPLOAD_MAX_AGE}, immutable'
+            return response
+        response = redirect(url)
+        # The presigned URL expires, so the redirect must not outlive it
+        response.headers['Cache-Control'] = 'private, no-store'
+        return response
+    stat = os.stat(path)
+    # Strong validator from the file's identity; a replaced file gets a new one
+    etag = f"{stat.st_ino:x}-{stat.st_size:x}-{stat.st_mtime_ns:x}"
+    header = SENDFILE_HEADERS.get(UPLOADS_SENDFILE)
+    if header:
+        response = app.response_class(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        response.set_etag(etag)
+        response.last_modified = stat.st_mtime
+        response = response.make_conditional(request)
+        if response.status_code != 304:
+            response.headers[header] = (
+                UPLOADS_ACCEL_PREFIX + quote(filename) if UPLOADS_SENDFILE == 'x-accel-redirect' else path
+            )
+    else:
+        # Answers Range with 206 and If-None-Match/If-Modified-Since with 304
+        response = send_file(path, etag=etag, last_modified=stat.st_mtime, conditional=True)
+        response.accept_ranges = 'bytes'
+    # private: these are only served to logged-in users
+    if IMMUTABLE_UPLOAD.match(os.path.basename(filename)):
+        response.headers['Cache-Control'] = f'private, max-age={UPLOAD_MAX_AGE}, immutable'
+    else:
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 # Additional routes
 @app.route('/get-started')
@@ -610,21 +1090,92 @@ def get_started():
     else:
         return redirect(url_for('auth'))
 
+# Rows per page in the admin user and video tables
+ADMIN_PAGE_SIZE = 50
+
+def admin_page_args():
+    """limit and cursor query parameters of the admin list endpoints"""
+    limit = min(max(request.args.get('limit', ADMIN_PAGE_SIZE, type=int), 1), 200)
+    return limit, request.args.get('cursor') or None
+
+def serialize_rows(rows):
+    """Stringify timestamps so rows can be returned as JSON"""
+    for row in rows:
+        if row.get('created_at'):
+            row['created_at'] = str(row['created_at'])
+    return rows
+
 @app.route('/admin')
 @login_required
 @admin_required
 def admin_dashboard():
     try:
-        users = get_all_users()
-        videos = get_all_videos()
-        total_users = len(users) if users else 0
-        total_reels = len(videos) if videos else 0
+        # Only the first page of each table is rendered; the rest is loaded
+        # on demand from /admin/users and /admin/videos.
+        users, users_cursor = get_users_page(ADMIN_PAGE_SIZE)
+        videos, videos_cursor = get_videos_page(ADMIN_PAGE_SIZE)
+        stats = get_admin_stats()
         return render_template('admin.html', users=users, videos=videos,
-                               total_users=total_users, total_reels=total_reels)
+                               users_cursor=users_cursor, videos_cursor=videos_cursor,
+                               stats=stats, total_users=stats['total_users'], total_reels=stats['total_reels'],
+                               render_load=admission.state(), db_pool=get_pool_stats(),
+                               caches=get_cache_stats())
     except Exception as e:
         flash('Error accessing admin panel: ' + str(e))
         return redirect(url_for('index'))
 
+@app.route('/admin/users')
+@login_required
+@admin_required
+def admin_list_users():
+    limit, cursor = admin_page_args()
+    try:
+        users, next_cursor = get_users_page(limit, cursor)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid cursor'}), 400
+    return jsonify({'success': True, 'users': serialize_rows(users), 'next_cursor': next_cursor})
+
+@app.route('/admin/videos')
+@login_required
+@admin_required
+def admin_list_videos():
+    limit, cursor = admin_page_args()
+    try:
+        videos, next_cursor = get_videos_page(limit, cursor)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid cursor'}), 400
+    return jsonify({'success': True, 'videos': serialize_rows(videos), 'next_cursor': next_cursor})
+
+@app.route('/admin/stats')
+@login_required
+@admin_required
+def admin_stats():
+    return jsonify({'success': True, 'stats': get_admin_stats()})
+
+@app.route('/admin/render_load')
+@login_required
+@admin_required
+def admin_render_load():
+    return jsonify({'success': True, 'render_load': admission.state()})
+
+@app.route('/admin/db_pool')
+@login_required
+@admin_required
+def admin_db_pool():
+    return jsonify({'success': True, 'db_pool': get_pool_stats()})
+
+@app.route('/admin/cache')
+@login_required
+@admin_required
+def admin_cache():
+    return jsonify({'success': True, 'caches': get_cache_stats()})
+
+@app.route('/admin/storage')
+@login_required
+@admin_required
+def admin_storage():
+    return jsonify({'success': True, 'storage': storage_sweeper.stats()})
+
 @app.route('/admin/get_user/<int:user_id>')
 @login_required
 @admin_required
@@ -661,7 +1212,10 @@ def admin_add_user():
         if get_user_by_email(email):
             return jsonify({'success': False, 'message': 'Email already registered'})
             
-        hashed = generate_password_hash(password)
+        try:
+            hashed = password_hasher.hash(password)
+        except HasherBusy:
+            return jsonify({'success': False, 'message': 'The server is busy. Please try again.'}), 503, {'Retry-After': '5'}
         is_admin = (role == 'admin')
         
         # By default give paid access to manually added users if needed, or default to False
@@ -710,4 +1264,5 @@ if __name__ == '__main__':
     uploads_folder = os.path.join(app.root_path, app.config['UPLOAD_FOLDER'])
     if not os.path.exists(uploads_folder):
         os.makedirs(uploads_folder, exist_ok=True)
+    startup()
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,103 @@
+"""HTTP load test for POST /auth.
+
+Runs against a live server, e.g.:
+
+    python app.py &
+    python benchmarks/bench_auth.py --email admin@sanpai.com --password admin123 --user-type admin
+
+Each thread keeps one connection open and logs in repeatedly. A share of
+requests (--wrong-ratio) use a wrong password for a separate victim account
+(--victim), which exercises the failed-login and lockout path, and another
+share spray random unknown emails. Prints logins per second and latency
+percentiles per kind of request.
+"""
+import argparse
+import http.client
+import random
+import statistics
+import threading
+import time
+import uuid
+from urllib.parse import urlencode, urlsplit
+
+
+def login_body(email, password, user_type):
+    return urlencode({'action': 'login', 'email': email, 'password': password, 'user_type': user_type})
+
+
+def worker(url, args, deadline, results, lock):
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+    rng = random.Random(threading.get_ident())
+    local = {'ok': [], 'wrong': [], 'unknown': [], 'errors': 0}
+    while time.perf_counter() < deadline:
+        draw = rng.random()
+        if draw < args.unknown_ratio:
+            kind, body = 'unknown', login_body(f"{uuid.uuid4().hex}@example.com", 'x', 'user')
+        elif draw < args.unknown_ratio + args.wrong_ratio:
+            kind, body = 'wrong', login_body(args.victim, 'wrong-password', 'user')
+        else:
+            kind, body = 'ok', login_body(args.email, args.password, args.user_type)
+        started = time.perf_counter()
+        try:
+            conn.request('POST', parts.path or '/auth', body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            local['errors'] += 1
+            conn.close()
+            conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+            continue
+        local[kind].append(time.perf_counter() - started)
+    conn.close()
+    with lock:
+        for key in ('ok', 'wrong', 'unknown'):
+            results[key].extend(local[key])
+        results['errors'] += local['errors']
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test POST /auth')
+    parser.add_argument('--url', default='http://127.0.0.1:5000/auth')
+    parser.add_argument('--email', default='admin@sanpai.com')
+    parser.add_argument('--password', default='admin123')
+    parser.add_argument('--user-type', default='admin')
+    parser.add_argument('--victim', default='victim@example.com', help='account used for wrong-password requests')
+    parser.add_argument('--wrong-ratio', type=float, default=0.25, help='share of requests with a wrong password')
+    parser.add_argument('--unknown-ratio', type=float, default=0.0, help='share of requests for unknown emails')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds to run')
+    args = parser.parse_args()
+
+    results = {'ok': [], 'wrong': [], 'unknown': [], 'errors': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+    threads = [
+        threading.Thread(target=worker, args=(args.url, args, deadline, results, lock))
+        for _ in range(args.threads)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    total = sum(len(results[key]) for key in ('ok', 'wrong', 'unknown'))
+    print(f"{total} requests in {elapsed:.1f}s with {args.threads} threads: {total / elapsed:.1f} logins/s "
+          f"({results['errors']} errors)")
+    for key in ('ok', 'wrong', 'unknown'):
+        samples = results[key]
+        if samples:
+            print(f"  {key:8s} {len(samples):6d} req  {len(samples) / elapsed:8.1f}/s  "
+                  f"p50 {statistics.median(samples) * 1000:7.1f} ms  p95 {percentile(samples, 0.95) * 1000:7.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Startup cost of the web and render roles.
+
+Each sample runs in a fresh interpreter, e.g.:
+
+    python benchmarks/bench_startup.py --repeat 5
+    python benchmarks/bench_startup.py --with-db   # also time startup() on in-memory SQLite
+
+The web role imports app. The render role imports worker and everything a
+render loads on first use. Prints the median import time and resident
+memory per role, and the heaviest modules that were loaded.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROLES = {
+    'web': ['app'],
+    # What worker.run_job and VideoProcessor import before the first frame
+    'render': ['worker', 'app', 'numpy', 'effects', 'render', 'encoder', 'moviepy.video.io.VideoFileClip'],
+}
+
+# Runs in the child; prints one JSON line
+PROBE = '''
+import importlib, json, sys, time
+started = time.perf_counter()
+for name in {modules!r}:
+    importlib.import_module(name)
+imported = time.perf_counter() - started
+startup = None
+if {with_db!r}:
+    import app
+    started = time.perf_counter()
+    app.startup()
+    startup = time.perf_counter() - started
+import psutil
+heavy = [name for name in ('moviepy', 'numpy', 'scipy', 'imageio', 'IPython') if name in sys.modules]
+print(json.dumps({{'import': imported, 'startup': startup, 'rss': psutil.Process().memory_info().rss, 'heavy': heavy}}))
+'''
+
+
+def sample(modules, with_db):
+    env = dict(os.environ)
+    if with_db:
+        env.update(DB_BACKEND='sqlite', DB_PATH=':memory:')
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE.format(modules=modules, with_db=with_db)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure import time and RSS per process role')
+    parser.add_argument('--role', choices=sorted(ROLES), action='append', help='role to measure (default: all)')
+    parser.add_argument('--repeat', type=int, default=5, help='fresh processes per role')
+    parser.add_argument('--with-db', action='store_true', help='also time app.startup() against in-memory SQLite')
+    args = parser.parse_args()
+
+    for role in args.role or sorted(ROLES):
+        samples = [sample(ROLES[role], args.with_db) for _ in range(args.repeat)]
+        line = (f"{role:7s} import {statistics.median(s['import'] for s in samples) * 1000:7.1f} ms  "
+                f"RSS {statistics.median(s['rss'] for s in samples) / (1024 * 1024):6.1f} MB")
+        if args.with_db:
+            line += f"  startup {statistics.median(s['startup'] for s in samples) * 1000:7.1f} ms"
+        print(f"{line}  loaded: {', '.join(samples[-1]['heavy']) or 'none of moviepy/numpy/scipy'}")
+
+
+if __name__ == '__main__':
+    main()
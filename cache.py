@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Small in-process cache for read-mostly query results. Entries expire after
+# `ttl` seconds and the least recently used ones are evicted beyond
+# `maxsize`; writers call invalidate() so readers never wait out the TTL for
+# their own changes. A reader takes generation(key) before querying and
+# passes it to set(), which then skips results that an invalidate() during
+# the query made stale.
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after ttl seconds"""
+
+    def __init__(self, maxsize=1024, ttl=60.0, name='cache'):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._entries = OrderedDict()
+        # Invalidation counter, the count at each key's latest invalidation
+        # (at most maxsize keys) and at the latest one no longer tracked
+        self._generation = 0
+        self._invalidated = OrderedDict()
+        self._invalidated_floor = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, default=None):
+        """Cached value for key, or default on a miss"""
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def generation(self, key):
+        """Token for set(): take it before reading the value to cache"""
+        with self._lock:
+            return self._generation
+
+    def set(self, key, value, generation=None):
+        """Cache value for key, unless key was invalidated after generation
+        was taken; returns whether it was cached"""
+        with self._lock:
+            if generation is not None and self._invalidated.get(key, self._invalidated_floor) > generation:
+                return False
+            expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return True
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generation += 1
+            self._invalidated[key] = self._generation
+            self._invalidated.move_to_end(key)
+            while len(self._invalidated) > self.maxsize:
+                _, generation = self._invalidated.popitem(last=False)
+                self._invalidated_floor = max(self._invalidated_floor, generation)
+            if self._entries.pop(key, _MISSING) is not _MISSING:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._invalidated.clear()
+            self._invalidated_floor = self._generation
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
@@ -1,144 +1,107 @@
-import mysql.connector
-from mysql.connector import Error
 import os
-from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+import json
+from datetime import datetime, timedelta
+from pool import ConnectionPool
+from migrations import migrate
+from cache import TTLCache
+from db_backends import make_backend
+
+class DatabaseError(Exception):
+    """Base class for errors raised by this module itself"""
+
+class PoolExhaustedError(DatabaseError):
+    """No pooled connection became free within DB_POOL_TIMEOUT"""
 
 class Database:
-    def __init__(self):
-        self.host = 'localhost'
-        self.user = 'root'
-        self.password = ''
-        self.database = 'sanpai_db'
-        self.connection = None
-        self.connect()
-        self.init_db()
+    def __init__(self, backend):
+        self.backend = backend
+        # Each Flask thread borrows its own connection for the length of a query
+        self.pool = ConnectionPool(
+            backend.connect,
+            size=backend.pool_size,
+            timeout=float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            check=backend.check,
+            reset=backend.reset,
+            check_after=float(os.environ.get('DB_POOL_CHECK_AFTER', 30)),
+            max_age=float(os.environ.get('DB_POOL_MAX_AGE', 3600)),
+            timeout_error=PoolExhaustedError
+        )
 
     def connect(self):
-        """Establish database connection"""
+        """Check that the database is reachable, creating it if it is missing"""
         try:
-            self.connection = mysql.connector.connect(
-                host=self.host,
-                user=self.user,
-                password=self.password,
-                database=self.database
-            )
-            if self.connection.is_connected():
-                print("✅ Connected to MySQL database")
+            with self.connection() as conn:
+                if conn.is_connected():
+                    print(f"✅ Connected to {self.backend.describe()} (pool size {self.pool.size})")
         except Error as e:
-            print(f"❌ Error connecting to MySQL: {e}")
-            self.create_database()
+            print(f"❌ Error connecting to {self.backend.describe()}: {e}")
+            self.backend.handle_connect_error(e)
 
-    def create_database(self):
-        """Create database and tables if they don't exist"""
-        try:
-            conn = mysql.connector.connect(
-                host=self.host,
-                user=self.user,
-                password=self.password
-            )
-            cursor = conn.cursor()
-            cursor.execute(f"CREATE DATABASE IF NOT EXISTS {self.database}")
-            cursor.close()
-            conn.close()
-            
-            self.connection = mysql.connector.connect(
-                host=self.host,
-                user=self.user,
-                password=self.password,
-                database=self.database
-            )
-            self.init_db()
-        except Error as e:
-            print(f"❌ Error creating database: {e}")
+    def connection(self):
+        """Borrow a pooled connection: `with db.connection() as conn: ...`"""
+        return self.pool.connection()
+
+    def close(self):
+        """Close idle pooled connections (and an in-memory database)"""
+        self.pool.close()
+        self.backend.close()
 
     def init_db(self):
-        """Initialize database tables"""
+        """Connect and bring the schema up to date; a no-op when it already is"""
+        self.connect()
         try:
-            cursor = self.connection.cursor()
-            
-            # Users table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    name VARCHAR(255) NOT NULL,
-                    email VARCHAR(255) UNIQUE NOT NULL,
-                    password_hash VARCHAR(255) NOT NULL,
-                    is_admin BOOLEAN DEFAULT FALSE,
-                    is_paid BOOLEAN DEFAULT FALSE,
-                    login_attempts INT DEFAULT 0,
-                    last_attempt TIMESTAMP NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            
-            # Videos table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS videos (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    user_id INT NOT NULL,
-                    title VARCHAR(255) NOT NULL,
-                    video_url VARCHAR(500) NOT NULL,
-                    music_style VARCHAR(100),
-                    music_file VARCHAR(255),
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-                )
-            ''')
-            
-            # Add new columns to videos table if they don't exist
-            video_columns = {
-                'thumbnail_url': 'VARCHAR(500)',
-                'duration': 'FLOAT',
-                'resolution': 'VARCHAR(50)',
-                'size': 'FLOAT'
-            }
-            
-            cursor.execute("SHOW COLUMNS FROM videos")
-            existing_columns = [col[0] for col in cursor.fetchall()]
-            
-            for col_name, col_type in video_columns.items():
-                if col_name not in existing_columns:
-                    cursor.execute(f"ALTER TABLE videos ADD COLUMN {col_name} {col_type}")
-            
-            # Create default admin user if not exists
-            admin_password_hash = generate_password_hash('admin123')
-            print(f"🔑 Creating admin user with hash: {admin_password_hash[:50]}...")
-            
-            cursor.execute('''
-                INSERT IGNORE INTO users (name, email, password_hash, is_admin, is_paid) 
-                VALUES (%s, %s, %s, %s, %s)
-            ''', ('Admin', 'admin@sanpai.com', admin_password_hash, True, True))
-            
-            self.connection.commit()
-            cursor.close()
-            print("✅ Database initialized successfully")
-            
-        except Error as e:
+            with self.connection() as conn:
+                applied = migrate(conn, self.backend.name)
+            if applied:
+                print(f"✅ Database migrated to version {applied[-1]}")
+            else:
+                print("✅ Database schema is up to date")
+        except (Error, RuntimeError) as e:
             print(f"❌ Error initializing database: {e}")
 
-    def get_connection(self):
-        """Get database connection"""
-        if not self.connection or not self.connection.is_connected():
-            self.connect()
-        return self.connection
+# Create global database instance. DB_BACKEND picks MySQL (default) or an
+# embedded SQLite file (DB_PATH, ':memory:' for a private in-memory database).
+# Connections open on first use; call init_db() at process startup.
+backend = make_backend()
+# Every helper catches Error: the backend driver's errors plus our own
+Error = (DatabaseError,) + backend.errors
+db = Database(backend)
+
+def get_pool_stats():
+    """Connection pool usage metrics"""
+    return db.pool.stats()
+
+# Read-through caches for the dashboard. Entries are dropped by the write
+# paths below; the TTL bounds staleness from writes made by other processes.
+VIDEO_CACHE_TTL = float(os.environ.get('VIDEO_CACHE_TTL', 60))
+VIDEO_CACHE_SIZE = int(os.environ.get('VIDEO_CACHE_SIZE', 1024))
+user_videos_cache = TTLCache(VIDEO_CACHE_SIZE, VIDEO_CACHE_TTL, name='user_videos')
+video_cache = TTLCache(VIDEO_CACHE_SIZE, VIDEO_CACHE_TTL, name='videos')
 
-# Create global database instance
-db = Database()
+# Columns dashboard.html renders
+VIDEO_LIST_COLUMNS = "id, user_id, title, video_url, thumbnail_url, music_file, duration, resolution, size, formats, created_at"
+
+def invalidate_user_videos(user_id):
+    """Drop the cached video listing of a user"""
+    user_videos_cache.invalidate(user_id)
+
+def get_cache_stats():
+    """Hit/miss counters of the video caches"""
+    return [user_videos_cache.stats(), video_cache.stats()]
 
 # User functions
 def add_user(name, email, password_hash, is_admin=False, is_paid=False):
     """Add a new user to the database"""
     try:
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO users (name, email, password_hash, is_admin, is_paid) VALUES (%s, %s, %s, %s, %s)",
-            (name, email, password_hash, is_admin, is_paid)
-        )
-        conn.commit()
-        cursor.close()
-        return True
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO users (name, email, password_hash, is_admin, is_paid) VALUES (%s, %s, %s, %s, %s)",
+                (name, email, password_hash, is_admin, is_paid)
+            )
+            conn.commit()
+            cursor.close()
+            return True
     except Error as e:
         print(f"❌ Error adding user: {e}")
         return False
@@ -146,12 +109,12 @@ def add_user(name, email, password_hash, is_admin=False, is_paid=False):
 def get_user_by_email(email):
     """Get user by email"""
     try:
-        conn = db.get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
-        user = cursor.fetchone()
-        cursor.close()
-        return user
+        with db.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
+            user = cursor.fetchone()
+            cursor.close()
+            return user
     except Error as e:
         print(f"❌ Error getting user: {e}")
         return None
@@ -159,12 +122,12 @@ def get_user_by_email(email):
 def get_user_by_id(user_id):
     """Get user by ID"""
     try:
-        conn = db.get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM users WHERE id = %s", (user_id,))
-        user = cursor.fetchone()
-        cursor.close()
-        return user
+        with db.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT * FROM users WHERE id = %s", (user_id,))
+            user = cursor.fetchone()
+            cursor.close()
+            return user
     except Error as e:
         print(f"❌ Error getting user by ID: {e}")
         return None
@@ -172,11 +135,21 @@ def get_user_by_id(user_id):
 def delete_user(user_id):
     """Delete user by ID"""
     try:
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
-        conn.commit()
-        cursor.close()
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT music_file FROM videos WHERE user_id = %s AND music_file IS NOT NULL", (user_id,))
+            for (music_file,) in cursor.fetchall():
+                _release_object(cursor, music_file)
+            # Finished uploads they never used
+            cursor.execute("SELECT object_key FROM upload_sessions WHERE user_id = %s AND object_key IS NOT NULL", (user_id,))
+            for (object_key,) in cursor.fetchall():
+                _release_object(cursor, object_key)
+            cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
+            conn.commit()
+            cursor.close()
+        # Their videos went with them (ON DELETE CASCADE)
+        invalidate_user_videos(user_id)
+        video_cache.clear()
         return True
     except Error as e:
         print(f"❌ Error deleting user: {e}")
@@ -185,28 +158,74 @@ def delete_user(user_id):
 def get_all_users():
     """Get all users"""
     try:
-        conn = db.get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT id, name, email, is_admin, is_paid, created_at FROM users ORDER BY created_at DESC")
-        users = cursor.fetchall()
-        cursor.close()
-        return users
+        with db.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT id, name, email, is_admin, is_paid, created_at FROM users ORDER BY created_at DESC")
+            users = cursor.fetchall()
+            cursor.close()
+            return users
     except Error as e:
         print(f"❌ Error getting users: {e}")
         return []
 
+def get_user_for_login(email):
+    """User row and persisted lockout state for a login, in one query"""
+    try:
+        with db.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(
+                "SELECT id, name, email, password_hash, is_admin, is_paid, login_attempts, last_attempt "
+                "FROM users WHERE email = %s",
+                (email,)
+            )
+            user = cursor.fetchone()
+            cursor.close()
+            return user
+    except Error as e:
+        print(f"❌ Error getting user for login: {e}")
+        return None
+
+def record_login_lockout(email, attempts):
+    """Persist a lockout so other processes (and restarts) honour it"""
+    try:
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE users SET login_attempts = %s, last_attempt = %s WHERE email = %s",
+                (attempts, datetime.now(), email)
+            )
+            conn.commit()
+            cursor.close()
+            return True
+    except Error as e:
+        print(f"❌ Error recording login lockout: {e}")
+        return False
+
+def update_password_hash(user_id, password_hash):
+    """Replace a user's password hash, e.g. with stronger parameters"""
+    try:
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE users SET password_hash = %s WHERE id = %s", (password_hash, user_id))
+            conn.commit()
+            cursor.close()
+            return True
+    except Error as e:
+        print(f"❌ Error updating password hash: {e}")
+        return False
+
 def increment_login_attempts(email):
     """Increment login attempts for a user"""
     try:
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE users SET login_attempts = login_attempts + 1, last_attempt = %s WHERE email = %s",
-            (datetime.now(), email)
-        )
-        conn.commit()
-        cursor.close()
-        return True
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE users SET login_attempts = login_attempts + 1, last_attempt = %s WHERE email = %s",
+                (datetime.now(), email)
+            )
+            conn.commit()
+            cursor.close()
+            return True
     except Error as e:
         print(f"❌ Error incrementing login attempts: {e}")
         return False
@@ -214,15 +233,15 @@ def increment_login_attempts(email):
 def reset_login_attempts(email):
     """Reset login attempts for a user"""
     try:
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE users SET login_attempts = 0, last_attempt = NULL WHERE email = %s",
-            (email,)
-        )
-        conn.commit()
-        cursor.close()
-        return True
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE users SET login_attempts = 0, last_attempt = NULL WHERE email = %s",
+                (email,)
+            )
+            conn.commit()
+            cursor.close()
+            return True
     except Error as e:
         print(f"❌ Error resetting login attempts: {e}")
         return False
@@ -230,12 +249,12 @@ def reset_login_attempts(email):
 def get_login_attempts(email):
     """Get login attempts for a user"""
     try:
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT login_attempts FROM users WHERE email = %s", (email,))
-        result = cursor.fetchone()
-        cursor.close()
-        return result[0] if result else 0
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT login_attempts FROM users WHERE email = %s", (email,))
+            result = cursor.fetchone()
+            cursor.close()
+            return result[0] if result else 0
     except Error as e:
         print(f"❌ Error getting login attempts: {e}")
         return 0
@@ -243,61 +262,77 @@ def get_login_attempts(email):
 def update_payment_status(user_id, is_paid):
     """Update user payment status"""
     try:
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE users SET is_paid = %s WHERE id = %s",
-            (bool(is_paid), user_id)
-        )
-        conn.commit()
-        cursor.close()
-        return True
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE users SET is_paid = %s WHERE id = %s",
+                (bool(is_paid), user_id)
+            )
+            conn.commit()
+            cursor.close()
+            return True
     except Error as e:
         print(f"❌ Error updating payment status: {e}")
         return False
 
 # Video functions
-def add_video(user_id, video_url, thumbnail_url, title, music_file=None, duration=None, resolution=None, size=None):
-    """Add a new video to the database"""
-    try:
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO videos (user_id, video_url, thumbnail_url, title, music_file, duration, resolution, size) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
-            (user_id, video_url, thumbnail_url, title, music_file, duration, resolution, size)
-        )
-        conn.commit()
-        cursor.close()
+def add_video(user_id, video_url, thumbnail_url, title, music_file=None, duration=None, resolution=None, size=None,
+              formats='mp4'):
+    """Add a new video to the database; formats lists its renditions, e.g. 'mp4,hls'"""
+    try:
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO videos (user_id, video_url, thumbnail_url, title, music_file, duration, resolution, size, formats) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                (user_id, video_url, thumbnail_url, title, music_file, duration, resolution, size, formats)
+            )
+            conn.commit()
+            cursor.close()
+        invalidate_user_videos(user_id)
         return True
     except Error as e:
         print(f"❌ Error adding video: {e}")
         return False
 
 def get_videos_by_user(user_id):
-    """Get all videos for a user"""
+    """Get all videos for a user (the columns the dashboard lists), cached"""
+    videos = user_videos_cache.get(user_id)
+    if videos is not None:
+        # Copies, so callers can't modify the cached rows
+        return [dict(video) for video in videos]
+    # A video added or deleted during the query must not be cached over
+    generation = user_videos_cache.generation(user_id)
     try:
-        conn = db.get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute(
-            "SELECT * FROM videos WHERE user_id = %s ORDER BY created_at DESC",
-            (user_id,)
-        )
-        videos = cursor.fetchall()
-        cursor.close()
-        return videos
+        with db.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(
+                f"SELECT {VIDEO_LIST_COLUMNS} FROM videos WHERE user_id = %s ORDER BY created_at DESC",
+                (user_id,)
+            )
+            videos = cursor.fetchall()
+            cursor.close()
+        user_videos_cache.set(user_id, videos, generation)
+        return [dict(video) for video in videos]
     except Error as e:
         print(f"❌ Error getting user videos: {e}")
         return []
 
 def get_video_by_id(video_id):
-    """Get video by ID"""
+    """Get video by ID, cached"""
+    video = video_cache.get(video_id)
+    if video is not None:
+        return dict(video)
+    generation = video_cache.generation(video_id)
     try:
-        conn = db.get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM videos WHERE id = %s", (video_id,))
-        video = cursor.fetchone()
-        cursor.close()
-        return video
+        with db.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT * FROM videos WHERE id = %s", (video_id,))
+            video = cursor.fetchone()
+            cursor.close()
+        if video is None:
+            return None
+        video_cache.set(video_id, video, generation)
+        return dict(video)
     except Error as e:
         print(f"❌ Error getting video by ID: {e}")
         return None
@@ -305,11 +340,18 @@ def get_video_by_id(video_id):
 def delete_video(video_id):
     """Delete video by ID"""
     try:
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM videos WHERE id = %s", (video_id,))
-        conn.commit()
-        cursor.close()
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT user_id, music_file FROM videos WHERE id = %s", (video_id,))
+            owner = cursor.fetchone()
+            if owner and owner[1]:
+                _release_object(cursor, owner[1])
+            cursor.execute("DELETE FROM videos WHERE id = %s", (video_id,))
+            conn.commit()
+            cursor.close()
+        video_cache.invalidate(video_id)
+        if owner:
+            invalidate_user_videos(owner[0])
         return True
     except Error as e:
         print(f"❌ Error deleting video: {e}")
@@ -318,21 +360,424 @@ def delete_video(video_id):
 def get_all_videos():
     """Get all videos from all users"""
     try:
-        conn = db.get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute('''
-            SELECT v.*, u.name as user_name, u.email as user_email 
-            FROM videos v 
-            JOIN users u ON v.user_id = u.id 
-            ORDER BY v.created_at DESC
-        ''')
-        videos = cursor.fetchall()
-        cursor.close()
-        return videos
+        with db.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute('''
+                SELECT v.*, u.name as user_name, u.email as user_email 
+                FROM videos v 
+                JOIN users u ON v.user_id = u.id 
+                ORDER BY v.created_at DESC
+            ''')
+            videos = cursor.fetchall()
+            cursor.close()
+            return videos
     except Error as e:
         print(f"❌ Error getting all videos: {e}")
         return []
 
+# Admin listing functions
+def _page(rows, limit):
+    """Trim a limit + 1 row fetch and build the cursor for the next page"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, f"{last['created_at'].isoformat()}_{last['id']}"
+
+def _decode_cursor(cursor_token):
+    """Parse a 'created_at_id' page cursor; ValueError if it is malformed"""
+    created_at, _, row_id = cursor_token.rpartition('_')
+    return datetime.fromisoformat(created_at), int(row_id)
+
+def get_users_page(limit=50, cursor_token=None):
+    """One page of users, newest first, and the cursor for the next page.
+
+    Keyset pagination on (created_at, id) walks idx_users_created instead
+    of scanning and discarding OFFSET rows.
+    """
+    where, params = '', []
+    if cursor_token:
+        created_at, row_id = _decode_cursor(cursor_token)
+        where = "WHERE u.created_at < %s OR (u.created_at = %s AND u.id < %s)"
+        params = [created_at, created_at, row_id]
+    try:
+        with db.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(f'''
+                SELECT u.id, u.name, u.email, u.is_admin, u.is_paid, u.created_at,
+                       (SELECT COUNT(*) FROM videos v WHERE v.user_id = u.id) AS video_count
+                FROM users u
+                {where}
+                ORDER BY u.created_at DESC, u.id DESC
+                LIMIT %s
+            ''', params + [limit + 1])
+            users = cursor.fetchall()
+            cursor.close()
+            return _page(users, limit)
+    except Error as e:
+        print(f"❌ Error getting users page: {e}")
+        return [], None
+
+def get_videos_page(limit=50, cursor_token=None):
+    """One page of videos from all users, newest first, and the next cursor"""
+    where, params = '', []
+    if cursor_token:
+        created_at, row_id = _decode_cursor(cursor_token)
+        where = "WHERE v.created_at < %s OR (v.created_at = %s AND v.id < %s)"
+        params = [created_at, created_at, row_id]
+    try:
+        with db.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(f'''
+                SELECT v.id, v.user_id, v.title, v.music_style, v.duration, v.created_at,
+                       u.name as user_name
+                FROM videos v
+                JOIN users u ON v.user_id = u.id
+                {where}
+                ORDER BY v.created_at DESC, v.id DESC
+                LIMIT %s
+            ''', params + [limit + 1])
+            videos = cursor.fetchall()
+            cursor.close()
+            return _page(videos, limit)
+    except Error as e:
+        print(f"❌ Error getting videos page: {e}")
+        return [], None
+
+def get_admin_stats():
+    """Headline numbers for the admin dashboard, aggregated in SQL"""
+    try:
+        with db.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute('''
+                SELECT
+                    (SELECT COUNT(*) FROM users) AS total_users,
+                    (SELECT COUNT(*) FROM users WHERE is_paid) AS paid_users,
+                    (SELECT COUNT(*) FROM videos) AS total_reels,
+                    (SELECT COALESCE(SUM(duration), 0) FROM videos) AS total_duration,
+                    (SELECT COALESCE(SUM(size), 0) FROM videos) AS total_size
+            ''')
+            stats = cursor.fetchone()
+            cursor.close()
+            return stats
+    except Error as e:
+        print(f"❌ Error getting admin stats: {e}")
+        return {'total_users': 0, 'paid_users': 0, 'total_reels': 0, 'total_duration': 0, 'total_size': 0}
+
+# Render job functions
+def enqueue_render_job(job_id, user_id, payload):
+    """Add a queued render job; payload is a JSON string"""
+    try:
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO render_jobs (id, user_id, status, payload, message, created_at) VALUES (%s, %s, 'queued', %s, %s, %s)",
+                (job_id, user_id, payload, 'Waiting for a render worker', datetime.now())
+            )
+            conn.commit()
+            cursor.close()
+            return True
+    except Error as e:
+        print(f"❌ Error queueing render job: {e}")
+        return False
+
+def claim_render_job(worker_id):
+    """Atomically claim the oldest queued render job for worker_id.
+
+    On MySQL, SKIP LOCKED lets any number of workers poll at once without
+    waiting on a row another worker is in the middle of claiming. The UPDATE
+    only succeeds while the job is still queued, so a job is never claimed
+    twice on backends without row locks either. The pool rolls back the
+    transaction if anything fails before the commit.
+    """
+    try:
+        with db.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(
+                "SELECT * FROM render_jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1" + backend.skip_locked
+            )
+            job = cursor.fetchone()
+            if job:
+                now = datetime.now()
+                cursor.execute(
+                    "UPDATE render_jobs SET status = 'running', worker_id = %s, attempts = attempts + 1, "
+                    "message = %s, started_at = %s, heartbeat_at = %s WHERE id = %s AND status = 'queued'",
+                    (worker_id, 'Rendering', now, now, job['id'])
+                )
+                if cursor.rowcount == 1:
+                    job.update(status='running', worker_id=worker_id, attempts=job['attempts'] + 1)
+                else:
+                    job = None
+            conn.commit()
+            cursor.close()
+            return job
+    except Error as e:
+        print(f"❌ Error claiming render job: {e}")
+        return None
+
+def heartbeat_render_job(job_id, worker_id):
+    """Record that worker_id is still rendering job_id; False if it lost the
+    job (None if the database could not tell)"""
+    try:
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE render_jobs SET heartbeat_at = %s WHERE id = %s AND worker_id = %s AND status = 'running'",
+                (datetime.now(), job_id, worker_id)
+            )
+            owned = cursor.rowcount == 1
+            conn.commit()
+            cursor.close()
+            return owned
+    except Error as e:
+        print(f"❌ Error sending render job heartbeat: {e}")
+        return None
+
+def finish_render_job(job_id, worker_id, success, message, video_url=None):
+    """Mark a job worker_id is still running as done or failed; False if the
+    job was re-queued or failed in the meantime"""
+    try:
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE render_jobs SET status = %s, message = %s, video_url = %s, finished_at = %s "
+                "WHERE id = %s AND worker_id = %s AND status = 'running'",
+                ('done' if success else 'failed', message[:500], video_url, datetime.now(), job_id, worker_id)
+            )
+            finished = cursor.rowcount == 1
+            conn.commit()
+            cursor.close()
+            return finished
+    except Error as e:
+        print(f"❌ Error finishing render job: {e}")
+        return False
+
+def requeue_stale_render_jobs(stale_after_seconds, max_attempts=3):
+    """Re-queue running jobs whose worker stopped sending heartbeats.
+
+    Jobs that already used max_attempts are failed instead. Returns the
+    number of jobs re-queued.
+    """
+    try:
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cutoff = datetime.now() - timedelta(seconds=stale_after_seconds)
+            cursor.execute(
+                "UPDATE render_jobs SET status = 'failed', message = %s, finished_at = %s "
+                "WHERE status = 'running' AND heartbeat_at < %s AND attempts >= %s",
+                ('Render worker stopped responding', datetime.now(), cutoff, max_attempts)
+            )
+            cursor.execute(
+                "UPDATE render_jobs SET status = 'queued', worker_id = NULL, message = %s "
+                "WHERE status = 'running' AND heartbeat_at < %s",
+                ('Waiting for a render worker (retry)', cutoff)
+            )
+            requeued = cursor.rowcount
+            conn.commit()
+            cursor.close()
+            return requeued
+    except Error as e:
+        print(f"❌ Error re-queueing stale render jobs: {e}")
+        return 0
+
+def get_render_job(job_id):
+    """Get render job by ID"""
+    try:
+        with db.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT * FROM render_jobs WHERE id = %s", (job_id,))
+            job = cursor.fetchone()
+            cursor.close()
+            return job
+    except Error as e:
+        print(f"❌ Error getting render job: {e}")
+        return None
+
+# Storage functions
+def get_referenced_files(names):
+    """The upload filenames among names that a video, an active render job or
+    a stored object's reference count still holds; None if the database
+    could not be asked"""
+    names = set(names)
+    if not names:
+        return set()
+    placeholders = ', '.join(['%s'] * len(names))
+    try:
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT video_url, thumbnail_url, music_file FROM videos "
+                f"WHERE video_url IN ({placeholders}) OR thumbnail_url IN ({placeholders}) "
+                f"OR music_file IN ({placeholders})",
+                list(names) * 3
+            )
+            referenced = {name for row in cursor.fetchall() for name in row}
+            cursor.execute(
+                f"SELECT object_key FROM storage_objects WHERE object_key IN ({placeholders}) AND refcount > 0",
+                list(names)
+            )
+            referenced.update(row[0] for row in cursor.fetchall())
+            # Inputs of renders that have not finished yet
+            cursor.execute("SELECT payload FROM render_jobs WHERE status IN ('queued', 'running')")
+            for (payload,) in cursor.fetchall():
+                payload = json.loads(payload)
+                referenced.update(payload.get('photos', []))
+                referenced.add(payload.get('music_filename'))
+            cursor.close()
+            return referenced & names
+    except (Error, ValueError) as e:
+        print(f"❌ Error getting referenced files: {e}")
+        return None
+
+def _release_object(cursor, key):
+    cursor.execute(
+        "UPDATE storage_objects SET refcount = refcount - 1 WHERE object_key = %s AND refcount > 0", (key,)
+    )
+
+def acquire_storage_object(key, size):
+    """Take a reference on a stored upload; True if it had none before
+    (a new object, or one awaiting the sweeper), None on error"""
+    try:
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                backend.insert_ignore + " INTO storage_objects (object_key, size, refcount) VALUES (%s, %s, 0)",
+                (key, size)
+            )
+            cursor.execute("UPDATE storage_objects SET refcount = refcount + 1 WHERE object_key = %s", (key,))
+            cursor.execute("SELECT refcount FROM storage_objects WHERE object_key = %s", (key,))
+            refcount = cursor.fetchone()[0]
+            conn.commit()
+            cursor.close()
+            return refcount == 1
+    except Error as e:
+        print(f"❌ Error acquiring storage object: {e}")
+        return None
+
+def release_storage_object(key):
+    """Drop a reference; the storage sweeper deletes objects nobody holds"""
+    try:
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            _release_object(cursor, key)
+            conn.commit()
+            cursor.close()
+            return True
+    except Error as e:
+        print(f"❌ Error releasing storage object: {e}")
+        return False
+
+# Upload session functions
+def create_upload_session(session_id, user_id, kind, filename, size, chunk_size, sha256=None):
+    """Record a new resumable upload"""
+    try:
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO upload_sessions (id, user_id, kind, filename, size, chunk_size, sha256, created_at) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+                (session_id, user_id, kind, filename[:255], size, chunk_size, sha256, datetime.now())
+            )
+            conn.commit()
+            cursor.close()
+            return True
+    except Error as e:
+        print(f"❌ Error creating upload session: {e}")
+        return False
+
+def get_upload_session(session_id):
+    """Get upload session by ID"""
+    try:
+        with db.connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT * FROM upload_sessions WHERE id = %s", (session_id,))
+            upload = cursor.fetchone()
+            cursor.close()
+            return upload
+    except Error as e:
+        print(f"❌ Error getting upload session: {e}")
+        return None
+
+def complete_upload_session(session_id, object_key):
+    """Attach the stored object, and the reference taken on it, to a session.
+    False if the session is gone or was completed by another request."""
+    try:
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE upload_sessions SET object_key = %s WHERE id = %s AND object_key IS NULL",
+                (object_key, session_id)
+            )
+            completed = cursor.rowcount == 1
+            conn.commit()
+            cursor.close()
+            return completed
+    except Error as e:
+        print(f"❌ Error completing upload session: {e}")
+        return False
+
+def claim_upload_sessions(session_ids, user_id):
+    """Take user_id's completed uploads out of their sessions.
+
+    Returns {session_id: (kind, object_key)} and hands the references over
+    to the caller, or None (claiming nothing) if any of them is missing,
+    unfinished or already claimed.
+    """
+    session_ids = set(session_ids)
+    if not session_ids:
+        return {}
+    placeholders = ', '.join(['%s'] * len(session_ids))
+    try:
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT id, kind, object_key FROM upload_sessions WHERE id IN ({placeholders}) "
+                f"AND user_id = %s AND object_key IS NOT NULL" + backend.skip_locked,
+                list(session_ids) + [user_id]
+            )
+            uploads = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+            if len(uploads) == len(session_ids):
+                cursor.execute(
+                    f"DELETE FROM upload_sessions WHERE id IN ({placeholders}) AND object_key IS NOT NULL",
+                    list(session_ids)
+                )
+                if cursor.rowcount != len(session_ids):
+                    uploads = {}
+            if len(uploads) != len(session_ids):
+                conn.rollback()
+                cursor.close()
+                return None
+            conn.commit()
+            cursor.close()
+            return uploads
+    except Error as e:
+        print(f"❌ Error claiming upload sessions: {e}")
+        return None
+
+def expire_upload_sessions(max_age_seconds):
+    """Delete sessions older than max_age_seconds, dropping the references
+    of finished uploads nobody used. Returns the deleted IDs."""
+    try:
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            cutoff = datetime.now() - timedelta(seconds=max_age_seconds)
+            cursor.execute("SELECT id, object_key FROM upload_sessions WHERE created_at < %s", (cutoff,))
+            deleted = []
+            for session_id, object_key in cursor.fetchall():
+                cursor.execute("DELETE FROM upload_sessions WHERE id = %s", (session_id,))
+                # Claimed in the meantime: the reference went with it
+                if cursor.rowcount != 1:
+                    continue
+                if object_key:
+                    _release_object(cursor, object_key)
+                deleted.append(session_id)
+            conn.commit()
+            cursor.close()
+            return deleted
+    except Error as e:
+        print(f"❌ Error expiring upload sessions: {e}")
+        return []
+
 def init_db():
-    """Initialize database (for backward compatibility)"""
+    """Connect and apply pending migrations; call once at process startup"""
     return db.init_db()
\ No newline at end of file
@@ -0,0 +1,237 @@
+import functools
+import itertools
+import os
+import sqlite3
+from datetime import datetime
+
+# Storage backends behind database.py. Both hand out connections with the
+# mysql.connector surface the helpers use: cursor(dictionary=...), %s
+# placeholders, commit/rollback, in_transaction and is_connected. Pick one
+# with DB_BACKEND=mysql (default) or DB_BACKEND=sqlite.
+
+
+class MySQLBackend:
+    """MySQL server; mysql.connector is only imported when this is used"""
+
+    name = 'mysql'
+    # Row locking clause for claiming queued render jobs
+    skip_locked = ' FOR UPDATE SKIP LOCKED'
+    # INSERT that skips rows whose key already exists
+    insert_ignore = 'INSERT IGNORE'
+    # MySQL error raised when the named database does not exist yet
+    ER_BAD_DB_ERROR = 1049
+
+    def __init__(self):
+        import mysql.connector
+        self.connector = mysql.connector
+        self.errors = (mysql.connector.Error,)
+        self.host = os.environ.get('DB_HOST', 'localhost')
+        self.port = int(os.environ.get('DB_PORT', 3306))
+        self.user = os.environ.get('DB_USER', 'root')
+        self.password = os.environ.get('DB_PASSWORD', '')
+        self.database = os.environ.get('DB_NAME', 'sanpai_db')
+        self.connect_timeout = int(os.environ.get('DB_CONNECT_TIMEOUT', 5))
+        self.pool_size = int(os.environ.get('DB_POOL_SIZE', 10))
+
+    def describe(self):
+        return f"MySQL database {self.database} on {self.host}:{self.port}"
+
+    def connect(self, with_database=True):
+        """Open a new MySQL connection"""
+        options = {
+            'host': self.host,
+            'port': self.port,
+            'user': self.user,
+            'password': self.password,
+            'connection_timeout': self.connect_timeout
+        }
+        if with_database:
+            options['database'] = self.database
+        return self.connector.connect(**options)
+
+    @staticmethod
+    def check(conn):
+        return conn.is_connected()
+
+    @staticmethod
+    def reset(conn):
+        """End any transaction left open, so the next borrower sees fresh data"""
+        if conn.in_transaction:
+            conn.rollback()
+
+    def handle_connect_error(self, error):
+        """Create the database if connecting failed because it is missing"""
+        if getattr(error, 'errno', None) != self.ER_BAD_DB_ERROR:
+            return
+        try:
+            conn = self.connect(with_database=False)
+            cursor = conn.cursor()
+            cursor.execute(f"CREATE DATABASE IF NOT EXISTS {self.database}")
+            cursor.close()
+            conn.close()
+        except self.errors as e:
+            print(f"❌ Error creating database: {e}")
+
+    def close(self):
+        pass
+
+
+@functools.lru_cache(maxsize=512)
+def _to_qmark(query):
+    """Rewrite %s placeholders as ?; cached so equal SQL hits sqlite's statement cache"""
+    return query.replace('%s', '?')
+
+
+def _adapt_datetime(value):
+    return value.isoformat(' ')
+
+
+def _convert_timestamp(value):
+    return datetime.fromisoformat(value.decode())
+
+
+sqlite3.register_adapter(datetime, _adapt_datetime)
+sqlite3.register_converter('TIMESTAMP', _convert_timestamp)
+
+
+class SQLiteCursor:
+    """sqlite3 cursor speaking the mysql.connector cursor dialect"""
+
+    def __init__(self, cursor, dictionary):
+        self._cursor = cursor
+        self._dictionary = dictionary
+
+    def execute(self, query, params=()):
+        self._cursor.execute(_to_qmark(query), params or ())
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip((column[0] for column in self._cursor.description), row))
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """sqlite3 connection speaking the mysql.connector connection dialect"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, dictionary=False):
+        return SQLiteCursor(self._conn.cursor(), dictionary)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    def is_connected(self):
+        try:
+            self._conn.execute('SELECT 1')
+            return True
+        except sqlite3.Error:
+            return False
+
+    def close(self):
+        self._conn.close()
+
+
+class SQLiteBackend:
+    """Embedded SQLite database file (WAL mode), or a private in-memory one"""
+
+    name = 'sqlite'
+    skip_locked = ''
+    insert_ignore = 'INSERT OR IGNORE'
+    errors = (sqlite3.Error,)
+    _memory_ids = itertools.count()
+
+    def __init__(self, path=None):
+        self.path = path or os.environ.get('DB_PATH', 'sanpai.db')
+        self.busy_timeout = int(float(os.environ.get('DB_BUSY_TIMEOUT', 5)) * 1000)
+        self.statement_cache = int(os.environ.get('DB_STATEMENT_CACHE', 256))
+        self._keepalive = None
+        if self.path == ':memory:':
+            # Named shared-cache database, so every pooled connection sees the
+            # same data; one connection is held open to keep it alive.
+            self.uri = f"file:sanpai_memory_{os.getpid()}_{next(self._memory_ids)}?mode=memory&cache=shared"
+            self.pool_size = 1
+            self._keepalive = self._open()
+        else:
+            self.uri = None
+            self.pool_size = int(os.environ.get('DB_POOL_SIZE', 10))
+
+    def describe(self):
+        return 'in-memory SQLite database' if self.uri else f"SQLite database {self.path}"
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.uri or self.path,
+            uri=self.uri is not None,
+            timeout=self.busy_timeout / 1000,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            # Prepared statements are reused per connection, keyed by SQL text
+            cached_statements=self.statement_cache,
+            # The pool hands a connection to one thread at a time
+            check_same_thread=False
+        )
+        conn.execute('PRAGMA foreign_keys = ON')
+        conn.execute(f'PRAGMA busy_timeout = {self.busy_timeout}')
+        if self.uri is None:
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
+        return conn
+
+    def connect(self):
+        return SQLiteConnection(self._open())
+
+    @staticmethod
+    def check(conn):
+        return conn.is_connected()
+
+    @staticmethod
+    def reset(conn):
+        if conn.in_transaction:
+            conn.rollback()
+
+    def handle_connect_error(self, error):
+        pass
+
+    def close(self):
+        if self._keepalive is not None:
+            self._keepalive.close()
+            self._keepalive = None
+
+
+BACKENDS = {
+    'mysql': MySQLBackend,
+    'sqlite': SQLiteBackend,
+}
+
+
+def make_backend(name=None):
+    """Backend selected by DB_BACKEND"""
+    name = (name or os.environ.get('DB_BACKEND', 'mysql')).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown DB_BACKEND: {name}")
+    return BACKENDS[name]()
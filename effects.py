@@ -0,0 +1,311 @@
+import functools
+
+import numpy as np
+
+# Frames are HxWx3 uint8 RGB arrays. Effects are compiled into an EffectChain:
+# runs of per-pixel colour effects are fused into lookup-table passes, spatial
+# masks (vignette) come from a per-resolution LRU cache and only the true
+# convolutions (blur, sharpen) stay as separate array kernels.
+
+# Number of (width, height, ...) masks kept in memory
+MASK_CACHE_SIZE = 16
+# Number of compiled effect chains kept in memory
+CHAIN_CACHE_SIZE = 64
+
+# ITU-R 601-2 luma transform, same weights PIL uses for convert('L')
+LUMA_601 = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+# ITU-R 709 luma transform
+LUMA_709 = np.array([0.2126, 0.7152, 0.0722], dtype=np.float32)
+
+SEPIA_MATRIX = np.array([
+    [0.393, 0.769, 0.189],
+    [0.349, 0.686, 0.168],
+    [0.272, 0.534, 0.131],
+], dtype=np.float32)
+
+_RAMP = np.arange(256, dtype=np.int32)
+# Offsets that turn a uint8 frame into indexes of a flattened (3, 256) LUT
+_CHANNEL_OFFSETS = np.array([0, 256, 512], dtype=np.uint16)
+
+
+def _to_uint8(arr):
+    """Clip a float frame into the 0-255 range and convert it to uint8"""
+    return np.clip(arr, 0, 255).astype(np.uint8)
+
+
+def _curve(values):
+    """Build a (3, 256) LUT applying the same 256-entry curve to every channel"""
+    return np.tile(_to_uint8(values), (3, 1))
+
+
+def _luma(frame, weights=LUMA_601):
+    """Return the rounded single channel luma of an RGB frame"""
+    return np.rint(frame.astype(np.float32) @ weights)
+
+
+# ------------------------------
+# Colour stages
+# ------------------------------
+# Each colour effect is a list of stages:
+#   ('curve', lut)              per-channel lookup, lut is (3, 256) uint8
+#   ('matrix', m, rounding)     3x3 colour matrix followed by np.rint/np.floor
+#   ('contrast', factor)        curve around the mean luma of its input frame
+COLOR_STAGES = {
+    'contrast': [('contrast', 1.2)],
+    'black_white': [('matrix', np.tile(LUMA_601, (3, 1)), np.rint)],
+    'grayscale': [('matrix', np.tile(LUMA_709, (3, 1)), np.rint)],
+    'sepia': [('matrix', SEPIA_MATRIX, np.floor)],
+    # Luma onto a blue->white ramp, like ImageOps.colorize(black='blue', white='white')
+    'colorize': [
+        ('matrix', np.tile(LUMA_601, (3, 1)), np.rint),
+        ('curve', _to_uint8(np.stack([_RAMP, _RAMP, np.full(256, 255)]))),
+    ],
+    'solarize': [('curve', _curve(np.where(_RAMP >= 128, 255 - _RAMP, _RAMP)))],
+    'invert': [('curve', _curve(255 - _RAMP))],
+}
+
+
+def _contrast_curve(mean, factor):
+    """Curve equivalent to ImageEnhance.Contrast around a fixed mean"""
+    return _curve(np.rint(mean + factor * (_RAMP - mean)))
+
+
+def _apply_lut(lut, frame):
+    """Look every channel of frame up in a (3, 256) LUT with a single gather"""
+    return np.take(lut.reshape(-1), frame + _CHANNEL_OFFSETS)
+
+
+def _compose_luts(first, second):
+    """LUT equivalent to applying first and then second"""
+    if first is None:
+        return second
+    return np.take_along_axis(second, first.astype(np.intp), axis=1)
+
+
+class ColorPass:
+    """One fused pass: optional pre-LUT, optional colour matrix, optional post-LUT"""
+
+    def __init__(self):
+        self.pre = None
+        self.matrix = None
+        self.rounding = None
+        self.post = None
+
+    @property
+    def is_gray(self):
+        """True when the matrix collapses the frame to a single luma channel"""
+        return self.matrix is not None and bool(np.all(self.matrix == self.matrix[0]))
+
+    def apply(self, frame):
+        if self.pre is not None:
+            frame = _apply_lut(self.pre, frame)
+        if self.matrix is not None:
+            if self.is_gray:
+                gray = _to_uint8(self.rounding(frame.astype(np.float32) @ self.matrix[0]))
+                if self.post is None:
+                    return np.repeat(gray[:, :, np.newaxis], 3, axis=2)
+                # Every channel sees the same index, so the post-LUT is one gather
+                return np.ascontiguousarray(self.post.T)[gray]
+            frame = _to_uint8(self.rounding(frame.astype(np.float32) @ self.matrix.T))
+        if self.post is not None:
+            frame = _apply_lut(self.post, frame)
+        return frame
+
+
+def _fuse(stages):
+    """Fuse concrete curve/matrix stages into as few ColorPasses as possible"""
+    passes = []
+    current = None
+    for stage in stages:
+        if stage[0] == 'curve':
+            if current is None:
+                current = ColorPass()
+            if current.matrix is None:
+                current.pre = _compose_luts(current.pre, stage[1])
+            else:
+                current.post = _compose_luts(current.post, stage[1])
+        else:
+            if current is not None and current.matrix is not None:
+                passes.append(current)
+                current = None
+            if current is None:
+                current = ColorPass()
+            current.matrix = stage[1]
+            current.rounding = stage[2]
+    if current is not None:
+        passes.append(current)
+
+    # Everything after a gray pass only ever sees 256 distinct colours, so the
+    # rest of the chain folds into that pass's post-LUT.
+    for i, color_pass in enumerate(passes[:-1]):
+        if color_pass.is_gray:
+            if color_pass.post is None:
+                colours = np.repeat(_to_uint8(_RAMP)[:, np.newaxis], 3, axis=1)
+            else:
+                colours = np.ascontiguousarray(color_pass.post.T)
+            colours = colours[:, np.newaxis, :]
+            for later in passes[i + 1:]:
+                colours = later.apply(colours)
+            color_pass.post = np.ascontiguousarray(colours[:, 0, :].T)
+            return passes[:i + 1]
+    return passes
+
+
+class ColorProgram:
+    """A run of colour effects compiled into fused lookup-table passes"""
+
+    def __init__(self, stages):
+        self.stages = stages
+        self.dynamic = any(stage[0] == 'contrast' for stage in stages)
+        self.passes = None if self.dynamic else _fuse(stages)
+
+    def _resolve(self, frame):
+        """Turn contrast stages into concrete curves for this frame"""
+        resolved = []
+        for stage in self.stages:
+            if stage[0] == 'contrast':
+                # The mean of the whole frame, as ImageEnhance.Contrast takes it
+                preview = frame
+                for color_pass in _fuse(resolved):
+                    preview = color_pass.apply(preview)
+                mean = int(_luma(preview).mean() + 0.5)
+                resolved.append(('curve', _contrast_curve(mean, stage[1])))
+            else:
+                resolved.append(stage)
+        return _fuse(resolved)
+
+    def apply(self, frame):
+        passes = self._resolve(frame) if self.dynamic else self.passes
+        for color_pass in passes:
+            frame = color_pass.apply(frame)
+        return frame
+
+
+# ------------------------------
+# Spatial stages
+# ------------------------------
+@functools.lru_cache(maxsize=MASK_CACHE_SIZE)
+def vignette_mask(width, height, strength=0.3):
+    """Radial darkening factor for a width x height frame, cached per resolution"""
+    dx = (np.arange(width, dtype=np.float32) - width / 2) / (width / 2)
+    dy = (np.arange(height, dtype=np.float32) - height / 2) / (height / 2)
+    d = np.sqrt(dy[:, np.newaxis] ** 2 + dx[np.newaxis, :] ** 2)
+    mask = (1 - d * strength)[:, :, np.newaxis]
+    mask.setflags(write=False)
+    return mask
+
+
+class MaskStep:
+    """Multiply the frame by a cached per-resolution mask"""
+
+    def __init__(self, mask_factory):
+        self.mask_factory = mask_factory
+
+    def apply(self, frame):
+        height, width = frame.shape[:2]
+        return _to_uint8(np.floor(frame * self.mask_factory(width, height)))
+
+
+def _convolve_axis(frame, weights, axis):
+    """Convolve a float frame with a 1-D kernel along one axis (edge padded)"""
+    radius = len(weights) // 2
+    pad = [(0, 0)] * frame.ndim
+    pad[axis] = (radius, radius)
+    padded = np.pad(frame, pad, mode='edge')
+    size = frame.shape[axis]
+    window = [slice(None)] * frame.ndim
+    out = np.zeros_like(frame)
+    for i, w in enumerate(weights):
+        window[axis] = slice(i, i + size)
+        out += w * padded[tuple(window)]
+    return out
+
+
+@functools.lru_cache(maxsize=None)
+def _gaussian_weights(sigma):
+    """Normalised 1-D gaussian kernel covering +/- 3 sigma"""
+    radius = max(1, int(3 * sigma + 0.5))
+    x = np.arange(-radius, radius + 1, dtype=np.float32)
+    weights = np.exp(-(x * x) / (2 * sigma * sigma))
+    return weights / weights.sum()
+
+
+def blur(frame, sigma=1.0):
+    """Separable gaussian blur"""
+    weights = _gaussian_weights(sigma)
+    out = _convolve_axis(frame.astype(np.float32), weights, axis=0)
+    out = _convolve_axis(out, weights, axis=1)
+    return _to_uint8(np.rint(out))
+
+
+def sharpen(frame):
+    """3x3 sharpen kernel, same weights as ImageFilter.SHARPEN"""
+    data = frame.astype(np.float32)
+    ones = np.ones(3, dtype=np.float32)
+    box = _convolve_axis(_convolve_axis(data, ones, axis=0), ones, axis=1)
+    # (-2 * neighbours + 32 * centre) / 16 == (34 * centre - 2 * box) / 16
+    return _to_uint8(np.rint((34 * data - 2 * box) / 16))
+
+
+class FilterStep:
+    """A neighbourhood filter that cannot be expressed as a LUT"""
+
+    def __init__(self, kernel):
+        self.kernel = kernel
+
+    def apply(self, frame):
+        return self.kernel(frame)
+
+
+SPATIAL_STEPS = {
+    'vignette': lambda: MaskStep(vignette_mask),
+    'blur': lambda: FilterStep(blur),
+    'sharpen': lambda: FilterStep(sharpen),
+}
+
+EFFECT_NAMES = tuple(COLOR_STAGES) + tuple(SPATIAL_STEPS)
+
+
+class EffectChain:
+    """A compiled sequence of effects applied to frames in order"""
+
+    def __init__(self, effect_names):
+        self.effect_names = tuple(effect_names)
+        self.steps = []
+        stages = []
+        for name in self.effect_names:
+            if name in COLOR_STAGES:
+                stages.extend(COLOR_STAGES[name])
+            elif name in SPATIAL_STEPS:
+                if stages:
+                    self.steps.append(ColorProgram(stages))
+                    stages = []
+                self.steps.append(SPATIAL_STEPS[name]())
+            else:
+                raise ValueError(f"Unknown effect: {name}")
+        if stages:
+            self.steps.append(ColorProgram(stages))
+
+    def apply(self, frame):
+        for step in self.steps:
+            frame = step.apply(frame)
+        return frame
+
+
+@functools.lru_cache(maxsize=CHAIN_CACHE_SIZE)
+def compile_effects(effect_names):
+    """Compile (and cache) the EffectChain for a tuple of effect names"""
+    return EffectChain(effect_names)
+
+
+def apply_effects_array(frame, effect_names):
+    """Apply a chain of named effects to an RGB frame, unknown names are skipped"""
+    effect_names = tuple(name for name in effect_names if name in EFFECT_NAMES)
+    if not effect_names:
+        return frame
+    return compile_effects(effect_names).apply(np.ascontiguousarray(frame, dtype=np.uint8))
+
+
+def apply_effect_array(frame, effect_name):
+    """Apply a named effect to an RGB frame, unknown names return the frame unchanged"""
+    return apply_effects_array(frame, (effect_name,))
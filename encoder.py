@@ -0,0 +1,285 @@
+import multiprocessing
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+# Streaming encoder: frames from our own generators are piped as raw RGB into
+# one long-lived ffmpeg process, which also reads the music file directly.
+
+DEFAULT_ENCODER_SETTINGS = {
+    'codec': 'libx264',
+    'preset': 'medium',
+    'crf': 23,
+    # 0 lets ffmpeg pick a thread count for the machine
+    'threads': 0,
+    'audio_codec': 'aac',
+    'audio_bitrate': '192k',
+    # Write the moov index at the front so playback starts before the
+    # download finishes
+    'faststart': True,
+    # Frames between keyframes; None keeps the codec default. HLS output
+    # sets it so every segment starts on a keyframe.
+    'keyint': None,
+    # Number of the first frame within the whole reel, so a reel encoded in
+    # pieces keeps its keyframes on one keyint grid
+    'first_frame': 0,
+}
+
+
+def ffmpeg_binary():
+    """Path of the ffmpeg executable (FFMPEG_BINARY overrides the bundled one)"""
+    binary = os.environ.get('FFMPEG_BINARY')
+    if binary:
+        return binary
+    import imageio_ffmpeg
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+def encoder_settings(overrides=None):
+    """Default encoder settings updated with per-job overrides"""
+    settings = dict(DEFAULT_ENCODER_SETTINGS)
+    if overrides:
+        settings.update({key: value for key, value in overrides.items() if value is not None})
+    return settings
+
+
+def probe_duration(path):
+    """Duration in seconds of a media file, or None if ffmpeg cannot read it"""
+    try:
+        result = subprocess.run(
+            [ffmpeg_binary(), '-hide_banner', '-i', path],
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=30
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"❌ Error probing {path}: {e}")
+        return None
+    match = re.search(rb'Duration: (\d+):(\d+):(\d+(?:\.\d+)?)', result.stderr)
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+class FFmpegEncoder:
+    """A long-lived ffmpeg process fed with raw RGB24 frames over a pipe"""
+
+    def __init__(self, output_path, size, fps, duration=None, audio_path=None, settings=None):
+        self.output_path = output_path
+        self.size = size
+        self.fps = fps
+        self.duration = duration
+        self.audio_path = audio_path
+        self.settings = encoder_settings(settings)
+        self.process = None
+        self.frames_written = 0
+
+    def command(self):
+        settings = self.settings
+        width, height = self.size
+        cmd = [
+            ffmpeg_binary(), '-y', '-hide_banner', '-loglevel', 'error',
+            '-f', 'rawvideo', '-vcodec', 'rawvideo', '-pix_fmt', 'rgb24',
+            '-s', f'{width}x{height}', '-r', str(self.fps), '-i', '-',
+        ]
+        if self.audio_path:
+            cmd += ['-i', self.audio_path]
+        cmd += ['-map', '0:v:0']
+        if self.audio_path:
+            cmd += ['-map', '1:a:0', '-c:a', settings['audio_codec'], '-b:a', settings['audio_bitrate']]
+        else:
+            cmd += ['-an']
+        if self.duration is not None:
+            # Trims the music to the length of the video
+            cmd += ['-t', f'{self.duration:.3f}']
+        cmd += [
+            '-c:v', settings['codec'], '-preset', str(settings['preset']),
+            '-crf', str(settings['crf']), '-threads', str(settings['threads']),
+            '-pix_fmt', 'yuv420p',
+        ]
+        if settings['keyint']:
+            keyint = settings['keyint']
+            # -g only caps the GOP: scene-cut keyframes restart it and move
+            # the grid the HLS muxer cuts on. Keyframes go on every keyint-th
+            # frame of the reel instead, and nowhere else but a piece's start.
+            cmd += ['-g', str(keyint), '-keyint_min', str(keyint), '-sc_threshold', '0',
+                    '-force_key_frames', f"expr:eq(mod(n+{settings['first_frame']},{keyint}),0)"]
+        return cmd + _movflags(settings) + [self.output_path]
+
+    def open(self):
+        self.process = subprocess.Popen(
+            self.command(), stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+        )
+        return self
+
+    def write(self, frame):
+        """Send one HxWx3 uint8 frame to the encoder"""
+        try:
+            self.process.stdin.write(frame.data if frame.flags.c_contiguous else frame.tobytes())
+        except (BrokenPipeError, ValueError):
+            raise IOError(f"ffmpeg stopped accepting frames: {self._error_output()}")
+        self.frames_written += 1
+
+    def _error_output(self):
+        try:
+            _, stderr = self.process.communicate(timeout=30)
+        except (ValueError, subprocess.TimeoutExpired):
+            self.process.kill()
+            stderr = b''
+        return (stderr or b'').decode(errors='replace').strip()
+
+    def close(self):
+        """Finish the stream and wait for ffmpeg, raising IOError if it failed"""
+        if self.process is None:
+            return
+        process, self.process = self.process, None
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        stderr = process.stderr.read()
+        process.stderr.close()
+        if process.wait() != 0:
+            raise IOError(f"ffmpeg exited with code {process.returncode}: "
+                          f"{stderr.decode(errors='replace').strip()}")
+
+    def abort(self):
+        """Kill the encoder without waiting for the output to be finalised"""
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def _movflags(settings):
+    return ['-movflags', '+faststart'] if settings['faststart'] else []
+
+
+def encode_frames(frames, output_path, size, fps, duration=None, audio_path=None, settings=None):
+    """Encode an iterable of frames (plus optional music) into output_path"""
+    with FFmpegEncoder(output_path, size, fps, duration, audio_path, settings) as encoder:
+        for frame in frames:
+            encoder.write(frame)
+        return encoder.frames_written
+
+
+def _pool_context():
+    """Worker processes are started from a clean forkserver (or spawned) rather
+    than forked from a web process that may be running other threads"""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def _encode_window(window, time_offset, start, stop, output_path, settings):
+    """Worker: encode global frames start..stop-1 of a timeline window"""
+    frames = (window.render_at(frame_number / window.fps - time_offset) for frame_number in range(start, stop))
+    return encode_frames(frames, output_path, window.size, window.fps, settings=settings)
+
+
+def concat_segments(segment_paths, output_path, duration=None, audio_path=None, settings=None):
+    """Stitch encoded segments with the concat demuxer (video is stream-copied)
+    and mux in the music"""
+    settings = encoder_settings(settings)
+    list_path = output_path + '.concat.txt'
+    with open(list_path, 'w') as f:
+        for path in segment_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    cmd = [ffmpeg_binary(), '-y', '-hide_banner', '-loglevel', 'error',
+           '-f', 'concat', '-safe', '0', '-i', list_path]
+    if audio_path:
+        cmd += ['-i', audio_path, '-map', '0:v:0', '-map', '1:a:0',
+                '-c:a', settings['audio_codec'], '-b:a', settings['audio_bitrate']]
+    else:
+        cmd += ['-map', '0:v:0', '-an']
+    if duration is not None:
+        cmd += ['-t', f'{duration:.3f}']
+    cmd += ['-c:v', 'copy'] + _movflags(settings) + [output_path]
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    finally:
+        os.remove(list_path)
+    if result.returncode != 0:
+        raise IOError(f"ffmpeg concat failed: {result.stderr.decode(errors='replace').strip()}")
+
+
+def encode_timeline(timeline, output_path, audio_path=None, settings=None, workers=1):
+    """Encode a render.Timeline into output_path.
+
+    With workers > 1 the reel is split into per-photo frame ranges that are
+    rendered and encoded in a process pool, then stitched together without
+    re-encoding the video.
+    """
+    ranges = timeline.segment_ranges()
+    if workers <= 1 or len(ranges) <= 1:
+        return encode_frames(timeline.frames(), output_path, timeline.size, timeline.fps,
+                             duration=timeline.duration, audio_path=audio_path, settings=settings)
+
+    workers = min(workers, len(ranges))
+    segment_settings = encoder_settings(settings)
+    if not segment_settings['threads']:
+        # Share the cores between the parallel encoders instead of oversubscribing
+        segment_settings['threads'] = max(1, (os.cpu_count() or 1) // workers)
+    # Only the stitched file is played, so the segments skip the faststart pass
+    segment_settings['faststart'] = False
+
+    segment_dir = tempfile.mkdtemp(prefix='segments_', dir=os.path.dirname(os.path.abspath(output_path)))
+    try:
+        segment_paths = []
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()) as pool:
+            futures = []
+            for i, (start, stop) in enumerate(ranges):
+                # Segment i can show photo i and the photo transitioning in after it
+                window, time_offset = timeline.window(i, i + 1)
+                path = os.path.join(segment_dir, f'segment_{i:04d}.mp4')
+                segment_paths.append(path)
+                futures.append(pool.submit(_encode_window, window, time_offset, start, stop, path,
+                                           dict(segment_settings, first_frame=start)))
+            frames_written = sum(future.result() for future in futures)
+        concat_segments(segment_paths, output_path, timeline.duration, audio_path, settings)
+        return frames_written
+    finally:
+        shutil.rmtree(segment_dir, ignore_errors=True)
+
+
+def package_hls(mp4_path, playlist_path, segment_seconds=4):
+    """Remux an MP4 into fragmented-MP4 HLS next to playlist_path.
+
+    Streams are copied, not re-encoded. For a playlist 'name.m3u8' this
+    writes name_init.mp4 and name_000.m4s, name_001.m4s, ...; segments are
+    cut on keyframes, so encode with keyint = fps * segment_seconds to get
+    segments of that length. Returns the paths written.
+    """
+    directory = os.path.dirname(os.path.abspath(playlist_path))
+    stem = os.path.splitext(os.path.basename(playlist_path))[0]
+    cmd = [
+        ffmpeg_binary(), '-y', '-hide_banner', '-loglevel', 'error', '-i', mp4_path,
+        '-map', '0', '-c', 'copy', '-f', 'hls',
+        '-hls_time', str(segment_seconds), '-hls_playlist_type', 'vod',
+        '-hls_segment_type', 'fmp4', '-hls_fmp4_init_filename', f'{stem}_init.mp4',
+        '-hls_segment_filename', os.path.join(directory, f'{stem}_%03d.m4s'),
+        playlist_path,
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    written = sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.startswith(f'{stem}_') and name.endswith(('.m4s', '_init.mp4'))
+    )
+    if result.returncode != 0:
+        for path in written + [playlist_path]:
+            if os.path.exists(path):
+                os.remove(path)
+        raise IOError(f"ffmpeg HLS packaging failed: {result.stderr.decode(errors='replace').strip()}")
+    return [playlist_path] + written
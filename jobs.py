@@ -0,0 +1,135 @@
+import datetime
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from database import enqueue_render_job, get_render_job
+
+# Background render jobs. A request only saves its uploads and submits a job;
+# either a bounded pool of in-process worker threads (RenderJobQueue) or
+# standalone worker.py processes reading the render_jobs table
+# (DatabaseJobQueue) run the renders and record each job's status so clients
+# can poll for it.
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class RenderJobQueue:
+    """Bounded pool of render workers with in-memory job status.
+
+    A job function returns a dict with at least 'success' and 'message';
+    everything else it returns (e.g. 'video_url') is stored on the job.
+    With an AdmissionController, jobs stay queued until it grants them a
+    render slot; they must have been reserved with its try_admit().
+    """
+
+    def __init__(self, workers=2, max_jobs=1000, admission=None):
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self.admission = admission
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='render')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, owner=None, **kwargs):
+        """Queue func(*args, **kwargs) and return the new job id"""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._jobs[job_id] = {
+                'id': job_id,
+                'owner': owner,
+                'status': QUEUED,
+                'message': 'Waiting for a render worker',
+                'created_at': datetime.datetime.now(),
+                'started_at': None,
+                'finished_at': None,
+            }
+            self._evict()
+        self._executor.submit(self._run, job_id, func, args, kwargs)
+        return job_id
+
+    def _evict(self):
+        """Drop the oldest finished jobs once more than max_jobs are tracked"""
+        excess = len(self._jobs) - self.max_jobs
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id]['status'] in (DONE, FAILED):
+                del self._jobs[job_id]
+                excess -= 1
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+
+    def _run(self, job_id, func, args, kwargs):
+        slot = self.admission.slot() if self.admission is not None else nullcontext()
+        with slot:
+            self._update(job_id, status=RUNNING, message='Rendering', started_at=datetime.datetime.now())
+            try:
+                result = func(*args, **kwargs) or {}
+            except Exception as e:
+                print(f"❌ Render job {job_id} crashed: {e}")
+                result = {'success': False, 'message': f'An error occurred: {str(e)}'}
+        fields = {key: value for key, value in result.items() if key != 'success'}
+        fields['status'] = DONE if result.get('success') else FAILED
+        fields['finished_at'] = datetime.datetime.now()
+        self._update(job_id, **fields)
+
+    def get(self, job_id):
+        """Snapshot of a job, or None if it is unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def stats(self):
+        """Number of tracked jobs per status"""
+        with self._lock:
+            counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+            for job in self._jobs.values():
+                counts[job['status']] += 1
+            return counts
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+class DatabaseJobQueue:
+    """Render jobs stored in the render_jobs table and run by worker.py.
+
+    The web process only inserts rows, so render capacity is added by
+    starting more workers on any node that shares the database and uploads.
+    """
+
+    def submit(self, payload, owner):
+        """Queue a render described by a JSON-serialisable payload"""
+        job_id = uuid.uuid4().hex
+        if not enqueue_render_job(job_id, owner, json.dumps(payload)):
+            raise RuntimeError('Could not queue render job')
+        return job_id
+
+    def get(self, job_id):
+        """Snapshot of a job in the same shape as RenderJobQueue.get"""
+        row = get_render_job(job_id)
+        if not row:
+            return None
+        job = {
+            'id': row['id'],
+            'owner': row['user_id'],
+            'status': row['status'],
+            'message': row['message'],
+            'created_at': row['created_at'],
+            'started_at': row['started_at'],
+            'finished_at': row['finished_at'],
+        }
+        if row.get('video_url'):
+            job['video_url'] = row['video_url']
+        return job
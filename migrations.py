@@ -0,0 +1,308 @@
+from werkzeug.security import generate_password_hash
+
+# Versioned schema migrations. Each migration runs once, in order, and is
+# recorded in the schema_version table; when the schema is current, startup
+# costs two small SELECTs and no DDL. Add new migrations to the end of
+# MIGRATIONS and never edit one that has shipped. Migrations take the cursor
+# and a Dialect, which covers the DDL and introspection differences between
+# MySQL and SQLite.
+
+# Advisory lock so a web process and workers starting together don't race
+MIGRATION_LOCK = 'sanpai_schema_migrations'
+MIGRATION_LOCK_TIMEOUT = 60
+
+
+class MySQLDialect:
+    name = 'mysql'
+    id_column = 'INT AUTO_INCREMENT PRIMARY KEY'
+    now = 'CURRENT_TIMESTAMP'
+    # Index prefix for long VARCHAR columns; upload names are far shorter
+    key_prefix = '(100)'
+    # DDL commits implicitly, so each migration is committed as it lands
+    transactional_ddl = False
+
+    @staticmethod
+    def has_table(cursor, table):
+        cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+            (table,)
+        )
+        return bool(cursor.fetchone()[0])
+
+    @staticmethod
+    def column_names(cursor, table):
+        cursor.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_schema = DATABASE() AND table_name = %s",
+            (table,)
+        )
+        return {row[0].lower() for row in cursor.fetchall()}
+
+    @staticmethod
+    def index_names(cursor, table):
+        cursor.execute(
+            "SELECT DISTINCT index_name FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND table_name = %s",
+            (table,)
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+    @staticmethod
+    def lock(cursor):
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (MIGRATION_LOCK, MIGRATION_LOCK_TIMEOUT))
+        if not cursor.fetchone()[0]:
+            raise RuntimeError('Timed out waiting for another process to finish migrating')
+
+    @staticmethod
+    def unlock(cursor):
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
+        cursor.fetchone()
+
+
+class SQLiteDialect:
+    name = 'sqlite'
+    id_column = 'INTEGER PRIMARY KEY AUTOINCREMENT'
+    # Local time, like the datetime.now() values the app writes itself
+    now = "(datetime('now', 'localtime'))"
+    key_prefix = ''
+    # DDL is transactional: every pending migration commits together
+    transactional_ddl = True
+
+    @staticmethod
+    def has_table(cursor, table):
+        cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = %s", (table,))
+        return bool(cursor.fetchone()[0])
+
+    @staticmethod
+    def column_names(cursor, table):
+        cursor.execute(f"PRAGMA table_info({table})")
+        return {row[1].lower() for row in cursor.fetchall()}
+
+    @staticmethod
+    def index_names(cursor, table):
+        cursor.execute(f"PRAGMA index_list({table})")
+        return {row[1] for row in cursor.fetchall()}
+
+    @staticmethod
+    def lock(cursor):
+        # The write lock is held until the final commit; other processes
+        # wait for it up to the connection's busy timeout.
+        cursor.execute("BEGIN IMMEDIATE")
+
+    @staticmethod
+    def unlock(cursor):
+        pass
+
+
+DIALECTS = {
+    'mysql': MySQLDialect,
+    'sqlite': SQLiteDialect,
+}
+
+
+def _add_index(cursor, dialect, table, name, columns):
+    """CREATE INDEX unless a database created by hand already has it"""
+    if name not in dialect.index_names(cursor, table):
+        cursor.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+
+
+def initial_schema(cursor, dialect):
+    """Tables as created by the old init_db, including its later columns"""
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS users (
+            id {dialect.id_column},
+            name VARCHAR(255) NOT NULL,
+            email VARCHAR(255) UNIQUE NOT NULL,
+            password_hash VARCHAR(255) NOT NULL,
+            is_admin BOOLEAN DEFAULT FALSE,
+            is_paid BOOLEAN DEFAULT FALSE,
+            login_attempts INT DEFAULT 0,
+            last_attempt TIMESTAMP NULL,
+            created_at TIMESTAMP DEFAULT {dialect.now}
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS videos (
+            id {dialect.id_column},
+            user_id INT NOT NULL,
+            title VARCHAR(255) NOT NULL,
+            video_url VARCHAR(500) NOT NULL,
+            music_style VARCHAR(100),
+            music_file VARCHAR(255),
+            created_at TIMESTAMP DEFAULT {dialect.now},
+            thumbnail_url VARCHAR(500),
+            duration FLOAT,
+            resolution VARCHAR(50),
+            size FLOAT,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    ''')
+    # Databases created before these columns existed
+    video_columns = {
+        'thumbnail_url': 'VARCHAR(500)',
+        'duration': 'FLOAT',
+        'resolution': 'VARCHAR(50)',
+        'size': 'FLOAT'
+    }
+    existing_columns = dialect.column_names(cursor, 'videos')
+    for col_name, col_type in video_columns.items():
+        if col_name not in existing_columns:
+            cursor.execute(f"ALTER TABLE videos ADD COLUMN {col_name} {col_type}")
+
+
+def render_jobs_table(cursor, dialect):
+    """Queue table consumed by worker.py"""
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS render_jobs (
+            id VARCHAR(32) PRIMARY KEY,
+            user_id INT NOT NULL,
+            status VARCHAR(20) NOT NULL DEFAULT 'queued',
+            payload TEXT NOT NULL,
+            message VARCHAR(500),
+            video_url VARCHAR(500),
+            worker_id VARCHAR(255),
+            attempts INT DEFAULT 0,
+            heartbeat_at TIMESTAMP NULL,
+            created_at TIMESTAMP DEFAULT {dialect.now},
+            started_at TIMESTAMP NULL,
+            finished_at TIMESTAMP NULL,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    ''')
+    # claim_render_job: WHERE status = 'queued' ORDER BY created_at
+    _add_index(cursor, dialect, 'render_jobs', 'idx_render_jobs_status', 'status, created_at')
+
+
+def query_indexes(cursor, dialect):
+    """Indexes matching the dashboard and admin queries"""
+    # get_videos_by_user: WHERE user_id = ? ORDER BY created_at DESC. Also
+    # serves the user_id foreign key, so MySQL drops its implicit index.
+    _add_index(cursor, dialect, 'videos', 'idx_videos_user_created', 'user_id, created_at')
+    # get_all_videos: ORDER BY v.created_at DESC over every user
+    _add_index(cursor, dialect, 'videos', 'idx_videos_created', 'created_at')
+    # get_all_users: ORDER BY created_at DESC
+    _add_index(cursor, dialect, 'users', 'idx_users_created', 'created_at')
+    # Stale job sweep in requeue_stale_render_jobs: status = 'running' AND heartbeat_at < ?
+    _add_index(cursor, dialect, 'render_jobs', 'idx_render_jobs_heartbeat', 'status, heartbeat_at')
+
+
+def default_admin(cursor, dialect):
+    """Seed the default admin account, hashing its password only once"""
+    cursor.execute("SELECT id FROM users WHERE email = %s", ('admin@sanpai.com',))
+    if cursor.fetchone():
+        return
+    admin_password_hash = generate_password_hash('admin123')
+    print(f"🔑 Creating admin user with hash: {admin_password_hash[:50]}...")
+    cursor.execute(
+        "INSERT INTO users (name, email, password_hash, is_admin, is_paid) VALUES (%s, %s, %s, %s, %s)",
+        ('Admin', 'admin@sanpai.com', admin_password_hash, True, True)
+    )
+
+
+def video_formats(cursor, dialect):
+    """Which renditions of a video exist, e.g. 'mp4' or 'mp4,hls'"""
+    if 'formats' not in dialect.column_names(cursor, 'videos'):
+        cursor.execute("ALTER TABLE videos ADD COLUMN formats VARCHAR(50) NOT NULL DEFAULT 'mp4'")
+
+
+def storage_indexes(cursor, dialect):
+    """Indexes for the storage sweeper's filename lookups"""
+    for column in ('video_url', 'thumbnail_url', 'music_file'):
+        _add_index(cursor, dialect, 'videos', f'idx_videos_{column}', f'{column}{dialect.key_prefix}')
+
+
+def storage_objects_table(cursor, dialect):
+    """Reference counts of content-addressed uploads (storage.ContentStore)"""
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS storage_objects (
+            object_key VARCHAR(255) PRIMARY KEY,
+            size BIGINT NOT NULL DEFAULT 0,
+            refcount INT NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT {dialect.now}
+        )
+    ''')
+
+
+def upload_sessions_table(cursor, dialect):
+    """Resumable chunked uploads (upload_sessions.ChunkedUploads)"""
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS upload_sessions (
+            id VARCHAR(32) PRIMARY KEY,
+            user_id INT NOT NULL,
+            kind VARCHAR(10) NOT NULL,
+            filename VARCHAR(255) NOT NULL,
+            size BIGINT NOT NULL,
+            chunk_size INT NOT NULL,
+            sha256 CHAR(64),
+            object_key VARCHAR(255),
+            created_at TIMESTAMP DEFAULT {dialect.now},
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    ''')
+    # expire_upload_sessions: WHERE created_at < ?
+    _add_index(cursor, dialect, 'upload_sessions', 'idx_upload_sessions_created', 'created_at')
+
+
+MIGRATIONS = [
+    (1, 'initial schema', initial_schema),
+    (2, 'render jobs table', render_jobs_table),
+    (3, 'query indexes', query_indexes),
+    (4, 'default admin', default_admin),
+    (5, 'video formats column', video_formats),
+    (6, 'storage indexes', storage_indexes),
+    (7, 'storage objects table', storage_objects_table),
+    (8, 'upload sessions table', upload_sessions_table),
+]
+
+
+def current_version(cursor, dialect=MySQLDialect):
+    """Highest applied migration, 0 for a fresh database"""
+    if not dialect.has_table(cursor, 'schema_version'):
+        return 0
+    cursor.execute("SELECT MAX(version) FROM schema_version")
+    return cursor.fetchone()[0] or 0
+
+
+def pending(version, migrations=MIGRATIONS):
+    return [migration for migration in migrations if migration[0] > version]
+
+
+def migrate(conn, dialect='mysql', migrations=MIGRATIONS):
+    """Apply every pending migration; returns the versions applied"""
+    dialect = DIALECTS[dialect]
+    cursor = conn.cursor()
+    try:
+        if not pending(current_version(cursor, dialect), migrations):
+            conn.commit()
+            return []
+        dialect.lock(cursor)
+        try:
+            cursor.execute(f'''
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INT PRIMARY KEY,
+                    description VARCHAR(255) NOT NULL,
+                    applied_at TIMESTAMP DEFAULT {dialect.now}
+                )
+            ''')
+            applied = []
+            # Re-read under the lock: another process may have just migrated
+            for version, description, apply in pending(current_version(cursor, dialect), migrations):
+                print(f"🛠️ Applying migration {version}: {description}")
+                apply(cursor, dialect)
+                cursor.execute(
+                    "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                    (version, description)
+                )
+                if not dialect.transactional_ddl:
+                    conn.commit()
+                applied.append(version)
+            if dialect.transactional_ddl:
+                conn.commit()
+            return applied
+        except BaseException:
+            if dialect.transactional_ddl:
+                conn.rollback()
+            raise
+        finally:
+            dialect.unlock(cursor)
+    finally:
+        cursor.close()
@@ -0,0 +1,88 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Password hashing is deliberately slow, so it runs on a small dedicated pool
+# instead of wherever a request happens to be. At most `workers` hashes run at
+# once, which leaves the remaining cores for page rendering, and at most
+# `max_pending` more may wait; beyond that callers get HasherBusy straight
+# away instead of queueing behind a burst of logins. hashlib's PBKDF2 releases
+# the GIL, so the pool's threads hash in parallel with request threads.
+
+# Parameters for new and upgraded hashes
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+
+
+class HasherBusy(Exception):
+    """Too many password hashes are already running or waiting"""
+
+
+def hash_method(stored_hash):
+    """The method prefix of a stored hash, e.g. 'pbkdf2:sha256:600000'"""
+    return stored_hash.split('$', 1)[0]
+
+
+def needs_rehash(stored_hash, method=PASSWORD_HASH_METHOD):
+    """True if stored_hash was made with other parameters than method"""
+    return hash_method(stored_hash) != method
+
+
+class PasswordHasher:
+    """Bounded executor for generate_password_hash/check_password_hash"""
+
+    def __init__(self, workers=None, max_pending=32, timeout=30.0, method=PASSWORD_HASH_METHOD):
+        self.workers = workers or max(1, (os.cpu_count() or 1) // 2)
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.method = method
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='hash')
+        self._slots = threading.BoundedSemaphore(self.workers + max_pending)
+        self.rejected = 0
+
+    def _submit(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HasherBusy('Too many password checks in progress')
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _wait(self, future):
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise HasherBusy('Password check timed out')
+
+    def hash(self, password):
+        """Hash a password with the current parameters"""
+        return self._wait(self._submit(generate_password_hash, password, self.method))
+
+    def verify(self, stored_hash, password):
+        """Check a password against its stored hash"""
+        return self._wait(self._submit(check_password_hash, stored_hash, password))
+
+    def rehash_later(self, password, save):
+        """Hash password with the current parameters in the background and
+        pass the result to save(); skipped (returns False) when busy"""
+        def rehash():
+            try:
+                save(generate_password_hash(password, self.method))
+            except Exception as e:
+                print(f"❌ Error upgrading password hash: {e}")
+        try:
+            self._submit(rehash)
+            return True
+        except HasherBusy:
+            return False
+
+    def stats(self):
+        return {'workers': self.workers, 'max_pending': self.max_pending, 'rejected': self.rejected}
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
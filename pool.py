@@ -0,0 +1,159 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Bounded, thread-safe pool of database connections. Connections are opened
+# lazily up to `size`; a checkout waits up to `timeout` seconds for one to be
+# returned. Idle connections are health-checked before reuse and replaced
+# once they are older than `max_age`.
+
+
+class PoolTimeout(Exception):
+    """No connection became available within the checkout timeout"""
+
+
+class _Pooled:
+    __slots__ = ('conn', 'created_at', 'returned_at')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = self.returned_at = time.monotonic()
+
+
+class ConnectionPool:
+    """Checkout/return pool around a connect() factory.
+
+    check(conn) returns False (or raises) for a dead connection and reset(conn)
+    is called on every return, e.g. to roll back an open transaction.
+    """
+
+    def __init__(self, connect, size=10, timeout=10.0, check=None, reset=None, check_after=30.0,
+                 max_age=3600.0, timeout_error=PoolTimeout):
+        self.connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.check = check
+        self.reset = reset
+        self.check_after = check_after
+        self.max_age = max_age
+        self.timeout_error = timeout_error
+        self._idle = []
+        self._open = 0
+        self._condition = threading.Condition()
+        self._metrics = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_seconds': 0.0,
+            'timeouts': 0,
+            'created': 0,
+            'discarded': 0,
+            'peak_in_use': 0,
+        }
+
+    def _close(self, pooled):
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
+
+    def _healthy(self, pooled):
+        now = time.monotonic()
+        if self.max_age is not None and now - pooled.created_at > self.max_age:
+            return False
+        if self.check is None or now - pooled.returned_at < self.check_after:
+            return True
+        try:
+            return bool(self.check(pooled.conn))
+        except Exception:
+            return False
+
+    def _acquire(self):
+        """Reserve an idle connection or a slot to open one"""
+        started = None
+        with self._condition:
+            while not self._idle and self._open >= self.size:
+                if started is None:
+                    started = time.monotonic()
+                    self._metrics['waits'] += 1
+                remaining = self.timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self._metrics['timeouts'] += 1
+                    raise self.timeout_error(f"No database connection free after {self.timeout}s")
+                self._condition.wait(remaining)
+            if started is not None:
+                self._metrics['wait_seconds'] += time.monotonic() - started
+            self._metrics['checkouts'] += 1
+            in_use = self._open - len(self._idle) + 1
+            self._metrics['peak_in_use'] = max(self._metrics['peak_in_use'], in_use)
+            if self._idle:
+                # Most recently returned first, so spare connections age out
+                return self._idle.pop()
+            self._open += 1
+            return None
+
+    def _discard(self):
+        with self._condition:
+            self._open -= 1
+            self._metrics['discarded'] += 1
+            self._condition.notify()
+
+    def checkout(self):
+        """Take a healthy connection out of the pool; give it back with checkin()"""
+        pooled = self._acquire()
+        if pooled is not None:
+            if self._healthy(pooled):
+                return pooled
+            self._close(pooled)
+            with self._condition:
+                self._metrics['discarded'] += 1
+        try:
+            pooled = _Pooled(self.connect())
+        except Exception:
+            with self._condition:
+                self._open -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._metrics['created'] += 1
+        return pooled
+
+    def checkin(self, pooled, broken=False):
+        """Return a connection, closing it instead if it is broken"""
+        if not broken and self.reset is not None:
+            try:
+                self.reset(pooled.conn)
+            except Exception:
+                broken = True
+        if broken:
+            self._close(pooled)
+            self._discard()
+            return
+        pooled.returned_at = time.monotonic()
+        with self._condition:
+            self._idle.append(pooled)
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a with block"""
+        pooled = self.checkout()
+        try:
+            yield pooled.conn
+        finally:
+            self.checkin(pooled)
+
+    def stats(self):
+        """Pool usage metrics"""
+        with self._condition:
+            stats = dict(self._metrics)
+            stats.update(size=self.size, open=self._open, idle=len(self._idle),
+                         in_use=self._open - len(self._idle))
+            return stats
+
+    def close(self):
+        """Close every idle connection"""
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for pooled in idle:
+            self._close(pooled)
@@ -0,0 +1,71 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+# In-process sliding-window counters for throttling failed logins. Each key
+# keeps the timestamps of its events inside the window; at most `max_keys`
+# keys are tracked and the least recently touched ones are dropped first,
+# so memory stays bounded under a spray of distinct emails or addresses.
+
+
+class SlidingWindowLimiter:
+    """Allow at most `limit` events per key in any `window` seconds"""
+
+    def __init__(self, limit, window, max_keys=10000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._events = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _recent(self, key, now):
+        """Events of key still inside the window (expired ones are dropped)"""
+        events = self._events.get(key)
+        if events is None:
+            return None
+        cutoff = now - self.window
+        while events and events[0] <= cutoff:
+            events.popleft()
+        if not events:
+            del self._events[key]
+            return None
+        return events
+
+    def count(self, key):
+        with self._lock:
+            events = self._recent(key, time.monotonic())
+            return len(events) if events else 0
+
+    def blocked(self, key):
+        """True once key has used up its limit for the current window"""
+        return self.count(key) >= self.limit
+
+    def hit(self, key):
+        """Record an event for key and return how many are in the window"""
+        with self._lock:
+            now = time.monotonic()
+            events = self._recent(key, now)
+            if events is None:
+                events = self._events[key] = deque(maxlen=self.limit)
+                while len(self._events) > self.max_keys:
+                    self._events.popitem(last=False)
+            else:
+                self._events.move_to_end(key)
+            events.append(now)
+            return len(events)
+
+    def retry_after(self, key):
+        """Seconds until key drops below its limit again"""
+        with self._lock:
+            now = time.monotonic()
+            events = self._recent(key, now)
+            if not events or len(events) < self.limit:
+                return 0
+            return max(0, int(events[0] + self.window - now) + 1)
+
+    def reset(self, key):
+        with self._lock:
+            self._events.pop(key, None)
+
+    def __len__(self):
+        return len(self._events)
@@ -0,0 +1,236 @@
+import bisect
+import math
+
+import numpy as np
+from PIL import Image
+
+# Frame generation for reels. Everything here produces HxWx3 uint8 RGB frames
+# at the output resolution directly, without going through moviepy's
+# per-frame clip machinery.
+
+OUTPUT_SIZE = (1280, 720)
+FPS = 24
+
+
+class KenBurns:
+    """Zoom/pan frame generator for one still image.
+
+    At time t the image is shown at scale * (1 + zoom_rate * t) around a
+    centre that moves linearly by pan (fractions of the image size) over the
+    duration. For every frame the transform is precomputed once as a source
+    box and the output rectangle it lands in, so rendering a frame is a single
+    crop-and-resize straight into the output buffer.
+    """
+
+    def __init__(self, image, duration, fps=FPS, size=OUTPUT_SIZE, zoom_rate=0.1,
+                 pan=(0.0, 0.0), scale=None, resample=Image.Resampling.BILINEAR):
+        if isinstance(image, np.ndarray):
+            image = Image.fromarray(image)
+        self.source = image if image.mode == 'RGB' else image.convert('RGB')
+        self.duration = duration
+        self.fps = fps
+        self.size = size
+        self.zoom_rate = zoom_rate
+        self.pan = pan
+        self.resample = resample
+        width, height = self.source.size
+        if scale is None:
+            # Fit inside the frame, never upscale (same as Image.thumbnail)
+            scale = min(size[0] / width, size[1] / height, 1.0)
+        self.scale = scale
+        self.n_frames = max(1, int(round(duration * fps)))
+        self.transforms = [self._transform(i / fps) for i in range(self.n_frames)]
+
+    def _axis(self, length, centre, zoom, out_length):
+        """Source span and output span along one axis, clipped to the image"""
+        view_start = centre - out_length / (2 * zoom)
+        dst_start = int(round(max(0.0, -view_start * zoom)))
+        dst_end = int(round(min(out_length, (length - view_start) * zoom)))
+        dst_end = max(dst_end, dst_start)
+        src_start = max(0.0, view_start + dst_start / zoom)
+        src_end = min(float(length), view_start + dst_end / zoom)
+        return src_start, src_end, dst_start, dst_end
+
+    def _transform(self, t):
+        """(source box, destination rectangle) shown at time t"""
+        width, height = self.source.size
+        progress = t / self.duration if self.duration else 0.0
+        zoom = self.scale * (1 + self.zoom_rate * t)
+        centre_x = width / 2 + self.pan[0] * width * progress
+        centre_y = height / 2 + self.pan[1] * height * progress
+        sx0, sx1, dx0, dx1 = self._axis(width, centre_x, zoom, self.size[0])
+        sy0, sy1, dy0, dy1 = self._axis(height, centre_y, zoom, self.size[1])
+        return (sx0, sy0, sx1, sy1), (dx0, dy0, dx1, dy1)
+
+    def frame_index(self, t):
+        """Index of the precomputed frame shown at time t"""
+        return min(max(int(round(t * self.fps)), 0), self.n_frames - 1)
+
+    def render(self, index, out=None):
+        """Render frame index into out (allocated when not given) and return it"""
+        if out is None:
+            out = np.empty((self.size[1], self.size[0], 3), dtype=np.uint8)
+        box, (dx0, dy0, dx1, dy1) = self.transforms[index]
+        if (dx0, dy0, dx1, dy1) != (0, 0, self.size[0], self.size[1]):
+            out.fill(0)
+        if dx1 > dx0 and dy1 > dy0:
+            scaled = self.source.resize((dx1 - dx0, dy1 - dy0), self.resample, box=box)
+            out[dy0:dy1, dx0:dx1] = np.asarray(scaled)
+        return out
+
+    def make_frame(self, t):
+        """moviepy-style frame callback"""
+        return self.render(self.frame_index(t))
+
+
+TRANSITIONS = ('fade', 'slide_in', 'slide_out', 'crossfade', 'wipe')
+SIDES = ('left', 'right', 'top', 'bottom')
+
+
+def _paste_shifted(dst, src, dx, dy):
+    """Copy src onto dst shifted by (dx, dy) pixels, dropping what falls outside"""
+    height, width = dst.shape[:2]
+    if abs(dx) >= width or abs(dy) >= height:
+        return
+    dst[max(dy, 0):height + min(dy, 0), max(dx, 0):width + min(dx, 0)] = \
+        src[max(-dy, 0):height + min(-dy, 0), max(-dx, 0):width + min(-dx, 0)]
+
+
+def _side_offset(side, distance, width, height):
+    """Pixel offset of a layer that is distance (0-1) of the way off-screen towards side"""
+    if side == 'left':
+        return -int(round(distance * width)), 0
+    if side == 'right':
+        return int(round(distance * width)), 0
+    if side == 'top':
+        return 0, -int(round(distance * height))
+    return 0, int(round(distance * height))
+
+
+class Timeline:
+    """A reel: KenBurns segments overlapping by transition_duration.
+
+    transitions[i] is a (name, side) pair describing how segment i + 1 comes
+    in over segment i; side is only used by the slide transitions. At any
+    time at most two segments are active, so a frame costs at most two
+    segment renders plus one in-place blend into a reused output buffer,
+    however many photos the reel has.
+    """
+
+    def __init__(self, segments, transitions, transition_duration=0.5, fps=FPS, size=OUTPUT_SIZE):
+        if len(transitions) != max(len(segments) - 1, 0):
+            raise ValueError("Need exactly one transition between each pair of segments")
+        self.segments = segments
+        self.transitions = transitions
+        self.transition_duration = transition_duration
+        self.fps = fps
+        self.size = size
+        self.starts = []
+        start = 0.0
+        for segment in segments:
+            self.starts.append(start)
+            start += segment.duration - transition_duration
+        self.duration = start + transition_duration if segments else 0.0
+        self.n_frames = int(round(self.duration * fps))
+        shape = (size[1], size[0], 3)
+        self._out = np.empty(shape, dtype=np.uint8)
+        self._layer = np.empty(shape, dtype=np.uint8)
+        self._blend = np.empty(shape, dtype=np.float32)
+        self._blend_in = np.empty(shape, dtype=np.float32)
+
+    def __getstate__(self):
+        # Scratch buffers are recreated on unpickling (e.g. in worker processes)
+        state = self.__dict__.copy()
+        for name in ('_out', '_layer', '_blend', '_blend_in'):
+            state.pop(name)
+        return state
+
+    def __setstate__(self, state):
+        self.__init__(state['segments'], state['transitions'], state['transition_duration'],
+                      state['fps'], state['size'])
+
+    def active(self, t):
+        """(index, progress) at time t: segment index is on screen and, when
+        progress is not None, segment index + 1 is transitioning in"""
+        index = max(bisect.bisect_right(self.starts, t) - 1, 0)
+        if index > 0 and t < self.starts[index - 1] + self.segments[index - 1].duration:
+            index -= 1
+        if index + 1 < len(self.segments) and t >= self.starts[index + 1]:
+            progress = (t - self.starts[index + 1]) / self.transition_duration
+            return index, min(max(progress, 0.0), 1.0)
+        return index, None
+
+    def _render_segment(self, index, t, out):
+        segment = self.segments[index]
+        return segment.render(segment.frame_index(t - self.starts[index]), out)
+
+    def render(self, frame_number, out=None):
+        """Render global frame frame_number into out (the shared buffer by default)"""
+        return self.render_at(frame_number / self.fps, out)
+
+    def render_at(self, t, out=None):
+        """Render the frame shown at time t into out (the shared buffer by default)"""
+        out = self._out if out is None else out
+        index, progress = self.active(t)
+        if progress is None:
+            return self._render_segment(index, t, out)
+        name, side = self.transitions[index]
+        width, height = self.size
+        if name == 'slide_out':
+            # The outgoing segment slides away on top of the incoming one
+            self._render_segment(index + 1, t, out)
+            outgoing = self._render_segment(index, t, self._layer)
+            dx, dy = _side_offset(side, progress, width, height)
+            _paste_shifted(out, outgoing, dx, dy)
+            return out
+        outgoing = self._render_segment(index, t, out)
+        incoming = self._render_segment(index + 1, t, self._layer)
+        if name == 'crossfade':
+            np.multiply(outgoing, 1.0 - progress, out=self._blend)
+            np.multiply(incoming, progress, out=self._blend_in)
+            self._blend += self._blend_in
+            np.copyto(out, self._blend, casting='unsafe')
+        elif name == 'slide_in':
+            dx, dy = _side_offset(side, 1.0 - progress, width, height)
+            _paste_shifted(out, incoming, dx, dy)
+        elif name == 'wipe':
+            edge = int(round(progress * width))
+            out[:, :edge] = incoming[:, :edge]
+        else:  # fade: the incoming segment fades in from black
+            np.multiply(incoming, progress, out=self._blend)
+            np.copyto(out, self._blend, casting='unsafe')
+        return out
+
+    def segment_ranges(self):
+        """[(start_frame, stop_frame)] splitting the reel into one range per
+        photo; each range ends when that photo's outgoing transition ends, so
+        no transition is ever split across two ranges"""
+        bounds = [0]
+        for index in range(1, len(self.segments)):
+            # The first frame past segment index - 1, by the same test as
+            # active(): rounding down would leave the range a frame of the
+            # transition, which its window can't render without that segment
+            end = self.starts[index - 1] + self.segments[index - 1].duration
+            bound = math.ceil(end * self.fps)
+            while bound / self.fps < end:
+                bound += 1
+            bounds.append(min(bound, self.n_frames))
+        bounds.append(self.n_frames)
+        return [(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1) if bounds[i + 1] > bounds[i]]
+
+    def window(self, first, last):
+        """(timeline, time_offset) holding only segments first..last, enough to
+        render any frame those segments are on screen for"""
+        window = Timeline(self.segments[first:last + 1], self.transitions[first:last],
+                          self.transition_duration, self.fps, self.size)
+        return window, self.starts[first]
+
+    def frames(self, start=0, stop=None):
+        """Yield frames start..stop-1; every frame is the same reused buffer"""
+        stop = self.n_frames if stop is None else stop
+        for frame_number in range(start, stop):
+            yield self.render(frame_number)
+
+    def make_frame(self, t):
+        """moviepy-style frame callback"""
+        return self.render_at(t)
@@ -386,23 +386,37 @@ function generateVideo() {
     button.innerHTML = '<span class="spinner"></span> Generating...';
     button.disabled = true;
     
-    // Create FormData for file upload
-    const formData = new FormData();
-    for (let i = 0; i < uploadArea.files.length; i++) {
-        formData.append('photos', uploadArea.files[i]);
-    }
-    formData.append('music_style', musicStyle);
-    
-    // Send request to server
-    fetch('/generate_video', {
-        method: 'POST',
-        body: formData
+    // Upload the photos in resumable chunks, then start the render with them
+    let uploaded = false;
+    uploadReelFiles(uploadArea.files, null, fraction => {
+        button.innerHTML = `<span class="spinner"></span> Uploading ${Math.round(fraction * 100)}%`;
+    })
+    .then(formData => {
+        uploaded = true;
+        formData.append('music_style', musicStyle);
+        button.innerHTML = '<span class="spinner"></span> Generating...';
+        // Rendering happens in a background job
+        return fetch('/generate_video', {
+            method: 'POST',
+            body: formData
+        });
     })
     .then(response => response.json())
     .then(data => {
-        if (data.success) {
+        if (!data.success) {
+            throw new Error(data.message);
+        }
+        button.innerHTML = '<span class="spinner"></span> Queued...';
+        return pollJob(data.status_url, job => {
+            if (job.status === 'running') {
+                button.innerHTML = '<span class="spinner"></span> Rendering...';
+            }
+        });
+    })
+    .then(job => {
+        if (job.status === 'done') {
             // Show success message
-            alert('Video generated successfully! Download link: ' + data.video_url);
+            alert('Video generated successfully! Download link: ' + job.video_url);
             
             // Reset form
             if (uploadArea) {
@@ -414,12 +428,14 @@ function generateVideo() {
                 uploadArea.files = null;
             }
         } else {
-            alert('Error generating video: ' + data.message);
+            alert('Error generating video: ' + job.message);
         }
     })
     .catch(error => {
         console.error('Error:', error);
-        alert('An error occurred while generating the video');
+        // Trying again only sends what the server doesn't have yet
+        alert('An error occurred while generating the video: ' + error.message +
+              (uploaded ? '' : ' Try again to resume the upload.'));
     })
     .finally(() => {
         // Reset button
@@ -428,6 +444,224 @@ function generateVideo() {
     });
 }
 
+// Resumable uploads: each file is sent in chunks through /upload_sessions,
+// so a dropped connection only costs the chunks that were in flight. The
+// session of every file is remembered for the rest of the browser session:
+// trying again, or reloading the page and picking the same files, reuses
+// finished uploads and only sends the chunks the server doesn't have yet.
+const UPLOAD_PARALLEL_FILES = 2;
+const UPLOAD_PARALLEL_CHUNKS = 3;
+const UPLOAD_CHUNK_ATTEMPTS = 5;
+
+// Run task(item) for every item, at most limit at a time
+function runLimited(items, limit, task) {
+    const results = [];
+    let next = 0;
+    const worker = () => {
+        if (next >= items.length) {
+            return Promise.resolve();
+        }
+        const i = next++;
+        return task(items[i], i).then(result => {
+            results[i] = result;
+            return worker();
+        });
+    };
+    const workers = [];
+    for (let i = 0; i < Math.min(limit, items.length); i++) {
+        workers.push(worker());
+    }
+    return Promise.all(workers).then(() => results);
+}
+
+// Parse a JSON answer; rejects with the status and body unless it succeeded
+function uploadResponse(response) {
+    return response.json().then(data => {
+        if (!data.success) {
+            const error = new Error(data.message);
+            error.status = response.status;
+            error.data = data;
+            throw error;
+        }
+        return data;
+    });
+}
+
+// Hex SHA-256 of a file, or null where the browser can't compute it (Web
+// Crypto needs HTTPS or localhost); the server then only checks sizes
+function sha256Hex(file) {
+    if (!window.crypto || !window.crypto.subtle) {
+        return Promise.resolve(null);
+    }
+    return file.arrayBuffer()
+        .then(buffer => window.crypto.subtle.digest('SHA-256', buffer))
+        .then(digest => Array.from(new Uint8Array(digest), b => b.toString(16).padStart(2, '0')).join(''));
+}
+
+function putChunk(upload, file, index, attempt = 1) {
+    const start = index * upload.chunk_size;
+    return fetch(`/upload_sessions/${upload.upload_id}/chunks/${index}`, {
+        method: 'PUT',
+        headers: {'Content-Type': 'application/octet-stream'},
+        body: file.slice(start, start + upload.chunk_size)
+    })
+    .then(uploadResponse)
+    .catch(error => {
+        // A 4xx answer won't change; network errors and 5xx are retried with backoff
+        if ((error.status && error.status < 500) || attempt >= UPLOAD_CHUNK_ATTEMPTS) {
+            throw error;
+        }
+        return new Promise(resolve => setTimeout(resolve, 1000 * 2 ** attempt))
+            .then(() => putChunk(upload, file, index, attempt + 1));
+    });
+}
+
+// Send the chunks the server doesn't have yet, then complete the upload
+function finishUpload(upload, file, onProgress, retries = 1) {
+    const missing = [];
+    for (let i = 0; i < upload.chunk_count; i++) {
+        if (!upload.received.includes(i)) {
+            missing.push(i);
+        }
+    }
+    let sent = upload.chunk_count - missing.length;
+    return runLimited(missing, UPLOAD_PARALLEL_CHUNKS, index => putChunk(upload, file, index).then(() => {
+        sent++;
+        onProgress(sent / upload.chunk_count);
+    }))
+    .then(() => fetch(`/upload_sessions/${upload.upload_id}/complete`, {method: 'POST'}))
+    .then(uploadResponse)
+    .catch(error => {
+        // Missing chunks (409) or a checksum mismatch (422): the answer
+        // lists the chunks the server has, so send the others again
+        if ((error.status === 409 || error.status === 422) && error.data && error.data.received && retries > 0) {
+            return finishUpload(Object.assign({}, upload, {received: error.data.received}), file, onProgress, retries - 1);
+        }
+        throw error;
+    });
+}
+
+// sessionStorage key of a file's upload session
+function uploadSessionKey(file, kind) {
+    return `upload_session:${kind}:${file.name}:${file.size}:${file.lastModified}`;
+}
+
+// Storage can be disabled (e.g. private browsing); uploads then just
+// aren't resumed across attempts
+function savedUploadId(key) {
+    try {
+        return window.sessionStorage.getItem(key);
+    } catch (e) {
+        return null;
+    }
+}
+
+function saveUploadId(key, uploadId) {
+    try {
+        if (uploadId) {
+            window.sessionStorage.setItem(key, uploadId);
+        } else {
+            window.sessionStorage.removeItem(key);
+        }
+    } catch (e) {
+        // Not resumable, still uploads
+    }
+}
+
+// Status of the file's earlier upload session, or null if there is none
+// left to resume (used by a render, expired or never started)
+function resumeUpload(key) {
+    const uploadId = savedUploadId(key);
+    if (!uploadId) {
+        return Promise.resolve(null);
+    }
+    return fetch(`/upload_sessions/${encodeURIComponent(uploadId)}`)
+    .then(uploadResponse)
+    .catch(error => {
+        if (!error.status) {
+            throw error;
+        }
+        saveUploadId(key, null);
+        return null;
+    });
+}
+
+function startUpload(file, kind, key) {
+    return sha256Hex(file)
+    .then(sha256 => fetch('/upload_sessions', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({kind: kind, filename: file.name, size: file.size, sha256: sha256})
+    }))
+    .then(uploadResponse)
+    .then(upload => {
+        saveUploadId(key, upload.upload_id);
+        return upload;
+    });
+}
+
+// Upload one file (kind 'photo' or 'music'), picking up where an earlier
+// attempt stopped; resolves to its upload_id
+function uploadFile(file, kind, onProgress) {
+    const key = uploadSessionKey(file, kind);
+    return resumeUpload(key)
+    .then(upload => upload || startUpload(file, kind, key))
+    .then(upload => upload.complete ? upload : finishUpload(upload, file, onProgress))
+    .then(upload => {
+        onProgress(1);
+        return upload.upload_id;
+    });
+}
+
+// Upload a reel's photos and optional music; resolves to the FormData
+// /generate_video expects, naming the finished uploads
+function uploadReelFiles(photos, music, onProgress) {
+    const files = Array.from(photos).map(file => [file, 'photo']);
+    if (music) {
+        files.push([music, 'music']);
+    }
+    const progress = files.map(() => 0);
+    return runLimited(files, UPLOAD_PARALLEL_FILES, ([file, kind], i) => uploadFile(file, kind, fraction => {
+        progress[i] = fraction;
+        if (onProgress) {
+            onProgress(progress.reduce((a, b) => a + b, 0) / files.length);
+        }
+    }))
+    .then(uploadIds => {
+        const formData = new FormData();
+        files.forEach(([, kind], i) => {
+            formData.append(kind === 'music' ? 'music_upload_id' : 'upload_ids', uploadIds[i]);
+        });
+        return formData;
+    });
+}
+
+// Poll a background render job until it is done or failed
+function pollJob(statusUrl, onUpdate, interval = 2000) {
+    return new Promise((resolve, reject) => {
+        const check = () => {
+            fetch(statusUrl)
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) {
+                    reject(new Error(data.message));
+                    return;
+                }
+                if (onUpdate) {
+                    onUpdate(data.job);
+                }
+                if (data.job.status === 'done' || data.job.status === 'failed') {
+                    resolve(data.job);
+                } else {
+                    setTimeout(check, interval);
+                }
+            })
+            .catch(reject);
+        };
+        check();
+    });
+}
+
 // Admin panel functionality
 function showAdminPanel() {
     document.getElementById('auth-container').style.display = 'none';
@@ -0,0 +1,245 @@
+import hashlib
+import mimetypes
+import os
+import shutil
+import tempfile
+import uuid
+from contextlib import contextmanager
+
+from werkzeug.security import safe_join
+
+# Sharded upload storage. Uploaded photos and music are stored once per
+# distinct content under their SHA-256 (ab/cd/abcd....jpg) with a reference
+# count, so the same file uploaded twice takes the space of one. Renders and
+# thumbnails get uuid keys in the same two-level layout. Keeping every
+# directory small keeps lookups, listings and backups fast with millions of
+# files; names from before the layout (no slash) still resolve to the top
+# level. Files are never deleted here: storage_gc removes unreferenced ones.
+#
+# The objects themselves live in a LocalStorage folder (default) or an
+# S3-compatible bucket (STORAGE_BACKEND=s3), so web and render nodes don't
+# have to share a disk. Both expose the same methods:
+#   scratch_path(key)  local path to write a new object to
+#   save(key, path)    make the file at path the object key
+#   exists(key)
+#   fetch(key)         context manager yielding a local path to read
+#   path(key)          local path of a stored object, None for S3
+#   url(key)           direct download URL, None when the app serves it
+
+CHUNK_SIZE = 1024 * 1024
+# Partial uploads; the storage sweeper clears out leftovers
+TMP_DIR = 'tmp'
+# Every key names immutable content (a hash or a fresh uuid)
+OBJECT_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+
+
+def shard(name):
+    """'abcdef...' -> 'ab/cd/abcdef...'"""
+    return f"{name[:2]}/{name[2:4]}/{name}"
+
+
+def _makedirs_for(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+class LocalStorage:
+    """Objects as files in one folder"""
+
+    name = 'local'
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, key):
+        """Absolute path of key; None if key would escape the folder"""
+        return safe_join(self.root, key)
+
+    def scratch_path(self, key):
+        # Written in place: saving is then a no-op
+        return _makedirs_for(self.path(key))
+
+    def save(self, key, path):
+        target = self.path(key)
+        if os.path.abspath(path) != os.path.abspath(target):
+            os.replace(path, _makedirs_for(target))
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    @contextmanager
+    def fetch(self, key):
+        yield self.path(key)
+
+    def url(self, key):
+        return None
+
+
+class S3Storage:
+    """Objects in an S3-compatible bucket (AWS, MinIO, Ceph, ...).
+
+    boto3 is only imported when this is used. Files larger than
+    multipart_threshold are uploaded and downloaded in multipart_chunksize
+    parts, streamed from disk; downloads go straight from the bucket to the
+    client through presigned URLs.
+    """
+
+    name = 's3'
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, region=None, scratch_dir=None,
+                 multipart_threshold=8 * 1024 * 1024, multipart_chunksize=8 * 1024 * 1024,
+                 max_concurrency=4, url_expires=3600, client=None):
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config
+        from botocore.exceptions import ClientError
+        self.bucket = bucket
+        self.prefix = prefix
+        self.url_expires = url_expires
+        self.scratch_dir = scratch_dir or os.path.join(tempfile.gettempdir(), 'sanpai-storage')
+        self.ClientError = ClientError
+        # SigV4 presigned URLs work in every region and on MinIO; local
+        # stand-ins usually need path-style URLs too
+        config = Config(signature_version='s3v4', s3={'addressing_style': 'path' if endpoint_url else 'auto'})
+        self.client = client or boto3.client('s3', endpoint_url=endpoint_url, region_name=region, config=config)
+        self.transfer = TransferConfig(multipart_threshold=multipart_threshold,
+                                       multipart_chunksize=multipart_chunksize,
+                                       max_concurrency=max_concurrency)
+
+    def _key(self, key):
+        return self.prefix + key
+
+    def path(self, key):
+        return None
+
+    def scratch_path(self, key):
+        return _makedirs_for(safe_join(self.scratch_dir, key))
+
+    def save(self, key, path):
+        """Upload the file at path, then delete the local copy"""
+        content_type = mimetypes.guess_type(key)[0] or 'application/octet-stream'
+        self.client.upload_file(path, self.bucket, self._key(key), Config=self.transfer, ExtraArgs={
+            'ContentType': content_type,
+            'CacheControl': OBJECT_CACHE_CONTROL,
+        })
+        os.remove(path)
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+            return True
+        except self.ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    @contextmanager
+    def fetch(self, key):
+        """Download key to a scratch file for the length of the with block"""
+        directory = tempfile.mkdtemp(dir=_makedirs_for(os.path.join(self.scratch_dir, TMP_DIR, '')))
+        path = os.path.join(directory, os.path.basename(key))
+        try:
+            self.client.download_file(self.bucket, self._key(key), path, Config=self.transfer)
+            yield path
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def url(self, key):
+        return self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': self._key(key)}, ExpiresIn=self.url_expires
+        )
+
+
+def make_storage(root):
+    """Object storage selected by STORAGE_BACKEND (local files in root by default)"""
+    name = os.environ.get('STORAGE_BACKEND', 'local').lower()
+    if name == 'local':
+        return LocalStorage(root)
+    if name == 's3':
+        return S3Storage(
+            os.environ['S3_BUCKET'],
+            prefix=os.environ.get('S3_PREFIX', ''),
+            endpoint_url=os.environ.get('S3_ENDPOINT_URL') or None,
+            region=os.environ.get('S3_REGION') or None,
+            scratch_dir=os.environ.get('STORAGE_SCRATCH_DIR') or None,
+            multipart_threshold=int(os.environ.get('S3_MULTIPART_THRESHOLD_MB', 8)) * 1024 * 1024,
+            multipart_chunksize=int(os.environ.get('S3_MULTIPART_CHUNK_MB', 8)) * 1024 * 1024,
+            url_expires=int(os.environ.get('S3_URL_EXPIRES', 3600))
+        )
+    raise ValueError(f"Unknown STORAGE_BACKEND: {name}")
+
+
+class ContentStore:
+    """Content-addressed inputs and sharded outputs on top of an object storage.
+
+    acquire(key, size) records a reference and returns True when the object
+    had none before (None if that failed); release(key) drops one.
+    """
+
+    def __init__(self, objects, acquire=None, release=None):
+        self.objects = objects
+        self._acquire = acquire
+        self._release = release
+
+    def path(self, key):
+        return self.objects.path(key)
+
+    def scratch_path(self, key):
+        return self.objects.scratch_path(key)
+
+    def save(self, key, path):
+        self.objects.save(key, path)
+
+    def exists(self, key):
+        return self.objects.exists(key)
+
+    def fetch(self, key):
+        return self.objects.fetch(key)
+
+    def url(self, key):
+        return self.objects.url(key)
+
+    def put(self, stream, ext):
+        """Store a file-like object by content and take a reference on it.
+
+        Raises RuntimeError if the reference could not be recorded; if
+        storing the file fails, the reference is dropped again.
+        """
+        tmp_path = self.objects.scratch_path(f"{TMP_DIR}/{uuid.uuid4().hex}")
+        first = None
+        try:
+            digest = hashlib.sha256()
+            size = 0
+            with open(tmp_path, 'wb') as f:
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            key = shard(digest.hexdigest()) + ext.lower()
+            first = self._acquire(key, size) if self._acquire else None
+            if first is None and self._acquire:
+                # Without a reference the sweeper would delete the file
+                raise RuntimeError('Could not record a reference to the stored file')
+            if first is False and self.objects.exists(key):
+                # Already stored and referenced, so the sweeper keeps it
+                os.remove(tmp_path)
+            else:
+                self.objects.save(key, tmp_path)
+            return key
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            if first is not None and self._release:
+                # The object may not be stored, so don't keep it referenced
+                self._release(key)
+            raise
+
+    def release(self, key):
+        """Drop a reference taken by put()"""
+        if key and self._release:
+            self._release(key)
+
+    def new_key(self, ext, prefix=''):
+        """A fresh sharded key for an output file"""
+        name = uuid.uuid4().hex
+        return f"{name[:2]}/{name[2:4]}/{prefix}{name}{ext}"
@@ -0,0 +1,238 @@
+"""Storage sweeper: deletes files in uploads/ that nothing refers to any more.
+
+Run it from a web process (STORAGE_GC_INTERVAL) or on its own:
+
+    python storage_gc.py --dry-run      # report what one full pass would delete
+    python storage_gc.py                # delete, then exit
+
+Renders, thumbnails and music are kept while a videos row names them,
+photos and music while a queued or running render job does, and
+content-addressed uploads while their reference count is above zero.
+Everything else is deleted once it is older than the grace period, which
+covers uploads of renders still in progress. The flat top level and
+storage.ContentStore's shard directories are walked in bounded batches, so
+each step costs at most batch_size stats and one database query.
+"""
+import argparse
+import fnmatch
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+
+from storage import TMP_DIR
+
+# Leftovers of renders that crashed: moviepy's temp audio, ffmpeg concat
+# lists and encoder.encode_timeline's segment directories; and files a
+# sweeper stopped in the middle of deleting
+TEMP_PATTERNS = ('temp_audio_*', '*TEMP_MPY_*', '*.concat.txt', 'segments_*', '*.sweeping')
+# HLS pieces belong to the MP4 they were packaged from
+HLS_PIECE = re.compile(r'^([0-9a-f]{32})(_\w+)?\.(m3u8|m4s|mp4)$', re.IGNORECASE)
+# storage.ContentStore's two levels of shard directories
+SHARD_DIR = re.compile(r'^[0-9a-f]{2}$')
+
+
+def is_temp(key):
+    name = key.rsplit('/', 1)[-1]
+    return key.startswith(TMP_DIR + '/') or any(fnmatch.fnmatch(name, pattern) for pattern in TEMP_PATTERNS)
+
+
+def owner_name(key):
+    """The key a database row would store for key"""
+    directory, _, name = key.rpartition('/')
+    match = HLS_PIECE.match(name)
+    if not match:
+        return key
+    return f"{directory}/{match.group(1)}.mp4" if directory else f"{match.group(1)}.mp4"
+
+
+def _tree_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class StorageSweeper:
+    """Incremental mark-and-sweep of one upload folder.
+
+    referenced(names) returns the subset of names still in use, or None if
+    that cannot be determined right now; nothing is deleted in that case.
+    """
+
+    def __init__(self, upload_dir, referenced, grace_seconds=3600, batch_size=500, dry_run=False):
+        self.upload_dir = upload_dir
+        self.referenced = referenced
+        self.grace_seconds = grace_seconds
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self._entries = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.scanned = 0
+        self.deleted = 0
+        self.bytes_reclaimed = 0
+        self.errors = 0
+        self.passes = 0
+        self._pass_bytes = 0
+        self.last_pass_bytes = None
+
+    def _walk(self, directory='', depth=0):
+        """(key, entry) for every file, temp directory and tmp/ upload"""
+        with os.scandir(os.path.join(self.upload_dir, directory)) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                key = f"{directory}/{entry.name}" if directory else entry.name
+                if entry.is_dir(follow_symlinks=False) and not is_temp(key):
+                    if (depth < 2 and SHARD_DIR.match(entry.name)) or (depth == 0 and entry.name == TMP_DIR):
+                        yield from self._walk(key, depth + 1)
+                    continue
+                yield key, entry
+
+    def _next_batch(self):
+        """Up to batch_size entries, continuing the current pass"""
+        if self._entries is None:
+            self._entries = self._walk()
+        batch = []
+        for item in self._entries:
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                return batch, False
+        self._entries = None
+        return batch, True
+
+    def _remove(self, entry):
+        """Delete a file or temp directory; returns the bytes freed, or None
+        if the file turned out to be in use after all"""
+        if entry.is_dir(follow_symlinks=False):
+            size = _tree_size(entry.path)
+            if not self.dry_run:
+                shutil.rmtree(entry.path)
+            return size
+        # Cached from before the references were looked up
+        listed = entry.stat(follow_symlinks=False)
+        if self.dry_run:
+            return listed.st_size
+        # ContentStore.put() writes an object again when it gets its first
+        # reference back, possibly after the lookup. Move the file aside and
+        # only delete it if it is still the one that was listed.
+        aside = f"{entry.path}.{uuid.uuid4().hex}.sweeping"
+        os.rename(entry.path, aside)
+        moved = os.stat(aside, follow_symlinks=False)
+        if (moved.st_ino, moved.st_mtime_ns) != (listed.st_ino, listed.st_mtime_ns):
+            # Stored again: a content-addressed key always holds the same bytes
+            os.replace(aside, entry.path)
+            return None
+        os.remove(aside)
+        return listed.st_size
+
+    def sweep_batch(self):
+        """Check one batch of files; returns True when a full pass has finished"""
+        with self._lock:
+            batch, finished = self._next_batch()
+            cutoff = time.time() - self.grace_seconds
+            candidates = []
+            for key, entry in batch:
+                try:
+                    old = entry.stat(follow_symlinks=False).st_mtime <= cutoff
+                    if old and (is_temp(key) or entry.is_file(follow_symlinks=False)):
+                        candidates.append((key, entry))
+                except OSError:
+                    continue
+            names = {owner_name(key) for key, _ in candidates if not is_temp(key)}
+            in_use = self.referenced(names) if names else set()
+            for key, entry in candidates:
+                if not is_temp(key):
+                    # in_use is None when the lookup failed: keep the file for now
+                    if in_use is None or owner_name(key) in in_use:
+                        continue
+                try:
+                    freed = self._remove(entry)
+                except FileNotFoundError:
+                    # Another sweeper got there first
+                    continue
+                except OSError as e:
+                    self.errors += 1
+                    print(f"❌ Error deleting {entry.path}: {e}")
+                    continue
+                if freed is None:
+                    continue
+                self.deleted += 1
+                self.bytes_reclaimed += freed
+                self._pass_bytes += freed
+            self.scanned += len(batch)
+            if finished:
+                self.passes += 1
+                self.last_pass_bytes, self._pass_bytes = self._pass_bytes, 0
+            return finished
+
+    def sweep(self):
+        """Run one full pass; returns the bytes reclaimed by it"""
+        while not self.sweep_batch():
+            pass
+        return self.last_pass_bytes
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                if self.sweep_batch() and self.last_pass_bytes:
+                    print(f"🧹 Storage sweep reclaimed {self.last_pass_bytes / (1024 * 1024):.1f} MB")
+            except Exception as e:
+                print(f"❌ Error sweeping {self.upload_dir}: {e}")
+
+    def start(self, interval=60.0):
+        """Sweep one batch every interval seconds on a daemon thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(interval,), name='storage-gc', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        return {
+            'upload_dir': self.upload_dir,
+            'running': self._thread is not None,
+            'dry_run': self.dry_run,
+            'grace_seconds': self.grace_seconds,
+            'batch_size': self.batch_size,
+            'scanned': self.scanned,
+            'deleted': self.deleted,
+            'bytes_reclaimed': self.bytes_reclaimed,
+            'last_pass_bytes': self.last_pass_bytes,
+            'passes': self.passes,
+            'errors': self.errors,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Delete unreferenced files from the upload folder')
+    parser.add_argument('--upload-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads'))
+    parser.add_argument('--grace', type=float, default=3600, help='keep files younger than this many seconds')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--dry-run', action='store_true', help='only report what would be deleted')
+    args = parser.parse_args()
+
+    from database import init_db, get_referenced_files
+    init_db()
+    sweeper = StorageSweeper(args.upload_dir, get_referenced_files, args.grace, args.batch_size, args.dry_run)
+    reclaimed = sweeper.sweep()
+    verb = 'Would delete' if args.dry_run else 'Deleted'
+    print(f"🧹 {verb} {sweeper.deleted} of {sweeper.scanned} entries, "
+          f"{reclaimed / (1024 * 1024):.1f} MB ({sweeper.errors} errors)")
+
+
+if __name__ == '__main__':
+    main()
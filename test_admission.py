@@ -0,0 +1,88 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+import admission
+
+
+def fake_psutil(cpu=10.0, available_mb=4096):
+    psutil = MagicMock()
+    psutil.cpu_percent.return_value = cpu
+    psutil.virtual_memory.return_value = MagicMock(available=available_mb * 1024 * 1024, percent=50.0)
+    return psutil
+
+
+class TestAdmissionController(unittest.TestCase):
+    def make(self, psutil, **kwargs):
+        patcher = patch.object(admission, 'psutil', psutil)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        kwargs.setdefault('sample_interval', 0)
+        return admission.AdmissionController(**kwargs)
+
+    def test_rejects_once_the_waiting_room_is_full(self):
+        controller = self.make(fake_psutil(), max_renders=1, max_queued=2)
+        self.assertTrue(controller.try_admit()[0])
+        self.assertTrue(controller.try_admit()[0])
+        admitted, reason, retry_after = controller.try_admit()
+        self.assertFalse(admitted)
+        self.assertIn('queue is full', reason)
+        self.assertGreaterEqual(retry_after, 5)
+        self.assertEqual(controller.state()['rejected'], 1)
+        controller.cancel()
+        self.assertTrue(controller.try_admit()[0])
+
+    def test_caps_concurrent_renders(self):
+        controller = self.make(fake_psutil(), max_renders=1)
+        controller.try_admit()
+        controller.try_admit()
+        started = []
+        release = threading.Event()
+
+        def render(name):
+            with controller.slot(poll_interval=0.01):
+                started.append(name)
+                release.wait(5)
+
+        threads = [threading.Thread(target=render, args=(name,)) for name in ('a', 'b')]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        self.assertEqual(len(started), 1)
+        self.assertEqual(controller.state()['running'], 1)
+        self.assertEqual(controller.state()['waiting'], 1)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(started), 2)
+        self.assertEqual(controller.state()['running'], 0)
+
+    def test_busy_host_only_runs_one_render(self):
+        psutil = fake_psutil(cpu=99.0)
+        controller = self.make(psutil, max_renders=4)
+        self.assertFalse(controller.host_has_headroom())
+        controller.try_admit()
+        controller.try_admit()
+        with controller.slot(poll_interval=0.01):
+            self.assertTrue(controller.state()['saturated'])
+            psutil.cpu_percent.return_value = 20.0
+            with controller.slot(poll_interval=0.01):
+                self.assertEqual(controller.state()['running'], 2)
+
+    def test_rejects_when_memory_is_low(self):
+        controller = self.make(fake_psutil(available_mb=100), min_available_mb=512)
+        controller.try_admit()
+        with controller.slot():
+            admitted, reason, _ = controller.try_admit()
+        self.assertFalse(admitted)
+        self.assertIn('memory', reason)
+
+
+    def test_needs_at_least_one_render_slot(self):
+        with self.assertRaises(ValueError):
+            self.make(fake_psutil(), max_renders=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import time
+import unittest
+
+from cache import TTLCache
+
+
+class TestTTLCache(unittest.TestCase):
+    def test_hits_and_misses_are_counted(self):
+        cache = TTLCache(maxsize=4, ttl=60)
+        self.assertIsNone(cache.get('a'))
+        cache.set('a', [1])
+        self.assertEqual(cache.get('a'), [1])
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+    def test_entries_expire(self):
+        cache = TTLCache(maxsize=4, ttl=0.01)
+        cache.set('a', 1)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_invalidate_and_clear(self):
+        cache = TTLCache(maxsize=4, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.invalidate('a')
+        cache.invalidate('missing')
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), 2)
+        cache.clear()
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats()['invalidations'], 2)
+
+    def test_results_read_before_an_invalidation_are_not_cached(self):
+        cache = TTLCache(maxsize=2)
+        generation = cache.generation('a')
+        cache.invalidate('a')  # a write committed while 'a' was being read
+        self.assertFalse(cache.set('a', 'stale', generation))
+        self.assertIsNone(cache.get('a'))
+        # Other keys, and reads started after the invalidation, are cached
+        self.assertTrue(cache.set('b', 1, generation))
+        self.assertTrue(cache.set('a', 'fresh', cache.generation('a')))
+        self.assertEqual(cache.get('a'), 'fresh')
+        # Once invalidations of more than maxsize keys were made, older
+        # tokens are turned away for every key
+        for key in ('c', 'd', 'e'):
+            cache.invalidate(key)
+        self.assertFalse(cache.set('b', 2, generation))
+        generation = cache.generation('a')
+        cache.clear()
+        self.assertFalse(cache.set('a', 'stale', generation))
+
+    def test_falsy_values_are_cached(self):
+        cache = TTLCache(maxsize=4, ttl=60)
+        cache.set('empty', [])
+        self.assertEqual(cache.get('empty', 'missing'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+import json
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+# Run the real data layer against a private in-memory SQLite database
+with patch.dict(os.environ, {'DB_BACKEND': 'sqlite', 'DB_PATH': ':memory:'}):
+    previous = sys.modules.pop('database', None)
+    import database
+    if previous is not None:
+        sys.modules['database'] = previous
+database.init_db()
+
+
+def clear_tables():
+    with database.db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM render_jobs")
+        cursor.execute("DELETE FROM upload_sessions")
+        cursor.execute("DELETE FROM storage_objects")
+        cursor.execute("DELETE FROM videos")
+        cursor.execute("DELETE FROM users WHERE email != %s", ('admin@sanpai.com',))
+        conn.commit()
+        cursor.close()
+    database.user_videos_cache.clear()
+    database.video_cache.clear()
+
+
+class TestSQLiteDatabase(unittest.TestCase):
+    def setUp(self):
+        clear_tables()
+        self.assertTrue(database.add_user('Test', 'test@example.com', 'hash'))
+        self.user = database.get_user_by_email('test@example.com')
+
+    def test_users_and_login_state(self):
+        self.assertEqual(self.user['name'], 'Test')
+        self.assertIsInstance(self.user['created_at'], datetime)
+        self.assertFalse(database.add_user('Dup', 'test@example.com', 'hash'))
+        self.assertTrue(database.increment_login_attempts('test@example.com'))
+        self.assertEqual(database.get_login_attempts('test@example.com'), 1)
+        database.reset_login_attempts('test@example.com')
+        self.assertEqual(database.get_login_attempts('test@example.com'), 0)
+        database.update_password_hash(self.user['id'], 'new-hash')
+        self.assertEqual(database.get_user_by_id(self.user['id'])['password_hash'], 'new-hash')
+
+    def test_video_list_is_invalidated_on_write(self):
+        database.add_video(self.user['id'], '/uploads/a.mp4', None, 'A', duration=3.0)
+        self.assertEqual([v['title'] for v in database.get_videos_by_user(self.user['id'])], ['A'])
+        database.add_video(self.user['id'], '/uploads/b.mp4', None, 'B', duration=4.0, formats='mp4,hls')
+        videos = database.get_videos_by_user(self.user['id'])
+        self.assertEqual(len(videos), 2)
+        self.assertEqual(sorted(v['formats'] for v in videos), ['mp4', 'mp4,hls'])
+        self.assertTrue(database.delete_video(videos[0]['id']))
+        self.assertEqual(len(database.get_videos_by_user(self.user['id'])), 1)
+        stats = database.get_admin_stats()
+        self.assertEqual(stats['total_reels'], 1)
+        self.assertEqual(stats['total_users'], 2)
+
+    def test_deleting_a_user_cascades_to_videos(self):
+        database.add_video(self.user['id'], '/uploads/a.mp4', None, 'A')
+        self.assertTrue(database.delete_user(self.user['id']))
+        self.assertEqual(database.get_videos_by_user(self.user['id']), [])
+        self.assertEqual(database.get_all_videos(), [])
+
+    def test_referenced_files_include_active_render_inputs(self):
+        database.add_video(self.user['id'], 'v.mp4', 'thumb_v.jpg', 'A', music_file='music_v.mp3')
+        database.enqueue_render_job('job1', self.user['id'], json.dumps({'photos': ['p1.jpg'], 'music_filename': None}))
+        names = {'v.mp4', 'thumb_v.jpg', 'music_v.mp3', 'p1.jpg', 'orphan.jpg'}
+        self.assertEqual(database.get_referenced_files(names), names - {'orphan.jpg'})
+        database.claim_render_job('worker-a')
+        self.assertEqual(database.get_referenced_files({'p1.jpg'}), {'p1.jpg'})
+        database.finish_render_job('job1', 'worker-a', False, 'Failed')
+        self.assertEqual(database.get_referenced_files({'p1.jpg'}), set())
+
+    def test_storage_object_refcounts(self):
+        self.assertTrue(database.acquire_storage_object('ab/cd/abcd.mp3', 10))
+        self.assertFalse(database.acquire_storage_object('ab/cd/abcd.mp3', 10))
+        database.add_video(self.user['id'], 'v.mp4', None, 'A', music_file='ab/cd/abcd.mp3')
+        database.release_storage_object('ab/cd/abcd.mp3')
+        self.assertEqual(database.get_referenced_files({'ab/cd/abcd.mp3'}), {'ab/cd/abcd.mp3'})
+        # Deleting the video drops the reference it held on its music
+        self.assertTrue(database.delete_video(database.get_videos_by_user(self.user['id'])[0]['id']))
+        self.assertEqual(database.get_referenced_files({'ab/cd/abcd.mp3'}), set())
+        # Swept objects start over at one reference
+        self.assertTrue(database.acquire_storage_object('ab/cd/abcd.mp3', 10))
+
+    def test_keyset_pages_cover_every_user_once(self):
+        for i in range(4):
+            database.add_user(f"User {i}", f"user{i}@example.com", 'hash')
+        seen, cursor_token = [], None
+        while True:
+            users, cursor_token = database.get_users_page(limit=2, cursor_token=cursor_token)
+            seen.extend(user['id'] for user in users)
+            if not cursor_token:
+                break
+        self.assertEqual(len(seen), 6)
+        self.assertEqual(len(set(seen)), 6)
+
+    def test_render_job_lifecycle(self):
+        self.assertTrue(database.enqueue_render_job('job1', self.user['id'], '{}'))
+        job = database.claim_render_job('worker-a')
+        self.assertEqual((job['id'], job['status'], job['attempts']), ('job1', 'running', 1))
+        self.assertIsNone(database.claim_render_job('worker-b'))
+        self.assertTrue(database.heartbeat_render_job('job1', 'worker-a'))
+        self.assertFalse(database.heartbeat_render_job('job1', 'worker-b'))
+
+        with database.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE render_jobs SET heartbeat_at = %s", (datetime.now() - timedelta(minutes=5),))
+            conn.commit()
+            cursor.close()
+        self.assertEqual(database.requeue_stale_render_jobs(60), 1)
+        self.assertFalse(database.heartbeat_render_job('job1', 'worker-a'))
+        self.assertFalse(database.finish_render_job('job1', 'worker-a', True, 'Done', '/uploads/late.mp4'))
+        self.assertEqual(database.claim_render_job('worker-b')['attempts'], 2)
+
+        self.assertTrue(database.finish_render_job('job1', 'worker-b', True, 'Done', '/uploads/a.mp4'))
+        # Only a running job can be finished
+        self.assertFalse(database.finish_render_job('job1', 'worker-b', False, 'Failed'))
+        job = database.get_render_job('job1')
+        self.assertEqual((job['status'], job['video_url']), ('done', '/uploads/a.mp4'))
+
+    def test_upload_session_lifecycle(self):
+        for session_id in ('s1', 's2', 's3'):
+            self.assertTrue(database.create_upload_session(session_id, self.user['id'], 'image', 'a.jpg', 10, 4))
+        self.assertEqual(database.get_upload_session('s1')['chunk_size'], 4)
+        # Unfinished sessions cannot be claimed, and a failed claim takes nothing
+        database.acquire_storage_object('aa/aa/a.jpg', 10)
+        self.assertTrue(database.complete_upload_session('s1', 'aa/aa/a.jpg'))
+        self.assertFalse(database.complete_upload_session('s1', 'aa/aa/other.jpg'))
+        self.assertIsNone(database.claim_upload_sessions(['s1', 's2'], self.user['id']))
+        self.assertIsNone(database.claim_upload_sessions(['s1'], self.user['id'] + 1))
+        self.assertEqual(database.claim_upload_sessions(['s1'], self.user['id']), {'s1': ('image', 'aa/aa/a.jpg')})
+        self.assertIsNone(database.claim_upload_sessions(['s1'], self.user['id']))
+        # The claimed reference is the caller's now, so it survives expiry
+        database.acquire_storage_object('aa/aa/b.jpg', 10)
+        database.complete_upload_session('s2', 'aa/aa/b.jpg')
+        with database.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE upload_sessions SET created_at = %s", (datetime.now() - timedelta(days=2),))
+            conn.commit()
+            cursor.close()
+        self.assertEqual(sorted(database.expire_upload_sessions(3600)), ['s2', 's3'])
+        self.assertEqual(database.get_referenced_files({'aa/aa/a.jpg'}), {'aa/aa/a.jpg'})
+        self.assertEqual(database.get_referenced_files({'aa/aa/b.jpg'}), set())
+        self.assertIsNone(database.get_upload_session('s2'))
+
+    def test_deleting_a_user_releases_their_finished_uploads(self):
+        database.acquire_storage_object('aa/aa/a.jpg', 10)
+        database.create_upload_session('s1', self.user['id'], 'image', 'a.jpg', 10, 4)
+        database.complete_upload_session('s1', 'aa/aa/a.jpg')
+        self.assertTrue(database.delete_user(self.user['id']))
+        self.assertIsNone(database.get_upload_session('s1'))
+        self.assertEqual(database.get_referenced_files({'aa/aa/a.jpg'}), set())
+
+
+if __name__ == '__main__':
+    unittest.main()
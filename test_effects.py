@@ -0,0 +1,60 @@
+import unittest
+import numpy as np
+from PIL import Image, ImageEnhance
+
+import effects
+
+
+class TestEffectChain(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.frame = rng.integers(0, 256, (72, 128, 3), dtype=np.uint8)
+
+    def apply_sequentially(self, effect_names):
+        frame = self.frame
+        for name in effect_names:
+            frame = effects.apply_effect_array(frame, name)
+        return frame
+
+    def test_fused_chain_matches_sequential_effects(self):
+        chains = [
+            ('sepia', 'invert'),
+            ('black_white', 'sepia', 'contrast'),
+            ('invert', 'sepia', 'solarize', 'colorize'),
+            ('contrast', 'vignette', 'invert'),
+            ('solarize', 'sharpen', 'grayscale'),
+        ]
+        for chain in chains:
+            fused = effects.apply_effects_array(self.frame, chain)
+            np.testing.assert_array_equal(fused, self.apply_sequentially(chain), err_msg=str(chain))
+
+    def test_colour_runs_compile_to_one_pass(self):
+        chain = effects.compile_effects(('invert', 'solarize', 'colorize', 'sepia', 'contrast'))
+        self.assertEqual(len(chain.steps), 1)
+        self.assertEqual(len(chain.steps[0]._resolve(self.frame)), 1)
+
+    def test_contrast_uses_the_mean_of_the_whole_frame(self):
+        # Bright odd rows and columns: a subsampled mean would miss them all
+        frame = np.full((72, 128, 3), 40, dtype=np.uint8)
+        frame[1::2, :] = 230
+        frame[:, 1::2] = 230
+        expected = np.asarray(ImageEnhance.Contrast(Image.fromarray(frame)).enhance(1.2))
+        np.testing.assert_array_equal(effects.apply_effects_array(frame, ('contrast',)), expected)
+
+    def test_unknown_effect_is_ignored(self):
+        result = effects.apply_effects_array(self.frame, ('no_such_effect',))
+        np.testing.assert_array_equal(result, self.frame)
+
+    def test_vignette_mask_cached_per_resolution(self):
+        effects.vignette_mask.cache_clear()
+        first = effects.vignette_mask(128, 72)
+        self.assertIs(effects.vignette_mask(128, 72), first)
+        self.assertIsNot(effects.vignette_mask(64, 36), first)
+        self.assertFalse(first.flags.writeable)
+        for size in range(effects.MASK_CACHE_SIZE * 2):
+            effects.vignette_mask(size + 1, size + 1)
+        self.assertLessEqual(effects.vignette_mask.cache_info().currsize, effects.MASK_CACHE_SIZE)
+
+
+if __name__ == '__main__':
+    unittest.main()
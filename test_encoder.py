@@ -0,0 +1,129 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+
+import encoder
+import render
+
+
+def hls_durations(mp4_path, segment_seconds=2):
+    """Segment lengths of the HLS rendition packaged from mp4_path"""
+    playlist = os.path.splitext(mp4_path)[0] + '.m3u8'
+    encoder.package_hls(mp4_path, playlist, segment_seconds)
+    with open(playlist) as f:
+        return [round(float(line[8:].strip().rstrip(',')), 3) for line in f if line.startswith('#EXTINF:')]
+
+
+class TestFFmpegEncoder(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.tmp.name, 'out.mp4')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def frames(self, count):
+        frame = np.zeros((36, 64, 3), dtype=np.uint8)
+        for i in range(count):
+            frame[...] = i * 10 % 256
+            yield frame
+
+    def test_settings_are_configurable_per_job(self):
+        enc = encoder.FFmpegEncoder(self.output, (64, 36), 24, settings={'preset': 'ultrafast', 'crf': 30, 'threads': 2})
+        cmd = enc.command()
+        self.assertEqual(cmd[cmd.index('-preset') + 1], 'ultrafast')
+        self.assertEqual(cmd[cmd.index('-crf') + 1], '30')
+        self.assertEqual(cmd[cmd.index('-threads') + 1], '2')
+        self.assertIn('-an', cmd)
+        self.assertEqual(encoder.DEFAULT_ENCODER_SETTINGS['crf'], 23)
+
+    def test_streams_frames_into_mp4(self):
+        written = encoder.encode_frames(self.frames(24), self.output, (64, 36), 24,
+                                        settings={'preset': 'ultrafast'})
+        self.assertEqual(written, 24)
+        self.assertAlmostEqual(encoder.probe_duration(self.output), 1.0, places=1)
+
+    def test_output_is_faststart(self):
+        encoder.encode_frames(self.frames(24), self.output, (64, 36), 24, settings={'preset': 'ultrafast'})
+        with open(self.output, 'rb') as f:
+            header = f.read(64)
+        # The moov index directly follows the ftyp box
+        ftyp_size = int.from_bytes(header[:4], 'big')
+        self.assertEqual(header[ftyp_size + 4:ftyp_size + 8], b'moov')
+
+    def test_hls_segments_follow_keyint(self):
+        cmd = encoder.FFmpegEncoder(self.output, (64, 36), 24, settings={'keyint': 48}).command()
+        self.assertEqual(cmd[cmd.index('-g') + 1], '48')
+        encoder.encode_frames(self.frames(24 * 5), self.output, (64, 36), 24,
+                              settings={'preset': 'ultrafast', 'keyint': 48})
+        playlist = os.path.join(self.tmp.name, 'out.m3u8')
+        written = encoder.package_hls(self.output, playlist, segment_seconds=2)
+        names = sorted(os.path.basename(path) for path in written)
+        self.assertEqual(names, ['out.m3u8', 'out_000.m4s', 'out_001.m4s', 'out_002.m4s', 'out_init.mp4'])
+        with open(playlist) as f:
+            text = f.read()
+        self.assertIn('#EXT-X-MAP:URI="out_init.mp4"', text)
+        self.assertIn('#EXT-X-ENDLIST', text)
+
+    def test_hls_segments_stay_on_the_grid_across_scene_cuts(self):
+        def cuts(count):
+            # A hard cut every 17 frames, which x264 makes a keyframe
+            # (ultrafast turns scene-cut detection off)
+            for i in range(count):
+                yield np.random.default_rng(i // 17).integers(0, 256, (36, 64, 3), dtype=np.uint8)
+        encoder.encode_frames(cuts(24 * 6), self.output, (64, 36), 24, settings={'preset': 'veryfast', 'keyint': 48})
+        self.assertEqual(hls_durations(self.output), [2.0, 2.0, 2.0])
+
+    def test_encoder_failure_raises(self):
+        with self.assertRaises(IOError):
+            encoder.encode_frames(self.frames(24), self.output, (64, 36), 24,
+                                  settings={'codec': 'no-such-codec'})
+
+    def test_probe_unreadable_file(self):
+        path = os.path.join(self.tmp.name, 'junk.mp3')
+        with open(path, 'wb') as f:
+            f.write(b'not audio')
+        self.assertIsNone(encoder.probe_duration(path))
+
+
+class TestParallelEncode(unittest.TestCase):
+    def test_segments_are_rendered_in_parallel_and_concatenated(self):
+        import imageio_ffmpeg
+        size = (64, 36)
+        segments = [
+            render.KenBurns(np.full((36, 64, 3), colour, dtype=np.uint8), 2, fps=12, size=size)
+            for colour in (20, 120, 220)
+        ]
+        timeline = render.Timeline(segments, [('crossfade', 'left'), ('wipe', 'left')],
+                                   transition_duration=0.5, fps=12, size=size)
+        ranges = timeline.segment_ranges()
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], timeline.n_frames)
+        self.assertEqual(len(ranges), 3)
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'reel.mp4')
+            written = encoder.encode_timeline(timeline, output, settings={'preset': 'ultrafast'}, workers=2)
+            self.assertEqual(written, timeline.n_frames)
+            frames, _ = imageio_ffmpeg.count_frames_and_secs(output)
+            self.assertEqual(frames, timeline.n_frames)
+            self.assertEqual(os.listdir(tmp), ['reel.mp4'])
+
+    def test_parallel_segments_keep_keyframes_on_the_hls_grid(self):
+        size = (64, 36)
+        segments = [
+            render.KenBurns(np.full((36, 64, 3), colour, dtype=np.uint8), 2, fps=12, size=size)
+            for colour in (20, 120, 220)
+        ]
+        timeline = render.Timeline(segments, [('crossfade', 'left'), ('wipe', 'left')],
+                                   transition_duration=0.5, fps=12, size=size)
+        # The last piece starts between two keyframes of a one-second grid
+        self.assertEqual([start for start, _ in timeline.segment_ranges()], [0, 24, 42])
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'reel.mp4')
+            encoder.encode_timeline(timeline, output, settings={'preset': 'veryfast', 'keyint': 12}, workers=2)
+            self.assertEqual(hls_durations(output, segment_seconds=1), [1.0] * 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import sys
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+# Mock database module
+sys.modules['database'] = MagicMock()
+
+import jobs
+
+
+class TestRenderJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.queue = jobs.RenderJobQueue(workers=1, max_jobs=3)
+
+    def tearDown(self):
+        self.queue.shutdown()
+
+    def wait(self, job_id):
+        self.queue.shutdown(wait=True)
+        return self.queue.get(job_id)
+
+    def test_successful_job_reports_result(self):
+        job_id = self.queue.submit(lambda name: {'success': True, 'message': 'ok', 'video_url': name}, 'a.mp4', owner=7)
+        job = self.wait(job_id)
+        self.assertEqual(job['status'], jobs.DONE)
+        self.assertEqual(job['video_url'], 'a.mp4')
+        self.assertEqual(job['owner'], 7)
+        self.assertIsNotNone(job['finished_at'])
+
+    def test_failed_and_crashed_jobs(self):
+        failed = self.queue.submit(lambda: {'success': False, 'message': 'bad photos'})
+        def crash():
+            raise RuntimeError('boom')
+        crashed = self.queue.submit(crash)
+        self.queue.shutdown(wait=True)
+        self.assertEqual(self.queue.get(failed)['status'], jobs.FAILED)
+        self.assertEqual(self.queue.get(failed)['message'], 'bad photos')
+        self.assertEqual(self.queue.get(crashed)['status'], jobs.FAILED)
+        self.assertIn('boom', self.queue.get(crashed)['message'])
+
+    def test_jobs_wait_for_a_free_worker(self):
+        release = threading.Event()
+        first = self.queue.submit(lambda: release.wait(5) and {'success': True, 'message': 'ok'})
+        second = self.queue.submit(lambda: {'success': True, 'message': 'ok'})
+        self.assertEqual(self.queue.get(second)['status'], jobs.QUEUED)
+        release.set()
+        self.assertEqual(self.wait(first)['status'], jobs.DONE)
+        self.assertEqual(self.queue.get(second)['status'], jobs.DONE)
+
+    def test_finished_jobs_are_evicted(self):
+        ids = []
+        for _ in range(5):
+            ids.append(self.queue.submit(lambda: {'success': True, 'message': 'ok'}))
+            deadline = time.time() + 5
+            while self.queue.get(ids[-1])['status'] != jobs.DONE and time.time() < deadline:
+                time.sleep(0.01)
+        self.assertIsNone(self.queue.get(ids[0]))
+        self.assertIsNone(self.queue.get(ids[1]))
+        self.assertEqual(self.queue.stats()[jobs.DONE], 3)
+
+
+class TestDatabaseJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.queue = jobs.DatabaseJobQueue()
+
+    def test_submit_stores_json_payload(self):
+        with patch.object(jobs, 'enqueue_render_job', return_value=True) as enqueue:
+            job_id = self.queue.submit({'photos': ['a.jpg'], 'music_filename': None}, owner=7)
+        enqueue.assert_called_once_with(job_id, 7, '{"photos": ["a.jpg"], "music_filename": null}')
+
+    def test_submit_raises_when_insert_fails(self):
+        with patch.object(jobs, 'enqueue_render_job', return_value=False):
+            with self.assertRaises(RuntimeError):
+                self.queue.submit({'photos': []}, owner=7)
+
+    def test_get_maps_rows_to_job_snapshots(self):
+        row = {'id': 'abc', 'user_id': 7, 'status': jobs.DONE, 'message': 'ok', 'video_url': '/uploads/v.mp4',
+               'created_at': 1, 'started_at': 2, 'finished_at': 3}
+        with patch.object(jobs, 'get_render_job', return_value=row):
+            job = self.queue.get('abc')
+        self.assertEqual(job['owner'], 7)
+        self.assertEqual(job['video_url'], '/uploads/v.mp4')
+        with patch.object(jobs, 'get_render_job', return_value=None):
+            self.assertIsNone(self.queue.get('missing'))
+
+if __name__ == '__main__':
+    unittest.main()
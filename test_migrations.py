@@ -0,0 +1,111 @@
+import unittest
+
+import migrations
+from db_backends import SQLiteBackend
+
+
+class FakeCursor:
+    """Answers the bookkeeping queries migrate() issues and records the rest"""
+
+    def __init__(self, db):
+        self.db = db
+        self.result = None
+
+    def execute(self, query, params=None):
+        query = ' '.join(query.split())
+        self.db.queries.append(query)
+        if query.startswith('SELECT COUNT(*) FROM information_schema.tables'):
+            self.result = [(1 if self.db.versions is not None else 0,)]
+        elif query.startswith('SELECT MAX(version)'):
+            self.result = [(max(self.db.versions, default=None),)]
+        elif query.startswith('CREATE TABLE IF NOT EXISTS schema_version'):
+            if self.db.versions is None:
+                self.db.versions = []
+        elif query.startswith('INSERT INTO schema_version'):
+            self.db.versions.append(params[0])
+        elif query.startswith('SELECT GET_LOCK') or query.startswith('SELECT RELEASE_LOCK'):
+            self.result = [(1,)]
+
+    def fetchone(self):
+        return self.result[0]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, versions=None):
+        self.versions = versions
+        self.queries = []
+        self.commits = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+
+def recorder(name, log):
+    return lambda cursor, dialect: log.append(name)
+
+
+class TestMigrations(unittest.TestCase):
+    def setUp(self):
+        self.log = []
+        self.migrations = [
+            (1, 'one', recorder('one', self.log)),
+            (2, 'two', recorder('two', self.log)),
+            (3, 'three', recorder('three', self.log)),
+        ]
+
+    def test_fresh_database_applies_everything_in_order(self):
+        conn = FakeConnection()
+        self.assertEqual(migrations.migrate(conn, migrations=self.migrations), [1, 2, 3])
+        self.assertEqual(self.log, ['one', 'two', 'three'])
+        self.assertEqual(conn.versions, [1, 2, 3])
+        self.assertEqual(conn.commits, 3)
+
+    def test_only_pending_migrations_run(self):
+        conn = FakeConnection(versions=[1, 2])
+        self.assertEqual(migrations.migrate(conn, migrations=self.migrations), [3])
+        self.assertEqual(self.log, ['three'])
+
+    def test_current_schema_issues_no_ddl(self):
+        conn = FakeConnection(versions=[1, 2, 3])
+        self.assertEqual(migrations.migrate(conn, migrations=self.migrations), [])
+        self.assertEqual(self.log, [])
+        self.assertEqual(len(conn.queries), 2)
+        self.assertTrue(all(query.startswith('SELECT') for query in conn.queries))
+
+    def test_versions_are_unique_and_increasing(self):
+        versions = [migration[0] for migration in migrations.MIGRATIONS]
+        self.assertEqual(versions, sorted(set(versions)))
+
+
+class TestSQLiteMigrations(unittest.TestCase):
+    def setUp(self):
+        self.backend = SQLiteBackend(':memory:')
+        self.conn = self.backend.connect()
+
+    def tearDown(self):
+        self.conn.close()
+        self.backend.close()
+
+    def test_full_schema_applies_once(self):
+        applied = migrations.migrate(self.conn, 'sqlite')
+        self.assertEqual(applied, [version for version, _, _ in migrations.MIGRATIONS])
+        self.assertEqual(migrations.migrate(self.conn, 'sqlite'), [])
+        cursor = self.conn.cursor()
+        dialect = migrations.SQLiteDialect
+        self.assertIn('idx_videos_user_created', dialect.index_names(cursor, 'videos'))
+        self.assertIn('idx_render_jobs_status', dialect.index_names(cursor, 'render_jobs'))
+        self.assertIn('thumbnail_url', dialect.column_names(cursor, 'videos'))
+        cursor.execute("SELECT is_admin, created_at FROM users WHERE email = %s", ('admin@sanpai.com',))
+        is_admin, created_at = cursor.fetchone()
+        self.assertTrue(is_admin)
+        self.assertIsNotNone(created_at.year)
+
+
+if __name__ == '__main__':
+    unittest.main()
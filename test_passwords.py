@@ -0,0 +1,58 @@
+import threading
+import unittest
+
+from werkzeug.security import generate_password_hash
+
+import passwords
+from passwords import PasswordHasher, HasherBusy, needs_rehash
+
+FAST = 'pbkdf2:sha256:1000'
+
+
+class TestPasswordHasher(unittest.TestCase):
+    def setUp(self):
+        self.hasher = PasswordHasher(workers=1, max_pending=1, method=FAST)
+
+    def tearDown(self):
+        self.hasher.shutdown()
+
+    def test_hash_and_verify(self):
+        hashed = self.hasher.hash('secret')
+        self.assertTrue(hashed.startswith(FAST + '$'))
+        self.assertTrue(self.hasher.verify(hashed, 'secret'))
+        self.assertFalse(self.hasher.verify(hashed, 'wrong'))
+
+    def test_needs_rehash_compares_parameters(self):
+        self.assertTrue(needs_rehash(generate_password_hash('x', 'pbkdf2:sha256:1000'), 'pbkdf2:sha256:600000'))
+        self.assertFalse(needs_rehash(generate_password_hash('x', FAST), FAST))
+
+    def test_rejects_when_queue_is_full(self):
+        release = threading.Event()
+        started = threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        running = self.hasher._submit(block)
+        started.wait(5)
+        waiting = self.hasher._submit(block)
+        with self.assertRaises(HasherBusy):
+            self.hasher.hash('secret')
+        self.assertFalse(self.hasher.rehash_later('secret', lambda new_hash: None))
+        self.assertEqual(self.hasher.stats()['rejected'], 2)
+        release.set()
+        running.result(5)
+        waiting.result(5)
+        self.assertTrue(self.hasher.verify(self.hasher.hash('secret'), 'secret'))
+
+    def test_rehash_later_saves_new_hash(self):
+        saved = []
+        done = threading.Event()
+        self.assertTrue(self.hasher.rehash_later('secret', lambda new_hash: (saved.append(new_hash), done.set())))
+        done.wait(5)
+        self.assertEqual(passwords.hash_method(saved[0]), FAST)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import threading
+import time
+import unittest
+
+from pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+        self.rollbacks = 0
+
+    def close(self):
+        self.closed = True
+
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.opened = []
+
+    def connect(self):
+        conn = FakeConnection()
+        self.opened.append(conn)
+        return conn
+
+    def test_connections_are_reused(self):
+        pool = ConnectionPool(self.connect, size=2)
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            self.assertIs(first, second)
+        self.assertEqual(len(self.opened), 1)
+        stats = pool.stats()
+        self.assertEqual(stats['checkouts'], 2)
+        self.assertEqual(stats['idle'], 1)
+        self.assertEqual(stats['in_use'], 0)
+
+    def test_each_thread_gets_its_own_connection(self):
+        pool = ConnectionPool(self.connect, size=3)
+        barrier = threading.Barrier(3)
+        seen = []
+
+        def borrow():
+            with pool.connection() as conn:
+                seen.append(conn)
+                barrier.wait(5)
+
+        threads = [threading.Thread(target=borrow) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len({id(conn) for conn in seen}), 3)
+        self.assertEqual(pool.stats()['peak_in_use'], 3)
+
+    def test_checkout_waits_then_times_out(self):
+        pool = ConnectionPool(self.connect, size=1, timeout=0.05)
+        pooled = pool.checkout()
+        with self.assertRaises(PoolTimeout):
+            pool.checkout()
+        threading.Timer(0.01, pool.checkin, args=(pooled,)).start()
+        pool.timeout = 5
+        with pool.connection() as conn:
+            self.assertIs(conn, pooled.conn)
+        stats = pool.stats()
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertEqual(stats['waits'], 2)
+
+    def test_dead_connections_are_replaced(self):
+        pool = ConnectionPool(self.connect, size=1, check=lambda conn: conn.alive, check_after=0)
+        with pool.connection() as conn:
+            conn.alive = False
+        with pool.connection() as replacement:
+            self.assertIsNot(replacement, conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.stats()['discarded'], 1)
+
+    def test_old_connections_are_recycled(self):
+        pool = ConnectionPool(self.connect, size=1, max_age=0.01)
+        with pool.connection() as conn:
+            pass
+        time.sleep(0.02)
+        with pool.connection() as replacement:
+            self.assertIsNot(replacement, conn)
+
+    def test_reset_runs_on_return_and_failures_discard(self):
+        def reset(conn):
+            if not conn.alive:
+                raise RuntimeError('lost connection')
+            conn.rollbacks += 1
+
+        pool = ConnectionPool(self.connect, size=1, reset=reset)
+        with pool.connection() as conn:
+            pass
+        self.assertEqual(conn.rollbacks, 1)
+        with pool.connection() as conn:
+            conn.alive = False
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.stats()['open'], 0)
+
+    def test_failed_connect_frees_the_slot(self):
+        def connect():
+            raise RuntimeError('refused')
+
+        pool = ConnectionPool(connect, size=1, timeout=0.05)
+        for _ in range(2):
+            with self.assertRaises(RuntimeError):
+                pool.checkout()
+        self.assertEqual(pool.stats()['open'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
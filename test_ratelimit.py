@@ -0,0 +1,45 @@
+import time
+import unittest
+
+from ratelimit import SlidingWindowLimiter
+
+
+class TestSlidingWindowLimiter(unittest.TestCase):
+    def test_blocks_after_limit_within_window(self):
+        limiter = SlidingWindowLimiter(limit=3, window=60)
+        self.assertEqual(limiter.hit('a@x.com'), 1)
+        limiter.hit('a@x.com')
+        self.assertFalse(limiter.blocked('a@x.com'))
+        self.assertEqual(limiter.hit('a@x.com'), 3)
+        self.assertTrue(limiter.blocked('a@x.com'))
+        self.assertFalse(limiter.blocked('b@x.com'))
+        self.assertGreater(limiter.retry_after('a@x.com'), 0)
+
+    def test_events_slide_out_of_the_window(self):
+        limiter = SlidingWindowLimiter(limit=2, window=0.05)
+        limiter.hit('a')
+        limiter.hit('a')
+        self.assertTrue(limiter.blocked('a'))
+        time.sleep(0.06)
+        self.assertFalse(limiter.blocked('a'))
+        self.assertEqual(limiter.count('a'), 0)
+        self.assertEqual(len(limiter), 0)
+
+    def test_reset_clears_a_key(self):
+        limiter = SlidingWindowLimiter(limit=1, window=60)
+        limiter.hit('a')
+        limiter.reset('a')
+        self.assertFalse(limiter.blocked('a'))
+
+    def test_memory_is_bounded(self):
+        limiter = SlidingWindowLimiter(limit=5, window=60, max_keys=100)
+        for i in range(1000):
+            for _ in range(10):
+                limiter.hit(f"user{i}@x.com")
+        self.assertEqual(len(limiter), 100)
+        self.assertEqual(limiter.count('user999@x.com'), 5)
+        self.assertEqual(limiter.count('user0@x.com'), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import numpy as np
+from PIL import Image
+
+import render
+
+
+class TestKenBurns(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.frame = rng.integers(0, 256, (72, 128, 3), dtype=np.uint8)
+
+    def test_first_frame_is_the_fitted_image(self):
+        kb = render.KenBurns(self.frame, 3, fps=24, size=(128, 72))
+        np.testing.assert_array_equal(kb.render(0), self.frame)
+
+    def test_frames_are_output_sized(self):
+        kb = render.KenBurns(self.frame, 1, fps=24, size=(160, 90))
+        out = np.empty((90, 160, 3), dtype=np.uint8)
+        for index in range(kb.n_frames):
+            self.assertIs(kb.render(index, out), out)
+        self.assertEqual(kb.make_frame(0.5).shape, (90, 160, 3))
+        self.assertEqual(kb.n_frames, 24)
+
+    def test_portrait_image_is_letterboxed(self):
+        portrait = np.full((72, 40, 3), 200, dtype=np.uint8)
+        frame = render.KenBurns(portrait, 3, size=(128, 72)).render(0)
+        self.assertTrue((frame[:, :40] == 0).all())
+        self.assertTrue((frame[:, 44:84] == 200).all())
+
+    def test_zoom_crops_towards_the_centre(self):
+        image = Image.new('RGB', (128, 72), (255, 0, 0))
+        image.paste((0, 255, 0), (0, 0, 8, 72))
+        kb = render.KenBurns(image, 3, fps=24, size=(128, 72), zoom_rate=0.1)
+        first, last = kb.render(0), kb.render(kb.n_frames - 1)
+        self.assertEqual(tuple(first[36, 2]), (0, 255, 0))
+        self.assertEqual(tuple(last[36, 2]), (255, 0, 0))
+
+
+class TestTimeline(unittest.TestCase):
+    def make_timeline(self, colours, transition, side='left'):
+        size = (64, 36)
+        segments = [
+            render.KenBurns(np.full((36, 64, 3), colour, dtype=np.uint8), 2, fps=10, size=size, zoom_rate=0)
+            for colour in colours
+        ]
+        transitions = [(transition, side)] * (len(segments) - 1)
+        return render.Timeline(segments, transitions, transition_duration=0.5, fps=10, size=size)
+
+    def test_duration_accounts_for_overlaps(self):
+        timeline = self.make_timeline([10, 20, 30], 'crossfade')
+        self.assertAlmostEqual(timeline.duration, 5.0)
+        self.assertEqual(timeline.n_frames, 50)
+
+    def test_segment_windows_render_like_the_whole_timeline(self):
+        size = (64, 36)
+        # Transitions end at 1.23 s and 1.96 s: frames 12 and 19 still show them
+        segments = [
+            render.KenBurns(np.full((36, 64, 3), colour, dtype=np.uint8), 1.23, fps=10, size=size, zoom_rate=0)
+            for colour in (10, 120, 230)
+        ]
+        timeline = render.Timeline(segments, [('crossfade', 'left')] * 2, transition_duration=0.5, fps=10, size=size)
+        self.assertEqual(timeline.segment_ranges(), [(0, 13), (13, 20), (20, timeline.n_frames)])
+        for i, (start, stop) in enumerate(timeline.segment_ranges()):
+            window, offset = timeline.window(i, i + 1)
+            for frame_number in range(start, stop):
+                np.testing.assert_array_equal(window.render_at(frame_number / 10 - offset).copy(),
+                                              timeline.render(frame_number).copy())
+
+    def test_at_most_two_segments_active(self):
+        timeline = self.make_timeline([10, 20, 30], 'crossfade')
+        self.assertEqual(timeline.active(0.2), (0, None))
+        self.assertEqual(timeline.active(1.75), (0, 0.5))
+        self.assertEqual(timeline.active(2.5), (1, None))
+        self.assertEqual(timeline.active(4.9), (2, None))
+
+    def test_crossfade_blends_both_segments(self):
+        timeline = self.make_timeline([0, 200], 'crossfade')
+        self.assertEqual(timeline.render_at(1.75)[0, 0, 0], 100)
+
+    def test_fade_comes_in_from_black(self):
+        timeline = self.make_timeline([0, 200], 'fade')
+        self.assertEqual(timeline.render_at(1.75)[0, 0, 0], 100)
+
+    def test_wipe_and_slides_split_the_frame(self):
+        for name, side, left, right in [
+            ('wipe', 'left', 200, 50),
+            ('slide_in', 'right', 50, 200),
+            ('slide_out', 'left', 50, 200),
+        ]:
+            frame = self.make_timeline([50, 200], name, side).render_at(1.75)
+            self.assertEqual(frame[0, 0, 0], left, name)
+            self.assertEqual(frame[0, -1, 0], right, name)
+
+    def test_output_buffer_is_reused(self):
+        timeline = self.make_timeline([10, 20], 'crossfade')
+        self.assertIs(timeline.render(0), timeline.render(7))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Runs in a fresh interpreter, where nothing has been imported yet
+PROBE = '''
+import json, sys
+import app, database
+opened = database.db.pool.stats()['open']
+app.startup()
+print(json.dumps({
+    'render_modules': [name for name in ('moviepy', 'numpy', 'render', 'encoder', 'effects') if name in sys.modules],
+    'opened_at_import': opened,
+    'admin': bool(database.get_user_by_email('admin@sanpai.com')),
+}))
+'''
+
+
+class TestStartup(unittest.TestCase):
+    def test_web_import_is_lazy_and_startup_migrates(self):
+        env = dict(os.environ, DB_BACKEND='sqlite', DB_PATH=':memory:')
+        output = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        self.assertEqual(result['render_modules'], [])
+        self.assertEqual(result['opened_at_import'], 0)
+        self.assertTrue(result['admin'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+import io
+import os
+import socket
+import sys
+import tempfile
+import unittest
+import urllib.request
+from unittest.mock import patch
+
+from storage import ContentStore, LocalStorage, S3Storage
+
+# moto's server runs on the real Flask, which other tests replace with a mock
+_mocked_flask = sys.modules.pop('flask', None)
+try:
+    import boto3
+    from moto.server import ThreadedMotoServer
+    flask_modules = {name: module for name, module in sys.modules.items() if name.split('.')[0] == 'flask'}
+except ImportError:
+    ThreadedMotoServer = None
+finally:
+    if _mocked_flask is not None:
+        sys.modules['flask'] = _mocked_flask
+
+
+class TestContentStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.refcounts = {}
+        self.store = ContentStore(LocalStorage(self.tmp.name), acquire=self.acquire, release=self.release)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def acquire(self, key, size):
+        self.refcounts[key] = self.refcounts.get(key, 0) + 1
+        return self.refcounts[key] == 1
+
+    def release(self, key):
+        self.refcounts[key] -= 1
+
+    def test_identical_uploads_are_stored_once(self):
+        first = self.store.put(io.BytesIO(b'photo bytes'), '.JPG')
+        second = self.store.put(io.BytesIO(b'photo bytes'), '.jpg')
+        other = self.store.put(io.BytesIO(b'other bytes'), '.jpg')
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertRegex(first, r'^[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        self.assertTrue(first.startswith(f"{first[6:8]}/{first[8:10]}/"))
+        self.assertEqual(self.refcounts[first], 2)
+        with open(self.store.path(first), 'rb') as f:
+            self.assertEqual(f.read(), b'photo bytes')
+        # Nothing is left behind in tmp/
+        self.assertEqual(os.listdir(os.path.join(self.tmp.name, 'tmp')), [])
+        self.store.release(first)
+        self.assertEqual(self.refcounts[first], 1)
+
+    def test_missing_file_is_rewritten_even_if_referenced(self):
+        key = self.store.put(io.BytesIO(b'data'), '.png')
+        os.remove(self.store.path(key))
+        self.store.put(io.BytesIO(b'data'), '.png')
+        self.assertTrue(os.path.exists(self.store.path(key)))
+
+    def test_put_fails_when_the_reference_is_not_recorded(self):
+        self.store._acquire = lambda key, size: None
+        with self.assertRaises(RuntimeError):
+            self.store.put(io.BytesIO(b'data'), '.png')
+        self.assertEqual(os.listdir(os.path.join(self.tmp.name, 'tmp')), [])
+
+    def test_put_drops_its_reference_when_saving_fails(self):
+        key = self.store.put(io.BytesIO(b'data'), '.png')
+        os.remove(self.store.path(key))
+        with patch.object(self.store.objects, 'save', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                self.store.put(io.BytesIO(b'data'), '.png')
+            with self.assertRaises(OSError):
+                self.store.put(io.BytesIO(b'new data'), '.png')
+        self.assertEqual(self.refcounts[key], 1)
+        self.assertEqual(set(self.refcounts.values()), {0, 1})
+        self.assertEqual(os.listdir(os.path.join(self.tmp.name, 'tmp')), [])
+
+    def test_output_keys_and_paths(self):
+        key = self.store.new_key('.jpg', prefix='thumb_')
+        self.assertRegex(key, r'^([0-9a-f]{2})/([0-9a-f]{2})/thumb_\1\2[0-9a-f]{28}\.jpg$')
+        self.assertTrue(os.path.isdir(os.path.dirname(self.store.scratch_path(key))))
+        self.assertEqual(self.store.path('old.mp4'), os.path.join(self.tmp.name, 'old.mp4'))
+        self.assertIsNone(self.store.path('../escape.mp4'))
+        self.assertIsNone(self.store.url(key))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@unittest.skipIf(ThreadedMotoServer is None, 'boto3 and moto are not installed')
+class TestS3Storage(unittest.TestCase):
+    """Against moto's S3 server, standing in for MinIO or AWS"""
+
+    @classmethod
+    def setUpClass(cls):
+        # Flask imports some of its modules while handling requests
+        cls.modules = patch.dict(sys.modules, flask_modules)
+        cls.modules.start()
+        cls.environ = patch.dict(os.environ, {'AWS_ACCESS_KEY_ID': 'testing', 'AWS_SECRET_ACCESS_KEY': 'testing'})
+        cls.environ.start()
+        port = free_port()
+        cls.server = ThreadedMotoServer(ip_address='127.0.0.1', port=port, verbose=False)
+        cls.server.start()
+        cls.endpoint = f'http://127.0.0.1:{port}'
+        boto3.client('s3', endpoint_url=cls.endpoint, region_name='us-east-1').create_bucket(Bucket='reels')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        cls.environ.stop()
+        cls.modules.stop()
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.objects = S3Storage(
+            'reels', prefix='uploads/', endpoint_url=self.endpoint, region='us-east-1',
+            scratch_dir=self.tmp.name, multipart_threshold=5 * 1024 * 1024, multipart_chunksize=5 * 1024 * 1024
+        )
+        self.refcounts = {}
+        self.store = ContentStore(self.objects, acquire=self.acquire)
+
+    def acquire(self, key, size):
+        self.refcounts[key] = self.refcounts.get(key, 0) + 1
+        return self.refcounts[key] == 1
+
+    def scratch_files(self):
+        return [name for _, _, files in os.walk(self.tmp.name) for name in files]
+
+    def test_put_uploads_once_and_fetch_downloads(self):
+        key = self.store.put(io.BytesIO(b'photo bytes'), '.jpg')
+        self.assertEqual(self.store.put(io.BytesIO(b'photo bytes'), '.jpg'), key)
+        self.assertTrue(self.objects.exists(key))
+        self.assertFalse(self.objects.exists('aa/aa/missing.jpg'))
+        head = self.objects.client.head_object(Bucket='reels', Key='uploads/' + key)
+        self.assertEqual(head['ContentType'], 'image/jpeg')
+        self.assertIn('immutable', head['CacheControl'])
+        with self.store.fetch(key) as path:
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), b'photo bytes')
+        # Neither the upload nor the download leaves a local copy
+        self.assertEqual(self.scratch_files(), [])
+        self.assertIsNone(self.store.path(key))
+
+    def test_large_files_use_multipart_upload(self):
+        data = os.urandom(12 * 1024 * 1024)
+        key = self.store.put(io.BytesIO(data), '.mp4')
+        head = self.objects.client.head_object(Bucket='reels', Key='uploads/' + key)
+        # Multipart ETags end in -<number of parts>
+        self.assertTrue(head['ETag'].strip('"').endswith('-3'))
+        with self.store.fetch(key) as path:
+            self.assertEqual(os.path.getsize(path), len(data))
+
+    def test_outputs_are_saved_from_scratch_and_served_by_presigned_url(self):
+        key = self.store.new_key('.mp4')
+        path = self.store.scratch_path(key)
+        with open(path, 'wb') as f:
+            f.write(b'render')
+        self.store.save(key, path)
+        self.assertFalse(os.path.exists(path))
+        url = self.store.url(key)
+        self.assertIn('X-Amz-Signature', url)
+        with urllib.request.urlopen(url) as response:
+            self.assertEqual(response.read(), b'render')
+
+
+if __name__ == '__main__':
+    unittest.main()
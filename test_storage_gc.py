@@ -0,0 +1,123 @@
+import os
+import tempfile
+import time
+import unittest
+
+from storage_gc import StorageSweeper, owner_name
+
+VIDEO = 'a' * 32
+
+
+class TestStorageSweeper(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+        self.in_use = {f'{VIDEO}.mp4', 'thumb_kept.jpg'}
+        self.lookups = []
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def referenced(self, names):
+        self.lookups.append(set(names))
+        return None if self.in_use is None else names & self.in_use
+
+    def make(self, name, size=10, age=7200):
+        path = os.path.join(self.dir, name)
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+        os.utime(path, (time.time() - age, time.time() - age))
+        return path
+
+    def remaining(self):
+        return sorted(os.listdir(self.dir))
+
+    def test_removes_old_unreferenced_files_and_counts_bytes(self):
+        self.make(f'{VIDEO}.mp4')
+        self.make(f'{VIDEO}_000.m4s')
+        self.make(f'{VIDEO}.m3u8')
+        self.make('thumb_kept.jpg')
+        self.make('orphan.mp4', size=100)
+        self.make('thumb_orphan.jpg', size=20)
+        self.make('uploading.jpg', age=10)
+        self.make('temp_audio_123.wav', size=5)
+        os.mkdir(os.path.join(self.dir, 'segments_abc'))
+        self.make(os.path.join('segments_abc', 'segment_0000.mp4'), size=7)
+        os.utime(os.path.join(self.dir, 'segments_abc'), (time.time() - 7200, time.time() - 7200))
+
+        sweeper = StorageSweeper(self.dir, self.referenced, grace_seconds=3600)
+        self.assertEqual(sweeper.sweep(), 132)
+        self.assertEqual(self.remaining(), sorted([
+            f'{VIDEO}.mp4', f'{VIDEO}_000.m4s', f'{VIDEO}.m3u8', 'thumb_kept.jpg', 'uploading.jpg'
+        ]))
+        self.assertEqual(sweeper.stats()['deleted'], 4)
+        # Temp files and young files never reach the database
+        self.assertNotIn('temp_audio_123.wav', set().union(*self.lookups))
+        self.assertNotIn('uploading.jpg', set().union(*self.lookups))
+
+    def test_keeps_files_when_references_are_unknown(self):
+        self.in_use = None
+        self.make('orphan.mp4')
+        self.make('temp_audio_1.wav')
+        StorageSweeper(self.dir, self.referenced).sweep()
+        self.assertEqual(self.remaining(), ['orphan.mp4'])
+
+    def test_walks_the_folder_in_batches(self):
+        for i in range(5):
+            self.make(f'orphan{i}.jpg')
+        sweeper = StorageSweeper(self.dir, self.referenced, batch_size=2)
+        self.assertFalse(sweeper.sweep_batch())
+        self.assertEqual(len(self.remaining()), 3)
+        self.assertFalse(sweeper.sweep_batch())
+        self.assertTrue(sweeper.sweep_batch())
+        self.assertEqual(self.remaining(), [])
+        self.assertTrue(all(len(names) <= 2 for names in self.lookups))
+        self.assertEqual(sweeper.stats()['passes'], 1)
+
+    def test_dry_run_deletes_nothing(self):
+        self.make('orphan.mp4', size=10)
+        sweeper = StorageSweeper(self.dir, self.referenced, dry_run=True)
+        self.assertEqual(sweeper.sweep(), 10)
+        self.assertEqual(self.remaining(), ['orphan.mp4'])
+
+    def test_walks_shard_directories_and_tmp(self):
+        os.makedirs(os.path.join(self.dir, 'aa', 'aa'))
+        os.makedirs(os.path.join(self.dir, 'tmp'))
+        os.makedirs(os.path.join(self.dir, 'other'))
+        self.in_use = {f'aa/aa/{VIDEO}.mp4'}
+        self.make(f'aa/aa/{VIDEO}.mp4')
+        self.make(f'aa/aa/{VIDEO}_001.m4s')
+        self.make('aa/aa/orphan.jpg')
+        self.make('tmp/upload123')
+        self.make('other/not-ours.txt')
+        StorageSweeper(self.dir, self.referenced).sweep()
+        self.assertEqual(sorted(os.listdir(os.path.join(self.dir, 'aa', 'aa'))), [f'{VIDEO}.mp4', f'{VIDEO}_001.m4s'])
+        self.assertEqual(os.listdir(os.path.join(self.dir, 'tmp')), [])
+        self.assertEqual(os.listdir(os.path.join(self.dir, 'other')), ['not-ours.txt'])
+
+    def test_objects_stored_again_during_a_sweep_are_kept(self):
+        os.makedirs(os.path.join(self.dir, 'ab', 'cd'))
+        path = self.make(os.path.join('ab', 'cd', 'abcd.jpg'))
+
+        def referenced(names):
+            # ContentStore.put() takes the first reference again and rewrites
+            # the file after the sweeper listed it as unreferenced
+            with open(path + '.new', 'wb') as f:
+                f.write(b'x' * 10)
+            os.replace(path + '.new', path)
+            return set()
+
+        sweeper = StorageSweeper(self.dir, referenced)
+        sweeper.sweep()
+        self.assertEqual(os.listdir(os.path.join(self.dir, 'ab', 'cd')), ['abcd.jpg'])
+        self.assertEqual(sweeper.stats()['deleted'], 0)
+
+    def test_hls_pieces_belong_to_their_mp4(self):
+        self.assertEqual(owner_name(f'{VIDEO}_init.mp4'), f'{VIDEO}.mp4')
+        self.assertEqual(owner_name(f'{VIDEO}.m3u8'), f'{VIDEO}.mp4')
+        self.assertEqual(owner_name(f'thumb_{VIDEO}.jpg'), f'thumb_{VIDEO}.jpg')
+        self.assertEqual(owner_name(f'aa/aa/{VIDEO}_000.m4s'), f'aa/aa/{VIDEO}.mp4')
+
+
+if __name__ == '__main__':
+    unittest.main()
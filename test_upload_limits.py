@@ -0,0 +1,45 @@
+import io
+import unittest
+
+from PIL import Image
+
+from upload_limits import NeedMoreData, sniff
+
+
+def image_bytes(size, fmt, **params):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 100, 50)).save(buffer, fmt, **params)
+    return buffer.getvalue()
+
+
+class TestSniff(unittest.TestCase):
+    def test_jpeg_size_is_read_past_exif_and_icc_segments(self):
+        exif = Image.Exif()
+        exif[0x010F] = 'x' * 20000  # Make, padded out to a large APP1 segment
+        data = image_bytes((640, 480), 'JPEG', exif=exif.tobytes(), icc_profile=b'\0' * 30000, progressive=True)
+        self.assertEqual(sniff(data), ('jpeg', 640, 480))
+
+    def test_png_size(self):
+        self.assertEqual(sniff(image_bytes((33, 77), 'PNG')), ('png', 33, 77))
+
+    def test_audio(self):
+        self.assertEqual(sniff(b'RIFF\x24\x08\x00\x00WAVEfmt '), ('wav', None, None))
+        self.assertEqual(sniff(b'ID3\x04\x00\x00\x00\x00\x00\x00rest'), ('mp3', None, None))
+        self.assertEqual(sniff(b'\xff\xfb\x90\x64' + b'\0' * 12), ('mp3', None, None))
+
+    def test_truncated_headers_need_more_data(self):
+        data = image_bytes((640, 480), 'JPEG')
+        for size in (0, 2, 3, 10, 20):
+            with self.assertRaises(NeedMoreData):
+                sniff(data[:size])
+        with self.assertRaises(NeedMoreData):
+            sniff(image_bytes((1, 1), 'PNG')[:20])
+
+    def test_other_files_are_rejected(self):
+        for data in (b'GIF89a' + b'\0' * 20, b'<html><body>hi</body></html>', b'\xff\xd8\xff\xd9\0\0\0\0'):
+            with self.assertRaises(ValueError):
+                sniff(data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import io
+import os
+import tempfile
+import time
+import unittest
+
+from upload_sessions import ChunkedUploads, IncompleteChunk, chunk_count, chunk_length
+
+
+class TestChunkedUploads(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.expired = []
+        self.uploads = ChunkedUploads(self.tmp.name, expire_sessions=self.expire_sessions)
+
+    def expire_sessions(self, max_age):
+        return list(self.expired)
+
+    def test_chunk_arithmetic(self):
+        self.assertEqual(chunk_count(10, 4), 3)
+        self.assertEqual(chunk_count(8, 4), 2)
+        self.assertEqual([chunk_length(10, 4, i) for i in range(3)], [4, 4, 2])
+
+    def test_chunks_in_any_order_read_back_as_one_file(self):
+        self.uploads.create('s1')
+        data = b'0123456789'
+        for index in (2, 0, 1, 0):
+            start = index * 4
+            self.uploads.write_chunk('s1', index, io.BytesIO(data[start:start + 4]), chunk_length(10, 4, index))
+        self.assertEqual(self.uploads.received('s1'), [0, 1, 2])
+        with self.uploads.open('s1', 3) as reader:
+            self.assertEqual(reader.read(3), b'012')
+            self.assertEqual(reader.read(), b'3456789')
+        self.uploads.remove('s1')
+        self.assertEqual(self.uploads.received('s1'), [])
+
+    def test_short_chunks_are_not_kept(self):
+        self.uploads.create('s1')
+        with self.assertRaises(IncompleteChunk):
+            self.uploads.write_chunk('s1', 0, io.BytesIO(b'abc'), 4)
+        self.assertEqual(os.listdir(os.path.join(self.tmp.name, 's1')), [])
+
+    def test_expire_removes_expired_and_stale_sessions(self):
+        for session_id in ('expired', 'stale', 'active'):
+            self.uploads.create(session_id)
+        old = time.time() - 7200
+        os.utime(os.path.join(self.tmp.name, 'stale'), (old, old))
+        self.expired = ['expired']
+        self.assertEqual(self.uploads.expire(3600), 2)
+        self.assertEqual(os.listdir(self.tmp.name), ['active'])
+
+
+if __name__ == '__main__':
+    unittest.main()
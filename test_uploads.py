@@ -0,0 +1,397 @@
+import hashlib
+import io
+import os
+import struct
+import sys
+import tempfile
+import unittest
+import uuid
+import zlib
+from contextlib import nullcontext
+from unittest.mock import MagicMock, patch
+
+from PIL import Image
+
+from storage import ContentStore, LocalStorage, S3Storage
+from upload_sessions import ChunkedUploads
+
+
+MODULES = ('flask', 'database', 'upload_limits', 'app')
+
+
+def import_app():
+    """The real app on in-memory SQLite, whatever other tests have mocked"""
+    saved = {name: sys.modules.pop(name) for name in MODULES if name in sys.modules}
+    try:
+        with patch.dict(os.environ, {'DB_BACKEND': 'sqlite', 'DB_PATH': ':memory:'}):
+            import app
+        return app, {name: sys.modules[name] for name in MODULES}
+    finally:
+        sys.modules.update(saved)
+
+
+app, real_modules = import_app()
+
+
+class TestDownloadFile(unittest.TestCase):
+    def setUp(self):
+        # Flask imports some of its modules on first use
+        modules = patch.dict(sys.modules, real_modules)
+        modules.start()
+        self.addCleanup(modules.stop)
+        # A private upload folder, so no files or shard directories are left
+        # in the repository's
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        for patcher in (patch.dict(app.app.config, {'UPLOAD_FOLDER': tmp.name}),
+                        patch.object(app, 'content_store', ContentStore(LocalStorage(tmp.name)))):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.filename = f"{uuid.uuid4().hex}.mp4"
+        self.path = os.path.join(tmp.name, self.filename)
+        with open(self.path, 'wb') as f:
+            f.write(bytes(range(256)) * 4)
+        self.client = app.app.test_client()
+        with self.client.session_transaction() as session:
+            session['user_id'] = 1
+
+    def get(self, headers=None, filename=None):
+        return self.client.get(f"/uploads/{filename or self.filename}", headers=headers or {})
+
+    def test_full_response_has_validators_and_immutable_caching(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1024)
+        self.assertFalse(response.headers['ETag'].startswith('W/'))
+        self.assertIn('Last-Modified', response.headers)
+        self.assertEqual(response.headers['Accept-Ranges'], 'bytes')
+        self.assertEqual(response.headers['Cache-Control'], f'private, max-age={app.UPLOAD_MAX_AGE}, immutable')
+
+    def test_range_and_conditional_requests(self):
+        response = self.get({'Range': 'bytes=256-511'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.headers['Content-Range'], 'bytes 256-511/1024')
+        self.assertEqual(response.data, bytes(range(256)))
+        etag = self.get().headers['ETag']
+        self.assertEqual(self.get({'If-None-Match': etag}).status_code, 304)
+
+    def test_sharded_keys_are_served(self):
+        key = app.content_store.new_key('.jpg', prefix='thumb_')
+        path = app.content_store.scratch_path(key)
+        with open(path, 'wb') as f:
+            f.write(b'jpeg')
+        response = self.get(filename=key)
+        self.assertEqual(response.data, b'jpeg')
+        self.assertIn('immutable', response.headers['Cache-Control'])
+
+    def test_missing_and_escaping_paths_are_404(self):
+        self.assertEqual(self.get(filename='nope.mp4').status_code, 404)
+        self.assertEqual(self.get(filename='..%2Fapp.py').status_code, 404)
+
+    def test_objects_elsewhere_redirect_to_their_url(self):
+        url = 'https://bucket.example/aa/bb/video.mp4?X-Amz-Signature=abc'
+        with patch.object(app.content_store, 'url', return_value=url) as presign, \
+                patch.object(app.content_store, 'exists', return_value=True):
+            response = self.get(filename='aa/bb/video.mp4')
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(response.headers['Location'], url)
+            self.assertEqual(response.headers['Cache-Control'], 'private, no-store')
+            # Files in the upload folder are still served directly
+            self.assertEqual(self.get().status_code, 200)
+            presign.assert_called_once_with('aa/bb/video.mp4')
+
+    def test_accel_redirect_hands_off_to_nginx(self):
+        with patch.object(app, 'UPLOADS_SENDFILE', 'x-accel-redirect'):
+            response = self.get()
+            self.assertEqual(response.headers['X-Accel-Redirect'], f"/protected-uploads/{self.filename}")
+            self.assertEqual(response.data, b'')
+            self.assertEqual(response.mimetype, 'video/mp4')
+            not_modified = self.get({'If-None-Match': response.headers['ETag']})
+            self.assertEqual(not_modified.status_code, 304)
+            self.assertNotIn('X-Accel-Redirect', not_modified.headers)
+
+    def test_x_sendfile_uses_the_absolute_path(self):
+        with patch.object(app, 'UPLOADS_SENDFILE', 'x-sendfile'):
+            self.assertEqual(self.get().headers['X-Sendfile'], self.path)
+
+
+def png(size=(8, 8)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def png_header(width, height):
+    """Just the signature and IHDR chunk of a PNG claiming width x height"""
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' + ihdr + struct.pack('>I', zlib.crc32(b'IHDR' + ihdr))
+
+
+class TestUploadLimits(unittest.TestCase):
+    def setUp(self):
+        modules = patch.dict(sys.modules, real_modules)
+        modules.start()
+        self.addCleanup(modules.stop)
+        self.put = patch.object(app.content_store, 'put', side_effect=lambda stream, ext: f'aa/bb/{uuid.uuid4().hex}{ext}')
+        self.put.start()
+        self.addCleanup(self.put.stop)
+        submit = patch.object(app.render_queue, 'submit', return_value='job1')
+        self.submit = submit.start()
+        self.addCleanup(submit.stop)
+        self.client = app.app.test_client()
+        with self.client.session_transaction() as session:
+            session['user_id'] = 1
+            session['is_paid'] = True
+
+    def post(self, photos, music=None):
+        data = {'photos': [(io.BytesIO(content), name) for name, content in photos]}
+        data['custom_music'] = (io.BytesIO(music[1]), music[0]) if music else (io.BytesIO(b''), '')
+        return self.client.post('/generate_video', data=data, content_type='multipart/form-data')
+
+    def test_files_are_stored_under_their_sniffed_type(self):
+        photos = [(f'photo{i}.jpg', png((8 + i, 8))) for i in range(5)]
+        response = self.post(photos, ('song.mp3', b'RIFF\x24\x08\x00\x00WAVEfmt ' + b'\0' * 100))
+        self.assertEqual(response.status_code, 202)
+        photo_keys, music_key = self.submit.call_args.args[2:4]
+        self.assertEqual([key[-4:] for key in photo_keys], ['.png'] * 5)
+        self.assertTrue(music_key.endswith('.wav'))
+
+    def test_blank_music_input_is_ignored(self):
+        response = self.post([(f'photo{i}.png', png()) for i in range(5)])
+        self.assertEqual(response.status_code, 202)
+        self.assertIsNone(self.submit.call_args.args[3])
+
+    def test_references_are_dropped_when_the_job_cannot_be_queued(self):
+        self.submit.side_effect = RuntimeError('Could not queue render job')
+        with patch.object(app.content_store, 'release') as release:
+            response = self.post([(f'photo{i}.png', png((8 + i, 8))) for i in range(5)],
+                                 ('song.wav', b'RIFF\x24\x08\x00\x00WAVEfmt ' + b'\0' * 100))
+        self.assertFalse(response.json['success'])
+        photo_keys, music_key = self.submit.call_args.args[2:4]
+        self.assertEqual([call.args[0] for call in release.call_args_list], photo_keys + [music_key])
+
+    def test_files_that_are_not_images_or_audio_are_rejected(self):
+        response = self.post([('photo.jpg', b'<?php system($_GET["c"]); ?>' * 10)] * 5)
+        self.assertEqual(response.status_code, 415)
+        self.assertIn('photo.jpg', response.json['message'])
+        self.assertFalse(response.json['success'])
+        app.content_store.put.assert_not_called()
+
+    def test_too_many_photos_are_rejected(self):
+        response = self.post([(f'photo{i}.png', png()) for i in range(11)])
+        self.assertEqual(response.status_code, 413)
+        self.assertIn('at most 10 photos', response.json['message'])
+        app.content_store.put.assert_not_called()
+
+    def test_oversized_and_huge_photos_are_rejected(self):
+        with patch.dict(app.app.config, {'MAX_PHOTO_BYTES': 1024}):
+            response = self.post([('big.png', png_header(8, 8) + b'\0' * 2048)] * 5)
+            self.assertEqual(response.status_code, 413)
+            self.assertIn('big.png is larger than', response.json['message'])
+        # 40000 x 40000 pixels declared in a header of a few bytes
+        response = self.post([('bomb.png', png_header(40000, 40000))] * 5)
+        self.assertEqual(response.status_code, 413)
+        self.assertIn('megapixels', response.json['message'])
+
+    def test_request_size_is_limited_before_parsing(self):
+        with patch.dict(app.app.config, {'MAX_CONTENT_LENGTH': 1000}):
+            response = self.post([(f'photo{i}.png', png()) for i in range(5)])
+        self.assertEqual(response.status_code, 413)
+        app.content_store.put.assert_not_called()
+
+
+class TestUploadSessions(unittest.TestCase):
+    def setUp(self):
+        modules = patch.dict(sys.modules, real_modules)
+        modules.start()
+        self.addCleanup(modules.stop)
+        self.db = real_modules['database']
+        self.db.init_db()
+        email = f"{uuid.uuid4().hex}@example.com"
+        self.db.add_user('Uploader', email, 'hash', is_paid=True)
+        self.user_id = self.db.get_user_by_email(email)['id']
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        store = ContentStore(LocalStorage(os.path.join(tmp.name, 'store')),
+                             acquire=self.db.acquire_storage_object, release=self.db.release_storage_object)
+        chunks = ChunkedUploads(os.path.join(tmp.name, 'sessions'), expire_sessions=self.db.expire_upload_sessions)
+        for name, value in (('content_store', store), ('chunked_uploads', chunks), ('UPLOAD_CHUNK_BYTES', 1000)):
+            patcher = patch.object(app, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        submit = patch.object(app.render_queue, 'submit', return_value='job1')
+        self.submit = submit.start()
+        self.addCleanup(submit.stop)
+        self.client = app.app.test_client()
+        with self.client.session_transaction() as session:
+            session['user_id'] = self.user_id
+            session['is_paid'] = True
+
+    def start(self, data, kind='photo', sha256=True):
+        body = {'kind': kind, 'filename': f'file.{kind}', 'size': len(data)}
+        if sha256:
+            body['sha256'] = hashlib.sha256(data).hexdigest()
+        return self.client.post('/upload_sessions', json=body)
+
+    def put_chunk(self, upload_id, index, data):
+        return self.client.put(f'/upload_sessions/{upload_id}/chunks/{index}', data=data[index * 1000:(index + 1) * 1000])
+
+    def upload(self, data, kind='photo'):
+        upload = self.start(data, kind).json
+        for index in reversed(range(upload['chunk_count'])):
+            self.assertEqual(self.put_chunk(upload['upload_id'], index, data).status_code, 200)
+        response = self.client.post(f"/upload_sessions/{upload['upload_id']}/complete")
+        self.assertEqual(response.status_code, 200, response.json)
+        self.assertTrue(response.json['complete'])
+        return upload['upload_id']
+
+    def test_render_uses_completed_uploads(self):
+        photos = [png((60 + i, 40)) for i in range(5)]
+        upload_ids = [self.upload(data) for data in photos]
+        music_id = self.upload(b'RIFF\x24\x08\x00\x00WAVEfmt ' + b'\0' * 2500, kind='music')
+        response = self.client.post('/generate_video', data={'upload_ids': upload_ids, 'music_upload_id': music_id})
+        self.assertEqual(response.status_code, 202, response.json)
+        photo_keys, music_key = self.submit.call_args.args[2:4]
+        self.assertEqual([os.path.basename(key) for key in photo_keys],
+                         [hashlib.sha256(data).hexdigest() + '.png' for data in photos])
+        self.assertTrue(music_key.endswith('.wav'))
+        with open(app.content_store.path(photo_keys[0]), 'rb') as f:
+            self.assertEqual(f.read(), photos[0])
+        # Each upload is used once
+        response = self.client.post('/generate_video', data={'upload_ids': upload_ids})
+        self.assertEqual(response.status_code, 409)
+
+    def test_status_lists_chunks_to_resume_from(self):
+        data = png_header(300, 300) + os.urandom(5000)
+        upload = self.start(data).json
+        self.assertGreater(upload['chunk_count'], 2)
+        self.put_chunk(upload['upload_id'], 0, data)
+        self.put_chunk(upload['upload_id'], 2, data)
+        self.assertEqual(self.client.get(f"/upload_sessions/{upload['upload_id']}").json['received'], [0, 2])
+        response = self.client.post(f"/upload_sessions/{upload['upload_id']}/complete")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json['received'], [0, 2])
+
+    def test_checksum_mismatch_discards_the_chunks(self):
+        data = png_header(100, 100) + os.urandom(3000)
+        upload = self.start(data).json
+        damaged = data[:-1] + b'\0'
+        for index in range(upload['chunk_count']):
+            self.put_chunk(upload['upload_id'], index, damaged)
+        response = self.client.post(f"/upload_sessions/{upload['upload_id']}/complete")
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.json['received'], [])
+
+    def test_uploads_are_checked_early(self):
+        self.assertEqual(self.start(b'x' * (app.app.config['MAX_PHOTO_BYTES'] + 1)).status_code, 413)
+        data = b'<html>not a photo</html>'
+        upload = self.start(data).json
+        response = self.put_chunk(upload['upload_id'], 0, data)
+        self.assertEqual(response.status_code, 415)
+        # Chunks must have their exact length
+        upload = self.start(png_header(300, 300) + os.urandom(5000)).json
+        self.assertEqual(self.put_chunk(upload['upload_id'], 0, b'short').status_code, 400)
+
+    def test_sessions_are_private(self):
+        upload = self.start(png(), sha256=False).json
+        with self.client.session_transaction() as session:
+            session['user_id'] = self.user_id + 1000
+        self.assertEqual(self.client.get(f"/upload_sessions/{upload['upload_id']}").status_code, 404)
+        self.assertEqual(self.put_chunk(upload['upload_id'], 0, png()).status_code, 404)
+
+
+
+class TestRenderReel(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Loaded for the thumbnail step, outside the sys.modules patch below
+        import moviepy.video.io.VideoFileClip  # noqa: F401
+
+    def setUp(self):
+        modules = patch.dict(sys.modules, real_modules)
+        modules.start()
+        self.addCleanup(modules.stop)
+        self.store = MagicMock()
+        self.store.fetch.side_effect = lambda key: nullcontext(f'/tmp/{key}')
+        store = patch.object(app, 'content_store', self.store)
+        store.start()
+        self.addCleanup(store.stop)
+
+    def released(self):
+        return [call.args[0] for call in self.store.release.call_args_list]
+
+    def test_references_are_dropped_when_storing_outputs_fails(self):
+        with patch.object(app, '_render_outputs', side_effect=OSError('upload_file failed')):
+            with self.assertRaises(OSError):
+                app.render_reel(1, ['p1.jpg', 'p2.jpg'], 'song.mp3')
+        self.assertEqual(self.released(), ['song.mp3', 'p1.jpg', 'p2.jpg'])
+
+    def test_music_is_dropped_when_the_video_row_is_not_written(self):
+        with patch.object(app.video_processor, 'create_video', return_value=(True, 'ok', {})), \
+                patch.object(app, 'add_video', return_value=False):
+            result = app.render_reel(1, ['p1.jpg'], 'song.mp3')
+        self.assertFalse(result['success'])
+        self.assertEqual(self.released(), ['song.mp3', 'p1.jpg'])
+
+    def test_a_job_handed_to_another_worker_leaves_its_references_alone(self):
+        with patch.object(app.video_processor, 'create_video', return_value=(True, 'ok', {})), \
+                patch.object(app, 'add_video') as add_video:
+            result = app.render_reel(1, ['p1.jpg'], 'song.mp3', owned=lambda: False)
+        self.assertFalse(result['success'])
+        add_video.assert_not_called()
+        self.assertEqual(self.released(), [])
+
+    def test_music_stays_with_the_video(self):
+        with patch.object(app.video_processor, 'create_video', return_value=(True, 'ok', {})), \
+                patch.object(app, 'add_video', return_value=True):
+            result = app.render_reel(1, ['p1.jpg'], 'song.mp3')
+        self.assertTrue(result['success'])
+        self.assertEqual(self.released(), ['p1.jpg'])
+
+
+class TestRenderScratch(unittest.TestCase):
+    """Renders for S3 are written to a scratch folder before they are uploaded"""
+
+    def setUp(self):
+        modules = patch.dict(sys.modules, real_modules)
+        modules.start()
+        self.addCleanup(modules.stop)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        # Nothing reaches the bucket when the render fails
+        self.objects = S3Storage('reels', scratch_dir=self.tmp.name, client=MagicMock())
+        store = patch.object(app, 'content_store', ContentStore(self.objects))
+        store.start()
+        self.addCleanup(store.stop)
+
+    def scratch_files(self):
+        return [name for _, _, files in os.walk(self.tmp.name) for name in files]
+
+    def partial_render(self, saved_files, music_path, video_path, **kwargs):
+        with open(video_path, 'wb') as f:
+            f.write(b'partial mp4')
+        with open(os.path.splitext(video_path)[0] + '_000.m4s', 'wb') as f:
+            f.write(b'partial segment')
+
+    def test_a_failed_render_leaves_no_scratch_files(self):
+        def create_video(*args, **kwargs):
+            self.partial_render(*args, **kwargs)
+            return False, 'Error creating video: ffmpeg failed', {}
+        with patch.object(app.video_processor, 'create_video', side_effect=create_video):
+            result = app._render_outputs(1, ['/tmp/p1.jpg'], None, None)
+        self.assertFalse(result['success'])
+        self.assertEqual(self.scratch_files(), [])
+        self.objects.client.upload_file.assert_not_called()
+
+    def test_a_crashed_render_leaves_no_scratch_files(self):
+        def create_video(*args, **kwargs):
+            self.partial_render(*args, **kwargs)
+            raise MemoryError()
+        with patch.object(app.video_processor, 'create_video', side_effect=create_video):
+            with self.assertRaises(MemoryError):
+                app._render_outputs(1, ['/tmp/p1.jpg'], None, None)
+        self.assertEqual(self.scratch_files(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
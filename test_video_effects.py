@@ -60,5 +60,67 @@ class TestVideoProcessorEffects(unittest.TestCase):
         for r, g, b in pixels[:10]: # Check first 10 pixels
              self.assertTrue(abs(r - g) < 2 and abs(g - b) < 2, f"Pixel {(r,g,b)} is not grayscale")
 
+    def test_black_white_matches_pil(self):
+        processed = self.vp.apply_effect(self.img, 'black_white')
+        expected = self.img.convert('L').convert('RGB')
+        diff = np.abs(np.asarray(processed, dtype=int) - np.asarray(expected, dtype=int))
+        self.assertLessEqual(diff.max(), 1)
+
+    def test_sepia_matches_reference(self):
+        processed = np.asarray(self.vp.apply_effect(self.img, 'sepia'), dtype=int)
+        r, g, b = np.asarray(self.img, dtype=float).transpose(2, 0, 1)
+        expected = np.stack([
+            np.minimum((0.393 * r + 0.769 * g + 0.189 * b).astype(int), 255),
+            np.minimum((0.349 * r + 0.686 * g + 0.168 * b).astype(int), 255),
+            np.minimum((0.272 * r + 0.534 * g + 0.131 * b).astype(int), 255),
+        ], axis=2)
+        self.assertLessEqual(np.abs(processed - expected).max(), 1)
+
+    def test_effects_keep_size_and_mode(self):
+        for effect in self.vp.effects:
+            processed = self.vp.apply_effect(self.img, effect)
+            self.assertEqual(processed.size, self.img.size, effect)
+            self.assertEqual(processed.mode, 'RGB', effect)
+
+class TestImagePreprocessing(unittest.TestCase):
+    def setUp(self):
+        import tempfile
+        self.vp = VideoProcessor('uploads')
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def save_jpeg(self, name, size, orientation=None):
+        path = os.path.join(self.tmp.name, name)
+        img = Image.new('RGB', size, color='red')
+        exif = img.getexif()
+        if orientation:
+            exif[0x0112] = orientation
+        img.save(path, exif=exif)
+        return path
+
+    def test_large_jpeg_fits_target(self):
+        path = self.save_jpeg('large.jpg', (4000, 3000))
+        img = self.vp.load_image(path, (1280, 720))
+        self.assertEqual(img.size, (960, 720))
+        self.assertEqual(img.mode, 'RGB')
+
+    def test_exif_orientation_is_applied(self):
+        path = self.save_jpeg('rotated.jpg', (4000, 3000), orientation=6)
+        self.assertEqual(self.vp.load_image(path, (1280, 720)).size, (540, 720))
+
+    def test_prepare_images_keeps_order_and_skips_bad_files(self):
+        bad = os.path.join(self.tmp.name, 'bad.jpg')
+        with open(bad, 'wb') as f:
+            f.write(b'not an image')
+        paths = [self.save_jpeg('a.jpg', (400, 300)), bad, self.save_jpeg('b.jpg', (300, 400))]
+        images = self.vp.prepare_images(paths, (1280, 720), ['invert'])
+        self.assertEqual(images[0].size, (400, 300))
+        self.assertIsNone(images[1])
+        self.assertEqual(images[2].size, (300, 400))
+        r, g, b = images[0].getpixel((0, 0))
+        self.assertTrue(r < 5 and g > 250 and b > 250, 'invert effect should be applied')
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,187 @@
+import struct
+import tempfile
+
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+# Upload checks that run while a multipart body is being parsed, so a bad
+# request is cut off at the first offending bytes instead of after the whole
+# body has been spooled to disk:
+#   - every file is sniffed from its first bytes: JPEG/PNG (with their pixel
+#     size, read from the header without decoding) or MP3/WAV
+#   - each file is held to the byte limit of its kind, and no more than
+#     MAX_PHOTOS images and one audio file are accepted
+#   - the whole body is held to MAX_CONTENT_LENGTH by Werkzeug
+# Limits come from the app config (MAX_PHOTO_BYTES, MAX_MUSIC_BYTES,
+# MAX_PHOTO_PIXELS, MAX_PHOTOS), like Flask's own MAX_CONTENT_LENGTH.
+# identify() and check_pixels() also check chunked uploads (upload_sessions).
+
+# Recognised formats: kind and the extension files are stored with
+FORMATS = {
+    'jpeg': ('image', '.jpg'),
+    'png': ('image', '.png'),
+    'mp3': ('audio', '.mp3'),
+    'wav': ('audio', '.wav'),
+}
+# Give up on a header that is still incomplete after this many bytes
+SNIFF_LIMIT = 256 * 1024
+# Same threshold as Werkzeug's default stream factory
+SPOOL_SIZE = 500 * 1024
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# JPEG start-of-frame markers, which carry the image size
+JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# JPEG markers without a length field
+JPEG_STANDALONE = {0x01, 0xD8} | set(range(0xD0, 0xD8))
+
+
+class NeedMoreData(Exception):
+    pass
+
+
+def _jpeg_size(header):
+    """(width, height) from the first start-of-frame segment"""
+    i = 2
+    while True:
+        if i + 4 > len(header):
+            raise NeedMoreData()
+        if header[i] != 0xFF:
+            raise ValueError('corrupt JPEG header')
+        marker = header[i + 1]
+        if marker == 0xFF:
+            # Fill byte
+            i += 1
+            continue
+        if marker in JPEG_STANDALONE:
+            i += 2
+            continue
+        if marker in (0xD9, 0xDA):
+            raise ValueError('JPEG without a frame header')
+        length = struct.unpack('>H', header[i + 2:i + 4])[0]
+        if marker in JPEG_SOF:
+            if i + 9 > len(header):
+                raise NeedMoreData()
+            height, width = struct.unpack('>HH', header[i + 5:i + 9])
+            return width, height
+        i += 2 + length
+
+
+def sniff(header):
+    """(format, width, height) of a file from its first bytes.
+
+    Raises NeedMoreData if header is too short to tell and ValueError if
+    the file is not in a recognised format.
+    """
+    if header[:3] == b'\xff\xd8\xff':
+        return ('jpeg',) + _jpeg_size(header)
+    if header[:8] == PNG_SIGNATURE[:len(header)]:
+        if len(header) < 24:
+            raise NeedMoreData()
+        if header[12:16] != b'IHDR':
+            raise ValueError('corrupt PNG header')
+        return ('png',) + struct.unpack('>II', header[16:24])
+    if len(header) < 12:
+        raise NeedMoreData()
+    if header[:4] == b'RIFF' and header[8:12] == b'WAVE':
+        return 'wav', None, None
+    # ID3 tag, or an MPEG audio frame sync
+    if header[:3] == b'ID3' or (header[0] == 0xFF and header[1] & 0xE0 == 0xE0):
+        return 'mp3', None, None
+    raise ValueError('unrecognised file type')
+
+
+def identify(filename, header, final=True):
+    """(format, width, height) of an upload from its first bytes, or None
+    while more are needed. Raises UnsupportedMediaType for other files."""
+    try:
+        return sniff(header)
+    except NeedMoreData:
+        if not final:
+            return None
+        reason = 'unrecognised file type'
+    except ValueError as e:
+        reason = str(e)
+    raise UnsupportedMediaType(f'{filename}: {reason}. Upload JPG or PNG photos and MP3 or WAV music.')
+
+
+def check_pixels(filename, width, height, max_pixels):
+    """Reject photos larger than max_pixels before anything decodes them"""
+    if width * height > max_pixels:
+        raise RequestEntityTooLarge(
+            f'{filename} is {width}x{height}; photos can have at most {max_pixels // 1000000} megapixels.'
+        )
+
+
+class UploadStream:
+    """Spooled file for one upload that checks the data as it is written.
+
+    After parsing, format, kind, extension, width and height describe the
+    file; everything else is delegated to the spooled file.
+    """
+
+    def __init__(self, upload_request, filename):
+        self.upload_request = upload_request
+        self.filename = filename or 'upload'
+        self.size = 0
+        self.format = self.kind = self.extension = None
+        self.width = self.height = None
+        self._header = bytearray()
+        self._file = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE, mode='rb+')
+
+    def _sniff(self, final=False):
+        if len(self._header) >= SNIFF_LIMIT:
+            final = True
+        identified = identify(self.filename, bytes(self._header), final)
+        if identified is None:
+            return
+        self.format, self.width, self.height = identified
+        self.kind, self.extension = FORMATS[self.format]
+        self._header = None
+        self.upload_request.accept(self)
+
+    def write(self, data):
+        self.size += len(data)
+        if self.kind is None:
+            self._header += data
+            self._sniff()
+        limit = self.upload_request.file_limit(self.kind)
+        if self.size > limit:
+            raise RequestEntityTooLarge(f'{self.filename} is larger than {limit // (1024 * 1024)} MB.')
+        return self._file.write(data)
+
+    def seek(self, *args):
+        # Werkzeug rewinds the file once it has been written completely;
+        # browsers send empty parts for file inputs left blank
+        if self.kind is None and self.size:
+            self._sniff(final=True)
+        return self._file.seek(*args)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+class UploadRequest(Request):
+    """Request whose file uploads are validated while they stream in"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.upload_counts = {'image': 0, 'audio': 0}
+
+    def file_limit(self, kind):
+        """Byte limit for a file of kind (None while it is not known yet)"""
+        config = current_app.config
+        limits = {'image': config['MAX_PHOTO_BYTES'], 'audio': config['MAX_MUSIC_BYTES']}
+        return limits[kind] if kind else max(limits.values())
+
+    def accept(self, stream):
+        """Called once a stream's format is known"""
+        config = current_app.config
+        self.upload_counts[stream.kind] += 1
+        if stream.kind == 'image':
+            if self.upload_counts['image'] > config['MAX_PHOTOS']:
+                raise RequestEntityTooLarge(f"Upload at most {config['MAX_PHOTOS']} photos.")
+            check_pixels(stream.filename, stream.width, stream.height, config['MAX_PHOTO_PIXELS'])
+        elif self.upload_counts['audio'] > 1:
+            raise RequestEntityTooLarge('Upload at most one music file.')
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return UploadStream(self, filename)
@@ -0,0 +1,167 @@
+import os
+import shutil
+import threading
+import time
+import uuid
+
+from storage import CHUNK_SIZE
+
+# Resumable uploads. A client creates a session for each file, PUTs its
+# fixed-size chunks in any order and in parallel (re-sending any that
+# failed), then completes the session. Completing checks the assembled
+# file's SHA-256 and stores it in the content store. /generate_video then
+# names the completed sessions instead of carrying the files again.
+#
+# The session rows live in the database (upload_sessions); the chunks are
+# files in one directory per session, so every web process that receives
+# chunks of a session must share that directory. Sessions older than their
+# time-to-live are deleted with their chunks, and a finished upload nobody
+# used drops its reference so the storage sweeper can reclaim it.
+
+
+def chunk_count(size, chunk_size):
+    return max(1, -(-size // chunk_size))
+
+
+def chunk_length(size, chunk_size, index):
+    """Bytes in chunk index of a size-byte file"""
+    return min(chunk_size, size - index * chunk_size)
+
+
+class IncompleteChunk(Exception):
+    """The request body ended before the chunk did"""
+
+
+class ChunkReader:
+    """Read the chunks of a session back as one file"""
+
+    def __init__(self, paths):
+        self._paths = iter(paths)
+        self._file = None
+
+    def read(self, size=-1):
+        data = b''
+        while size < 0 or len(data) < size:
+            if self._file is None:
+                path = next(self._paths, None)
+                if path is None:
+                    break
+                self._file = open(path, 'rb')
+            piece = self._file.read(-1 if size < 0 else size - len(data))
+            if not piece:
+                self._file.close()
+                self._file = None
+                continue
+            data += piece
+        return data
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ChunkedUploads:
+    """Chunk files of upload sessions, one directory per session.
+
+    expire_sessions(max_age) deletes session rows older than max_age
+    seconds and returns their IDs.
+    """
+
+    def __init__(self, root, expire_sessions=None):
+        self.root = root
+        self.expire_sessions = expire_sessions
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _dir(self, session_id):
+        return os.path.join(self.root, session_id)
+
+    def _chunk_path(self, session_id, index):
+        return os.path.join(self._dir(session_id), f"{index:05d}.part")
+
+    def create(self, session_id):
+        os.makedirs(self._dir(session_id), exist_ok=True)
+
+    def write_chunk(self, session_id, index, stream, length):
+        """Copy length bytes of stream to chunk index; re-sending a chunk
+        replaces it. Raises IncompleteChunk if stream is shorter."""
+        path = self._chunk_path(session_id, index)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}"
+        try:
+            remaining = length
+            with open(tmp_path, 'wb') as f:
+                while remaining:
+                    data = stream.read(min(CHUNK_SIZE, remaining))
+                    if not data:
+                        raise IncompleteChunk(f'chunk {index} ended {remaining} bytes early')
+                    f.write(data)
+                    remaining -= len(data)
+            # Parallel PUTs of the same chunk each write their own file
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def received(self, session_id):
+        """Indexes of the chunks stored so far"""
+        try:
+            names = os.listdir(self._dir(session_id))
+        except FileNotFoundError:
+            return []
+        return sorted(int(name[:-5]) for name in names if name.endswith('.part') and name[:-5].isdigit())
+
+    def open(self, session_id, count):
+        """The assembled file of a session with count chunks"""
+        return ChunkReader(self._chunk_path(session_id, index) for index in range(count))
+
+    def remove(self, session_id):
+        shutil.rmtree(self._dir(session_id), ignore_errors=True)
+
+    def expire(self, max_age):
+        """Delete sessions older than max_age seconds, and chunk directories
+        left without a session; returns the number removed"""
+        removed = self.expire_sessions(max_age) if self.expire_sessions else []
+        for session_id in removed:
+            self.remove(session_id)
+        cutoff = time.time() - max_age
+        try:
+            entries = list(os.scandir(self.root))
+        except FileNotFoundError:
+            return len(removed)
+        for entry in entries:
+            # A directory's mtime moves with every chunk written to it
+            if entry.is_dir(follow_symlinks=False) and entry.stat(follow_symlinks=False).st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed.append(entry.name)
+        return len(set(removed))
+
+    def _run(self, interval, max_age):
+        while not self._stop.wait(interval):
+            try:
+                removed = self.expire(max_age)
+                if removed:
+                    print(f"🧹 Expired {removed} upload sessions")
+            except Exception as e:
+                print(f"❌ Error expiring upload sessions: {e}")
+
+    def start(self, interval, max_age):
+        """Expire sessions every interval seconds on a daemon thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(interval, max_age),
+                                             name='upload-sessions', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,164 @@
+"""Standalone render worker.
+
+Claims queued jobs from the render_jobs table, renders them and records the
+result. Run any number of these, on any node that shares the database and the
+uploads folder with the web app:
+
+    RENDER_QUEUE=database python app.py      # web node, only enqueues
+    python worker.py                         # render node
+    python worker.py --processes 4           # four local workers
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+
+from admission import AdmissionController
+from database import (
+    init_db,
+    claim_render_job,
+    heartbeat_render_job,
+    finish_render_job,
+    requeue_stale_render_jobs
+)
+
+
+class Heartbeat:
+    """Background thread touching a job's heartbeat_at while it renders.
+
+    Once a heartbeat finds the job re-queued (and maybe claimed by another
+    worker), owned() stays False: the render's results and its content
+    store references then belong to whoever runs the job now.
+    """
+
+    def __init__(self, job_id, worker_id, interval):
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.interval = interval
+        self._lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _beat(self):
+        # None means the database could not tell; the next beat retries
+        if heartbeat_render_job(self.job_id, self.worker_id) is False:
+            if not self._lost.is_set():
+                print(f"⚠️ Worker {self.worker_id} no longer owns job {self.job_id}")
+            self._lost.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval) and not self._lost.is_set():
+            self._beat()
+
+    def owned(self):
+        """Whether this worker still owns the job, checked with a fresh heartbeat"""
+        if not self._lost.is_set():
+            self._beat()
+        return not self._lost.is_set()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+def run_job(job, worker_id, heartbeat_interval):
+    """Render one claimed job and record the outcome"""
+    # Imported here so `python worker.py --help` stays fast
+    from app import render_reel
+
+    payload = json.loads(job['payload'])
+    print(f"🎬 Worker {worker_id} rendering job {job['id']} (attempt {job['attempts']})")
+    with Heartbeat(job['id'], worker_id, heartbeat_interval) as heartbeat:
+        try:
+            result = render_reel(job['user_id'], payload['photos'], payload.get('music_filename'),
+                                 owned=heartbeat.owned)
+        except Exception as e:
+            print(f"❌ Render job {job['id']} crashed: {e}")
+            result = {'success': False, 'message': f'An error occurred: {str(e)}'}
+    if not heartbeat.owned():
+        # Re-queued while it rendered: the worker running it now records it
+        print(f"⚠️ Worker {worker_id} dropped the result of job {job['id']}")
+        return result
+    if not finish_render_job(job['id'], worker_id, result.get('success'), result.get('message', ''),
+                             result.get('video_url')):
+        print(f"⚠️ Worker {worker_id} could not record the result of job {job['id']}")
+    return result
+
+
+def run_worker(worker_id=None, poll_interval=2.0, heartbeat_interval=10.0, stale_after=60.0, max_jobs=None,
+               cpu_limit=90.0, min_available_mb=512):
+    """Claim and render jobs until interrupted (or max_jobs have been run)"""
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    # Each process connects for itself, so no connection is shared across fork
+    init_db()
+    # Only claim new work while this node has CPU and memory to spare
+    admission = AdmissionController(cpu_limit=cpu_limit, min_available_mb=min_available_mb)
+    print(f"👷 Render worker {worker_id} started")
+    jobs_run = 0
+    try:
+        while max_jobs is None or jobs_run < max_jobs:
+            # Any worker recovers jobs from workers that died mid-render
+            requeued = requeue_stale_render_jobs(stale_after)
+            if requeued:
+                print(f"♻️ Re-queued {requeued} job(s) from unresponsive workers")
+            if not admission.host_has_headroom():
+                time.sleep(poll_interval)
+                continue
+            job = claim_render_job(worker_id)
+            if not job:
+                time.sleep(poll_interval)
+                continue
+            run_job(job, worker_id, heartbeat_interval)
+            jobs_run += 1
+    except KeyboardInterrupt:
+        print(f"👋 Render worker {worker_id} stopping")
+    return jobs_run
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SnapAI render worker')
+    parser.add_argument('--worker-id', help='identifier recorded on claimed jobs (default: host-pid-random)')
+    parser.add_argument('--processes', type=int, default=1, help='number of local worker processes')
+    parser.add_argument('--poll-interval', type=float, default=2.0, help='seconds between polls when idle')
+    parser.add_argument('--heartbeat-interval', type=float, default=10.0, help='seconds between heartbeats')
+    parser.add_argument('--stale-after', type=float, default=60.0,
+                        help='seconds without a heartbeat before a running job is re-queued')
+    parser.add_argument('--max-jobs', type=int, help='exit after rendering this many jobs')
+    parser.add_argument('--cpu-limit', type=float, default=90.0,
+                        help='do not claim jobs while CPU load is above this percentage')
+    parser.add_argument('--min-memory-mb', type=int, default=512,
+                        help='do not claim jobs while less memory than this is available')
+    args = parser.parse_args()
+
+    options = dict(poll_interval=args.poll_interval, heartbeat_interval=args.heartbeat_interval,
+                   stale_after=args.stale_after, max_jobs=args.max_jobs,
+                   cpu_limit=args.cpu_limit, min_available_mb=args.min_memory_mb)
+    if args.processes <= 1:
+        run_worker(args.worker_id, **options)
+        return
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(f"{args.worker_id}-{i}" if args.worker_id else None,),
+                                kwargs=options)
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
+
+
+if __name__ == '__main__':
+    main()